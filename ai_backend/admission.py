@@ -0,0 +1,254 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+import logging
+from contextlib import contextmanager, asynccontextmanager
+from typing import Dict, Any, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger('xshell_chatbot')
+
+# 숫자가 작을수록 먼저 처리
+PRIORITY_INTERACTIVE = 0  # 채팅 응답, 명령어 추출
+PRIORITY_BACKGROUND = 10  # 명령어 설명, 대화 요약, 예열
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: 'interactive', PRIORITY_BACKGROUND: 'background'}
+
+_priority = contextvars.ContextVar('ollama_priority', default=PRIORITY_INTERACTIVE)
+_held_models = contextvars.ContextVar('ollama_held_models', default=frozenset())
+
+
+@contextmanager
+def llm_priority(priority: int):
+    """이 블록 안의 Ollama 호출 우선순위 지정 (스레드/비동기 작업별로 적용)"""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class _Waiter:
+    __slots__ = ('priority', 'event', 'loop', 'future', 'granted', 'cancelled', 'queued_at')
+
+    def __init__(self, priority: int, loop: asyncio.AbstractEventLoop = None):
+        self.priority = priority
+        self.loop = loop
+        self.event = None if loop else threading.Event()
+        self.future = loop.create_future() if loop else None
+        self.granted = False
+        self.cancelled = False
+        self.queued_at = time.monotonic()
+
+    def wake(self):
+        if self.loop is None:
+            self.event.set()
+            return
+        try:
+            self.loop.call_soon_threadsafe(self._resolve)
+        except RuntimeError:
+            pass  # 이벤트 루프가 이미 닫힘
+
+    def _resolve(self):
+        if not self.future.done():
+            self.future.set_result(True)
+
+
+class _ModelState:
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self.waiting = 0
+        self.heap = []
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.waiting_by_priority: Dict[int, int] = {}
+
+
+class AdmissionController:
+    """Ollama 호출 수 제한 - 모델별 동시 실행 수 + 우선순위 대기열 + 대기 시간 상한
+
+    슬롯이 없으면 우선순위(같으면 먼저 온 순서)대로 기다리고, 대기열이 가득 찼거나
+    대기 시간이 queue_timeout을 넘으면 Ollama에 요청을 보내지 않고 바로 실패한다.
+    스레드(동기 클라이언트)와 이벤트 루프(비동기 클라이언트)가 같은 슬롯을 나눠 쓴다.
+    """
+
+    def __init__(self, default_limit: int = None, limits: Dict[str, int] = None,
+                 max_queue: int = None, queue_timeout: float = None):
+        self.default_limit = default_limit or getattr(settings, 'OLLAMA_MAX_CONCURRENCY', 4)
+        self.limits = limits if limits is not None else getattr(settings, 'OLLAMA_MODEL_CONCURRENCY', {})
+        self.max_queue = max_queue or getattr(settings, 'OLLAMA_MAX_QUEUE', 50)
+        self.queue_timeout = queue_timeout or getattr(settings, 'OLLAMA_QUEUE_TIMEOUT', 15)
+        self._states: Dict[str, _ModelState] = {}
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+
+    def _state(self, model: str) -> _ModelState:
+        state = self._states.get(model)
+        if state is None:
+            state = self._states[model] = _ModelState(self.limits.get(model, self.default_limit))
+        return state
+
+    def _try_acquire(self, model: str, priority: int, loop=None) -> Optional[_Waiter]:
+        """바로 슬롯을 얻으면 None, 아니면 대기열에 넣은 waiter 반환 (잠금 안에서 호출)"""
+        state = self._state(model)
+        if state.active < state.limit and not state.waiting:
+            state.active += 1
+            state.admitted += 1
+            return None
+
+        if state.waiting >= self.max_queue:
+            state.rejected += 1
+            raise Exception(
+                f"AI 요청 대기열이 가득 찼습니다 (모델 '{model}', 대기 {state.waiting}건). 잠시 후 다시 시도하세요."
+            )
+
+        waiter = _Waiter(priority, loop)
+        heapq.heappush(state.heap, (priority, next(self._seq), waiter))
+        state.waiting += 1
+        state.waiting_by_priority[priority] = state.waiting_by_priority.get(priority, 0) + 1
+        return waiter
+
+    def _finish_wait(self, model: str, waiter: _Waiter) -> bool:
+        """대기 종료 처리 (잠금 안에서 호출) - 슬롯을 받았으면 True, 아니면 대기열에서 제거"""
+        state = self._state(model)
+        if waiter.granted:
+            waited = time.monotonic() - waiter.queued_at
+            state.total_wait += waited
+            state.max_wait = max(state.max_wait, waited)
+            return True
+        waiter.cancelled = True
+        state.waiting -= 1
+        state.waiting_by_priority[waiter.priority] -= 1
+        return False
+
+    def _timeout_error(self, model: str, timeout: float) -> Exception:
+        with self._lock:
+            self._state(model).timed_out += 1
+        return Exception(f"AI 요청이 많아 {timeout:g}초 안에 처리를 시작하지 못했습니다 (모델 '{model}'). 잠시 후 다시 시도하세요.")
+
+    def release(self, model: str):
+        with self._lock:
+            state = self._state(model)
+            while state.heap:
+                _, _, waiter = heapq.heappop(state.heap)
+                if waiter.cancelled:
+                    continue
+                # 슬롯을 그대로 다음 대기자에게 넘김 (active 유지)
+                waiter.granted = True
+                state.waiting -= 1
+                state.waiting_by_priority[waiter.priority] -= 1
+                state.admitted += 1
+                waiter.wake()
+                return
+            state.active -= 1
+
+    @contextmanager
+    def slot(self, model: str, priority: int = None, timeout: float = None):
+        """동기 호출용 슬롯 (같은 모델 슬롯을 이미 잡은 호출 안에서는 다시 잡지 않음)"""
+        if model in _held_models.get():
+            yield
+            return
+
+        priority = _priority.get() if priority is None else priority
+        timeout = timeout or self.queue_timeout
+        with self._lock:
+            waiter = self._try_acquire(model, priority)
+
+        if waiter is not None:
+            waiter.event.wait(timeout)
+            with self._lock:
+                granted = self._finish_wait(model, waiter)
+            if not granted:
+                raise self._timeout_error(model, timeout)
+
+        held = _held_models.get()
+        _held_models.set(held | {model})
+        try:
+            yield
+        finally:
+            # 스트림 제너레이터는 다른 컨텍스트에서 닫힐 수 있어 token 대신 이전 값으로 복원
+            _held_models.set(held)
+            self.release(model)
+
+    @asynccontextmanager
+    async def aslot(self, model: str, priority: int = None, timeout: float = None):
+        """비동기 호출용 슬롯 - 이벤트 루프를 막지 않고 대기"""
+        if model in _held_models.get():
+            yield
+            return
+
+        priority = _priority.get() if priority is None else priority
+        timeout = timeout or self.queue_timeout
+        with self._lock:
+            waiter = self._try_acquire(model, priority, asyncio.get_running_loop())
+
+        if waiter is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+            except asyncio.TimeoutError:
+                pass
+            except asyncio.CancelledError:
+                with self._lock:
+                    granted = self._finish_wait(model, waiter)
+                if granted:
+                    self.release(model)
+                raise
+            with self._lock:
+                granted = self._finish_wait(model, waiter)
+            if not granted:
+                raise self._timeout_error(model, timeout)
+
+        held = _held_models.get()
+        _held_models.set(held | {model})
+        try:
+            yield
+        finally:
+            # 스트림 제너레이터는 다른 컨텍스트에서 닫힐 수 있어 token 대신 이전 값으로 복원
+            _held_models.set(held)
+            self.release(model)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            models = {}
+            for model, state in self._states.items():
+                models[model] = {
+                    'limit': state.limit,
+                    'active': state.active,
+                    'queued': state.waiting,
+                    'queued_by_priority': {
+                        PRIORITY_NAMES.get(priority, str(priority)): count
+                        for priority, count in state.waiting_by_priority.items() if count
+                    },
+                    'admitted': state.admitted,
+                    'rejected': state.rejected,
+                    'timed_out': state.timed_out,
+                    'avg_wait': round(state.total_wait / state.admitted, 4) if state.admitted else 0.0,
+                    'max_wait': round(state.max_wait, 4)
+                }
+            return {
+                'default_limit': self.default_limit,
+                'max_queue': self.max_queue,
+                'queue_timeout': self.queue_timeout,
+                'models': models
+            }
+
+
+_admission_controller = None
+_admission_controller_lock = threading.Lock()
+
+
+def get_admission_controller() -> AdmissionController:
+    """프로세스 전역 Ollama 호출 제한기 반환"""
+    global _admission_controller
+    if _admission_controller is None:
+        with _admission_controller_lock:
+            if _admission_controller is None:
+                _admission_controller = AdmissionController()
+    return _admission_controller
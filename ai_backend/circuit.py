@@ -0,0 +1,180 @@
+import threading
+import time
+import logging
+from collections import deque
+from typing import Dict, Any
+
+from django.conf import settings
+
+logger = logging.getLogger('xshell_chatbot')
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# 엔드포인트 자체가 없는 경우(404) 다시 시도해 보기까지의 시간
+UNSUPPORTED_RETRY_SECONDS = 600
+
+
+class CircuitOpenError(Exception):
+    """회로가 열려 있어 Ollama에 요청하지 않고 바로 실패"""
+
+
+class CircuitBreaker:
+    """Ollama 엔드포인트별 회로 차단기
+
+    최근 window초 동안의 요청 중 실패 비율이 failure_rate 이상이면(최소 min_requests건)
+    open_seconds 동안 요청을 보내지 않고 바로 실패한다. 그 뒤 한 건만 시험 삼아 보내
+    (half-open) 성공하면 다시 닫고, 실패하면 다시 연다.
+    """
+
+    def __init__(self, name: str, window: float = None, failure_rate: float = None,
+                 min_requests: int = None, open_seconds: float = None):
+        self.name = name
+        self.window = window or getattr(settings, 'OLLAMA_BREAKER_WINDOW', 60)
+        self.failure_rate = failure_rate or getattr(settings, 'OLLAMA_BREAKER_FAILURE_RATE', 0.5)
+        self.min_requests = min_requests or getattr(settings, 'OLLAMA_BREAKER_MIN_REQUESTS', 5)
+        self.open_seconds = open_seconds or getattr(settings, 'OLLAMA_BREAKER_OPEN_SECONDS', 30)
+        self._lock = threading.Lock()
+        self._outcomes = deque()  # (시각, 성공 여부)
+        self.state = CLOSED
+        self._opened_until = 0.0
+        self._probe_started = None
+        self.opened = 0
+        self.rejected = 0
+        self.last_error = ''
+
+    def _trim(self, now: float):
+        while self._outcomes and self._outcomes[0][0] < now - self.window:
+            self._outcomes.popleft()
+
+    def _open(self, now: float, seconds: float, reason: str):
+        self.state = OPEN
+        self._opened_until = now + seconds
+        self._probe_started = None
+        self._outcomes.clear()
+        self.opened += 1
+        self.last_error = reason
+        logger.warning(f"Ollama {self.name} 회로 열림 ({seconds:g}초): {reason}")
+
+    def allow(self) -> bool:
+        """지금 요청을 보내도 되는지 (half-open이면 시험 요청 한 건만 허용)"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            now = time.monotonic()
+            if self.state == OPEN:
+                if now < self._opened_until:
+                    self.rejected += 1
+                    return False
+                self.state = HALF_OPEN
+            # 시험 요청이 결과 없이 끝난 경우(취소 등)를 대비해 일정 시간 뒤에는 새로 허용
+            if self._probe_started is None or now - self._probe_started > self.open_seconds:
+                self._probe_started = now
+                return True
+            self.rejected += 1
+            return False
+
+    def check(self):
+        """요청 전 확인 - 회로가 열려 있으면 CircuitOpenError"""
+        if not self.allow():
+            retry_in = max(self._opened_until - time.monotonic(), 0)
+            raise CircuitOpenError(
+                f"Ollama 서비스 연결 실패가 반복되어 요청을 잠시 차단했습니다 ({retry_in:.0f}초 후 재시도). "
+                f"마지막 오류: {self.last_error}"
+            )
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info(f"Ollama {self.name} 회로 닫힘 (시험 요청 성공)")
+            self.state = CLOSED
+            self._probe_started = None
+            self._outcomes.append((time.monotonic(), True))
+
+    def record_failure(self, reason: str = ''):
+        with self._lock:
+            now = time.monotonic()
+            self.last_error = reason or self.last_error
+            if self.state == HALF_OPEN:
+                self._open(now, self.open_seconds, reason)
+                return
+            if self.state == OPEN:
+                return
+            self._outcomes.append((now, False))
+            self._trim(now)
+            failures = sum(1 for _, ok in self._outcomes if not ok)
+            if len(self._outcomes) >= self.min_requests and failures / len(self._outcomes) >= self.failure_rate:
+                self._open(now, self.open_seconds, reason)
+
+    def trip(self, reason: str, seconds: float = None):
+        """실패 비율과 상관없이 바로 열기 (엔드포인트가 없는 경우 등)"""
+        with self._lock:
+            self._open(time.monotonic(), seconds or self.open_seconds, reason)
+
+    def reset(self):
+        with self._lock:
+            self.state = CLOSED
+            self._probe_started = None
+            self._outcomes.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            self._trim(now)
+            failures = sum(1 for _, ok in self._outcomes if not ok)
+            return {
+                'state': self.state,
+                'recent_requests': len(self._outcomes),
+                'recent_failures': failures,
+                'retry_in': round(max(self._opened_until - now, 0), 1) if self.state == OPEN else 0,
+                'opened': self.opened,
+                'rejected': self.rejected,
+                'last_error': self.last_error
+            }
+
+
+class OllamaCircuitBreakers:
+    """Ollama 서버 하나의 엔드포인트별(/api/chat, /api/generate) 회로 차단기 모음"""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def endpoint(self, name: str) -> CircuitBreaker:
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.get(name)
+                if breaker is None:
+                    breaker = self._breakers[name] = CircuitBreaker(name)
+        return breaker
+
+    def record_connection_failure(self, reason: str):
+        """연결 자체가 안 되면 서버 전체 문제이므로 모든 엔드포인트에 반영"""
+        for name in ('chat', 'generate'):
+            self.endpoint(name).record_failure(reason)
+
+    def reset(self):
+        for breaker in list(self._breakers.values()):
+            breaker.reset()
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: breaker.stats() for name, breaker in list(self._breakers.items())}
+
+
+_breakers: Dict[str, OllamaCircuitBreakers] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breakers(base_url: str = None) -> OllamaCircuitBreakers:
+    """Ollama 서버별 회로 차단기 반환"""
+    base_url = base_url or settings.OLLAMA_BASE_URL
+    breakers = _breakers.get(base_url)
+    if breakers is None:
+        with _breakers_lock:
+            breakers = _breakers.get(base_url)
+            if breakers is None:
+                breakers = _breakers[base_url] = OllamaCircuitBreakers(base_url)
+    return breakers
@@ -0,0 +1,275 @@
+import asyncio
+import contextvars
+import hashlib
+import json
+import threading
+import logging
+from typing import Dict, Any, Callable, Iterator, AsyncIterator, Awaitable
+
+from django.conf import settings
+
+logger = logging.getLogger('xshell_chatbot')
+
+
+def flight_key(endpoint: str, payload: Dict[str, Any]) -> str:
+    """요청 본문(모델, 시스템 프롬프트, 프롬프트/메시지, 옵션) 기준 키 - stream/keep_alive는 제외"""
+    fields = {name: value for name, value in payload.items() if name not in ('stream', 'keep_alive')}
+    raw = json.dumps(fields, sort_keys=True, ensure_ascii=False)
+    return f"{endpoint}:{hashlib.sha1(raw.encode('utf-8')).hexdigest()}"
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _Broadcast:
+    """한 번의 스트림 생성 결과를 여러 구독자에게 나눠 주는 버퍼 (늦게 온 구독자는 처음부터 재생)"""
+
+    def __init__(self, condition):
+        self.cond = condition
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.subscribers = 0
+        self.pump = None
+
+
+class SingleFlight:
+    """진행 중인 동일 Ollama 요청 합치기
+
+    같은 키의 요청이 이미 진행 중이면 새로 보내지 않고 그 결과를 함께 받는다.
+    스트리밍은 한 번 받은 청크를 모든 구독자에게 나눠 주고, 구독자가 모두 떠나면
+    생성을 중단한다. 합친 요청은 호출 수 제한 슬롯도 차지하지 않는다.
+    """
+
+    def __init__(self, enabled: bool = None):
+        self.enabled = enabled if enabled is not None else getattr(settings, 'OLLAMA_COALESCE_REQUESTS', True)
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self._streams: Dict[str, _Broadcast] = {}
+        self._tasks: Dict[tuple, list] = {}  # (loop, key) -> [task, 대기자 수]
+        self._astreams: Dict[tuple, _Broadcast] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def _count(self, leader: bool):
+        if leader:
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+
+    # 동기 -----------------------------------------------------------------
+
+    def do(self, key: str, call: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """key가 같은 요청이 진행 중이면 그 결과를 기다리고, 아니면 직접 실행"""
+        if not self.enabled:
+            return call()
+
+        with self._lock:
+            flight = self._calls.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._calls[key] = _Call()
+            self._count(leader)
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return dict(flight.result)
+
+        try:
+            flight.result = call()
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            flight.event.set()
+
+    def stream(self, key: str, open_stream: Callable[[], Iterator[str]]) -> Iterator[str]:
+        """같은 스트림을 구독 (처음 요청한 경우 별도 스레드에서 생성 시작)"""
+        if not self.enabled:
+            return open_stream()
+
+        with self._lock:
+            broadcast = self._streams.get(key)
+            leader = broadcast is None
+            if leader:
+                broadcast = self._streams[key] = _Broadcast(threading.Condition())
+            broadcast.subscribers += 1
+            self._count(leader)
+
+        if leader:
+            # 우선순위 등 호출한 쪽의 컨텍스트를 그대로 사용
+            context = contextvars.copy_context()
+            broadcast.pump = threading.Thread(
+                target=context.run, args=(self._pump, key, broadcast, open_stream),
+                name='ollama-stream-pump', daemon=True
+            )
+            broadcast.pump.start()
+        return self._subscribe(key, broadcast)
+
+    def _pump(self, key: str, broadcast: _Broadcast, open_stream: Callable[[], Iterator[str]]):
+        upstream = None
+        try:
+            upstream = open_stream()
+            for chunk in upstream:
+                with broadcast.cond:
+                    if not broadcast.subscribers:
+                        break  # 모두 떠남 - 생성 중단
+                    broadcast.chunks.append(chunk)
+                    broadcast.cond.notify_all()
+        except Exception as e:
+            broadcast.error = e
+        finally:
+            if upstream is not None and hasattr(upstream, 'close'):
+                upstream.close()
+            with self._lock:
+                if self._streams.get(key) is broadcast:
+                    del self._streams[key]
+            with broadcast.cond:
+                broadcast.done = True
+                broadcast.cond.notify_all()
+
+    def _subscribe(self, key: str, broadcast: _Broadcast) -> Iterator[str]:
+        position = 0
+        try:
+            while True:
+                with broadcast.cond:
+                    broadcast.cond.wait_for(lambda: position < len(broadcast.chunks) or broadcast.done)
+                    chunks = broadcast.chunks[position:]
+                    done = broadcast.done
+                position += len(chunks)
+                yield from chunks
+                if done:
+                    if broadcast.error is not None:
+                        raise broadcast.error
+                    return
+        finally:
+            # 마지막 구독자가 떠나면 중단될 스트림을 바로 목록에서 빼서, 그 사이에 온
+            # 요청이 잘린 응답에 합류하지 않고 새로 생성하게 함
+            with self._lock:
+                with broadcast.cond:
+                    broadcast.subscribers -= 1
+                    abandoned = not broadcast.subscribers
+                if abandoned and self._streams.get(key) is broadcast:
+                    del self._streams[key]
+
+    # 비동기 ---------------------------------------------------------------
+
+    async def ado(self, key: str, call: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """do()의 비동기 버전 - 요청은 별도 작업으로 실행해 한 대기자가 취소돼도 나머지는 계속 받음"""
+        if not self.enabled:
+            return await call()
+
+        loop = asyncio.get_running_loop()
+        flight_id = (loop, key)
+        entry = self._tasks.get(flight_id)
+        leader = entry is None
+        if leader:
+            task = loop.create_task(call())
+            entry = self._tasks[flight_id] = [task, 0]
+            task.add_done_callback(lambda _: self._tasks.pop(flight_id, None))
+        with self._lock:
+            self._count(leader)
+
+        entry[1] += 1
+        try:
+            result = await asyncio.shield(entry[0])
+        finally:
+            entry[1] -= 1
+            if not entry[1] and not entry[0].done():
+                entry[0].cancel()  # 기다리는 쪽이 모두 취소됨
+        return result if leader else dict(result)
+
+    def astream(self, key: str, open_stream: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        """stream()의 비동기 버전 - 생성은 이벤트 루프의 별도 작업에서 수행"""
+        if not self.enabled:
+            return open_stream()
+
+        loop = asyncio.get_running_loop()
+        flight_id = (loop, key)
+        broadcast = self._astreams.get(flight_id)
+        leader = broadcast is None
+        if leader:
+            broadcast = self._astreams[flight_id] = _Broadcast(asyncio.Condition())
+            broadcast.pump = loop.create_task(self._apump(flight_id, broadcast, open_stream))
+        broadcast.subscribers += 1
+        with self._lock:
+            self._count(leader)
+        return self._asubscribe(flight_id, broadcast)
+
+    async def _apump(self, flight_id: tuple, broadcast: _Broadcast, open_stream: Callable[[], AsyncIterator[str]]):
+        try:
+            async for chunk in open_stream():
+                async with broadcast.cond:
+                    broadcast.chunks.append(chunk)
+                    broadcast.cond.notify_all()
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            broadcast.error = e
+        finally:
+            if self._astreams.get(flight_id) is broadcast:
+                del self._astreams[flight_id]
+            broadcast.done = True
+            async with broadcast.cond:
+                broadcast.cond.notify_all()
+
+    async def _asubscribe(self, flight_id: tuple, broadcast: _Broadcast) -> AsyncIterator[str]:
+        position = 0
+        try:
+            while True:
+                async with broadcast.cond:
+                    await broadcast.cond.wait_for(lambda: position < len(broadcast.chunks) or broadcast.done)
+                    chunks = broadcast.chunks[position:]
+                    done = broadcast.done
+                position += len(chunks)
+                for chunk in chunks:
+                    yield chunk
+                if done:
+                    if broadcast.error is not None:
+                        raise broadcast.error
+                    return
+        finally:
+            broadcast.subscribers -= 1
+            if not broadcast.subscribers:
+                # 취소된 pump가 정리되기 전에 온 요청이 잘린 응답에 합류하지 않도록 먼저 목록에서 뺌
+                if self._astreams.get(flight_id) is broadcast:
+                    del self._astreams[flight_id]
+                if not broadcast.pump.done():
+                    broadcast.pump.cancel()  # 모두 떠남 - 생성 중단
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.leaders + self.coalesced
+            return {
+                'enabled': self.enabled,
+                'in_flight': len(self._calls) + len(self._tasks),
+                'streams_in_flight': len(self._streams) + len(self._astreams),
+                'upstream_requests': self.leaders,
+                'coalesced_requests': self.coalesced,
+                'coalesce_rate': round(self.coalesced / total, 3) if total else 0.0
+            }
+
+
+_single_flight = None
+_single_flight_lock = threading.Lock()
+
+
+def get_single_flight() -> SingleFlight:
+    """프로세스 전역 요청 합치기 관리자 반환"""
+    global _single_flight
+    if _single_flight is None:
+        with _single_flight_lock:
+            if _single_flight is None:
+                _single_flight = SingleFlight()
+    return _single_flight
@@ -0,0 +1,246 @@
+import re
+import threading
+import time
+import logging
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple, NamedTuple
+
+from django.conf import settings
+
+from .intent import IS_WINDOWS
+
+logger = logging.getLogger('xshell_chatbot')
+
+# 기본 표현 - 명령어 추출 프롬프트의 예시로도 사용
+SEED_PHRASES = {
+    'unix': [
+        ('파일 목록 보여줘', 'ls -la'),
+        ('프로세스 확인해줘', 'ps aux'),
+        ('디스크 사용량 확인해줘', 'df -h'),
+        ('메모리 사용량 확인해줘', 'free -h'),
+        ('현재 경로 알려줘', 'pwd'),
+        ('열린 포트 확인해줘', 'netstat -tulpn'),
+    ],
+    'windows': [
+        ('파일 목록 보여줘', 'dir'),
+        ('프로세스 확인해줘', 'Get-Process'),
+        ('시스템 정보 알려줘', 'systeminfo'),
+        ('네트워크 설정 확인해줘', 'ipconfig /all'),
+        ('현재 경로 알려줘', 'Get-Location'),
+        ('열린 포트 확인해줘', 'netstat -ano'),
+    ],
+}
+
+# 의미 없이 붙는 어미/부탁 표현만 제외 (동사는 지우지 않고 아래에서 따로 비교)
+_FILLER = re.compile(r'해\s*주세요|해\s*줘|주세요|줘요|줘|좀|please')
+# 조회 동사 - 서로 바꿔 써도 같은 요청 ("보여줘" == "확인해줘")
+_VIEW_VERBS = re.compile(r'확인|보여|알려|조회|출력|봐|show|check|display|view|list')
+# 상태를 바꾸는 동사 - 표현에 없는 동사가 메시지에 있으면 다른 요청 ("목록 삭제해줘" != "목록 보여줘")
+_ACTION_VERBS = re.compile(
+    r'삭제|지워|지우|제거|없애|죽여|죽이|종료|중지|멈춰|끝내|닫아|닫|막아|차단|끊어|실행(?!\s*중)|돌려|재시작|시작|'
+    r'변경|바꿔|수정|설치|만들|생성|복사|옮겨|이동|압축|비워|정리|초기화|'
+    r'\b(?:kill|delete|remove|stop|start|restart|run|close|install|create|execute)\b'
+)
+# 인자로 보이는 토큰 (경로, 옵션, 영문 이름) - 표현에 없는 인자가 메시지에 있으면 다른 요청 ("/var du" != "디스크 사용량")
+_ARGUMENT = re.compile(r'(?<!\S)(?:--?[a-z]\S*|[~.]*/\S*|[a-z]:\\\S*)|[a-z0-9_][a-z0-9_.\-]*')
+_NON_WORD = re.compile(r'[^\w]+')
+
+
+class CommandMatch(NamedTuple):
+    command: str
+    confidence: float
+    phrase: str
+    source: str
+
+
+class _Features(NamedTuple):
+    grams: Set[str]
+    actions: FrozenSet[str]
+    arguments: FrozenSet[str]
+
+
+def _features(text: str) -> _Features:
+    """동작 동사, 인자 토큰, 나머지 텍스트(조회 동사/어미 제외)의 문자 bigram 집합"""
+    text = text.lower()
+    actions = frozenset(_ACTION_VERBS.findall(text))
+    text = _FILLER.sub(' ', _VIEW_VERBS.sub(' ', _ACTION_VERBS.sub(' ', text)))
+    arguments = frozenset(_ARGUMENT.findall(text))
+    text = _NON_WORD.sub('', text)
+    if len(text) < 2:
+        grams = {text} if text else set()
+    else:
+        grams = {text[i:i + 2] for i in range(len(text) - 1)}
+    return _Features(grams, actions, arguments)
+
+
+class CommandIndex:
+    """자연어 표현 → 명령어 로컬 인덱스 (문자 bigram 유사도)
+
+    조회는 메모리에서만 이루어지고, DB(관리자 등록 표현, 성공한 명령어 이력)는
+    refresh_if_stale()에서 주기적으로 다시 읽는다.
+    """
+
+    def __init__(self, refresh_interval: float = None):
+        self.refresh_interval = refresh_interval or getattr(settings, 'COMMAND_INDEX_REFRESH_INTERVAL', 300)
+        self._lock = threading.Lock()
+        self._entries: Dict[str, List[Tuple[str, str, str, _Features]]] = {}  # family -> [(phrase, command, source, features)]
+        self._postings: Dict[str, Dict[str, List[int]]] = {}  # family -> bigram -> entry index
+        self._loaded_at = None
+        self.hits = 0
+        self.misses = 0
+        self._build(self._seed_entries())
+
+    def _seed_entries(self) -> List[Tuple[str, str, str, str]]:
+        return [
+            (family, phrase, command, 'seed')
+            for family, phrases in SEED_PHRASES.items()
+            for phrase, command in phrases
+        ]
+
+    def _build(self, rows: List[Tuple[str, str, str, str]]):
+        entries: Dict[str, List[Tuple[str, str, str, _Features]]] = {}
+        postings: Dict[str, Dict[str, List[int]]] = {}
+        seen = set()
+
+        for family, phrase, command, source in rows:
+            key = (family, phrase.strip().lower(), command)
+            if key in seen:
+                continue
+            seen.add(key)
+
+            features = _features(phrase)
+            if not features.grams:
+                continue
+            family_entries = entries.setdefault(family, [])
+            family_postings = postings.setdefault(family, {})
+            for gram in features.grams:
+                family_postings.setdefault(gram, []).append(len(family_entries))
+            family_entries.append((phrase, command, source, features))
+
+        with self._lock:
+            self._entries = entries
+            self._postings = postings
+
+    def refresh_if_stale(self, force: bool = False):
+        """DB 표현/이력을 다시 읽어 인덱스 재구성 (주기가 지났을 때만)"""
+        if not force and self._loaded_at and time.monotonic() - self._loaded_at < self.refresh_interval:
+            return
+
+        self._loaded_at = time.monotonic()
+        rows = self._seed_entries()
+        try:
+            rows += self._load_admin_phrases()
+            rows += self._load_accepted_history()
+        except Exception as e:
+            logger.warning(f"명령어 인덱스 DB 로드 실패 (기본 표현만 사용): {e}")
+        self._build(rows)
+
+    def invalidate(self):
+        """다음 조회 전에 다시 읽도록 표시 (관리자 수정 시)"""
+        self._loaded_at = None
+
+    def _load_admin_phrases(self) -> List[Tuple[str, str, str, str]]:
+        from chatbot.models import CommandPhrase
+
+        return [
+            (family, phrase, command, 'admin')
+            for family, phrase, command in CommandPhrase.objects.filter(is_active=True)
+                                                              .values_list('shell_family', 'phrase', 'command')
+        ]
+
+    def _load_accepted_history(self) -> List[Tuple[str, str, str, str]]:
+        """AI가 제안한 명령어 중 실제로 실행되어 성공한 것의 원래 요청 문장 (쿼리 한 번)"""
+        from django.db.models import Exists, OuterRef, Subquery
+        from django.db.models.fields.json import KeyTextTransform
+        from chatbot.models import ChatMessage, CommandHistory
+
+        limit = getattr(settings, 'COMMAND_INDEX_HISTORY_LIMIT', 500)
+        # 제안 직전의 사용자 메시지
+        request = ChatMessage.objects.filter(
+            session_id=OuterRef('session_id'),
+            message_type='user',
+            timestamp__lte=OuterRef('timestamp')
+        ).order_by('-timestamp').values('content')[:1]
+        succeeded = CommandHistory.objects.filter(exit_code=0, command=OuterRef('suggested_command'))
+
+        suggestions = ChatMessage.objects.filter(
+            message_type='ai',
+            metadata__type='command_ready'
+        ).annotate(
+            suggested_command=KeyTextTransform('command', 'metadata'),
+        ).annotate(
+            request=Subquery(request),
+            succeeded=Exists(succeeded)
+        ).filter(succeeded=True).order_by('-timestamp').values_list('suggested_command', 'request')[:limit]
+
+        family = 'windows' if IS_WINDOWS else 'unix'
+        return [
+            (family, request, command, 'history')
+            for command, request in suggestions
+            if request and '`' not in request and len(request) <= 200
+        ]
+
+    def lookup(self, message: str, shell_family: str = None) -> Optional[CommandMatch]:
+        """가장 비슷한 표현의 명령어와 신뢰도 (다른 명령어와 점수가 비슷하면 신뢰도를 낮춤)"""
+        family = shell_family or ('windows' if IS_WINDOWS else 'unix')
+        features = _features(message)
+        query = features.grams
+        if not query:
+            return None
+
+        with self._lock:
+            entries = self._entries.get(family, [])
+            postings = self._postings.get(family, {})
+
+        overlap: Dict[int, int] = {}
+        for gram in query:
+            for index in postings.get(gram, ()):
+                overlap[index] = overlap.get(index, 0) + 1
+
+        best: Dict[str, CommandMatch] = {}  # 명령어별 최고 점수
+        for index, shared in overlap.items():
+            phrase, command, source, entry = entries[index]
+            # 표현에 없는 동작 동사나 인자(경로, 옵션, 이름)가 있으면 같은 요청이 아님
+            if not features.actions <= entry.actions or not features.arguments <= entry.arguments:
+                continue
+            coverage = shared / len(entry.grams)  # 표현이 메시지에 얼마나 포함되는지
+            precision = shared / len(query)  # 메시지 중 표현과 관련된 비율
+            confidence = round(min(coverage, precision), 3)  # 둘 다 높아야 함
+            if command not in best or confidence > best[command].confidence:
+                best[command] = CommandMatch(command, confidence, phrase, source)
+
+        if not best:
+            self.misses += 1
+            return None
+
+        ranked = sorted(best.values(), key=lambda match: match.confidence, reverse=True)
+        top = ranked[0]
+        if len(ranked) > 1:
+            margin = top.confidence - ranked[1].confidence
+            if margin < 0.1:
+                # 애매한 경우: 두 후보 차이만큼만 신뢰
+                top = top._replace(confidence=round(top.confidence * (0.5 + margin * 5), 3))
+
+        if top.confidence >= getattr(settings, 'COMMAND_INDEX_MIN_CONFIDENCE', 0.75):
+            self.hits += 1
+        else:
+            self.misses += 1
+        return top
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            sizes = {family: len(entries) for family, entries in self._entries.items()}
+        return {'entries': sizes, 'hits': self.hits, 'misses': self.misses}
+
+
+_command_index = None
+_command_index_lock = threading.Lock()
+
+
+def get_command_index() -> CommandIndex:
+    """프로세스 전역 명령어 인덱스 반환"""
+    global _command_index
+    if _command_index is None:
+        with _command_index_lock:
+            if _command_index is None:
+                _command_index = CommandIndex()
+    return _command_index
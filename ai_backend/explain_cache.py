@@ -0,0 +1,230 @@
+import hashlib
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Callable, Dict, Any, Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import OperationalError, ProgrammingError
+
+logger = logging.getLogger('xshell_chatbot')
+
+# 미리 설명을 만들어 둘 자주 쓰는 명령어
+COMMON_COMMANDS = {
+    'unix': [
+        'ls -la', 'pwd', 'ps aux', 'df -h', 'du -sh *', 'free -h', 'top -bn1',
+        'uname -a', 'whoami', 'uptime', 'netstat -tulpn', 'ss -tulpn',
+        'ip addr', 'systemctl status', 'journalctl -xe', 'tail -f /var/log/syslog',
+    ],
+    'powershell': [
+        'Get-Process', 'Get-Service', 'Get-ChildItem', 'Get-Location',
+        'Get-ComputerInfo', 'Get-NetIPAddress', 'Get-EventLog -LogName System -Newest 20',
+    ],
+    'cmd': [
+        'dir', 'ipconfig /all', 'systeminfo', 'tasklist', 'netstat -ano', 'whoami',
+    ],
+}
+
+
+def normalize_command(command: str) -> str:
+    """캐시 키용 명령어 정규화 - 따옴표가 없으면 공백을 하나로 합침"""
+    command = command.strip()
+    if '"' in command or "'" in command:
+        return command
+    return ' '.join(command.split())
+
+
+def _is_missing_table(error: Exception) -> bool:
+    """캐시 테이블이 없어서 난 오류인지 (PostgreSQL 등은 ProgrammingError, SQLite는 OperationalError)"""
+    if isinstance(error, ProgrammingError):
+        return True
+    message = str(error).lower()
+    return isinstance(error, OperationalError) and ('no such table' in message or "doesn't exist" in message)
+
+
+class ExplanationCache:
+    """명령어 설명 2단계 캐시
+
+    프로세스 내 LRU(1단계) 앞에 두고, 뒤에는 Django 캐시(기본: DB 캐시 테이블)를
+    두어 재시작 후에도 설명을 재사용한다. 키는 정규화된 명령어 + 대상 shell + 모델.
+    """
+
+    def __init__(self, local_size: int = None, ttl: int = None, alias: str = None):
+        self.local_size = local_size or getattr(settings, 'EXPLAIN_CACHE_LOCAL_SIZE', 512)
+        self.ttl = ttl or getattr(settings, 'EXPLAIN_CACHE_TTL', 7 * 24 * 3600)
+        self.alias = alias or getattr(settings, 'EXPLAIN_CACHE_ALIAS', 'command_explanations')
+        self._local: 'OrderedDict[str, tuple]' = OrderedDict()  # key -> (expires_at, explanation)
+        self._lock = threading.Lock()
+        self.retry_after = getattr(settings, 'EXPLAIN_CACHE_RETRY_AFTER', 300)
+        self._backend_disabled_until = 0.0  # 캐시 테이블이 없을 때 영구 캐시를 건너뛸 시각
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    def _backend_available(self) -> bool:
+        return time.time() >= self._backend_disabled_until
+
+    def _backend(self):
+        try:
+            return caches[self.alias]
+        except Exception:
+            return caches['default']
+
+    def make_key(self, command: str, target_shell: str, model: str) -> str:
+        raw = f"{model}|{target_shell}|{normalize_command(command)}"
+        return 'explain:' + hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def _local_get(self, key: str, now: float) -> Optional[str]:
+        with self._lock:
+            entry = self._local.get(key)
+            if entry and entry[0] > now:
+                self._local.move_to_end(key)
+                self.local_hits += 1
+                return entry[1]
+            if entry:
+                del self._local[key]
+        return None
+
+    def _record_shared_result(self, key: str, explanation: Optional[str], now: float):
+        if explanation is not None:
+            self._remember(key, explanation, now)
+        with self._lock:
+            if explanation is not None:
+                self.shared_hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, command: str, target_shell: str, model: str) -> Optional[str]:
+        key = self.make_key(command, target_shell, model)
+        now = time.time()
+
+        explanation = self._local_get(key, now)
+        if explanation is not None:
+            return explanation
+
+        explanation = self._shared_get(key)
+        self._record_shared_result(key, explanation, now)
+        return explanation
+
+    async def aget(self, command: str, target_shell: str, model: str) -> Optional[str]:
+        """get의 비동기 버전 (영구 캐시 조회만 await)"""
+        key = self.make_key(command, target_shell, model)
+        now = time.time()
+
+        explanation = self._local_get(key, now)
+        if explanation is not None:
+            return explanation
+
+        explanation = None
+        if self._backend_available():
+            try:
+                explanation = await self._backend().aget(key)
+            except Exception as e:
+                self._backend_error(e)
+        self._record_shared_result(key, explanation, now)
+        return explanation
+
+    def set(self, command: str, target_shell: str, model: str, explanation: str):
+        if not explanation:
+            return
+        key = self.make_key(command, target_shell, model)
+        self._remember(key, explanation, time.time())
+        self._shared_set(key, explanation)
+        with self._lock:
+            self.stores += 1
+
+    async def aset(self, command: str, target_shell: str, model: str, explanation: str):
+        if not explanation:
+            return
+        key = self.make_key(command, target_shell, model)
+        self._remember(key, explanation, time.time())
+        if self._backend_available():
+            try:
+                await self._backend().aset(key, explanation, self.ttl)
+            except Exception as e:
+                self._backend_error(e)
+        with self._lock:
+            self.stores += 1
+
+    def prewarm(self, commands: Iterable[str], target_shell: str, model: str,
+                create: Callable[[str], Optional[str]]) -> int:
+        """목록의 명령어 중 캐시에 없는 것만 설명을 만들어 저장"""
+        created = 0
+        for command in commands:
+            if self.get(command, target_shell, model) is not None:
+                continue
+            explanation = create(command)
+            if explanation:
+                self.set(command, target_shell, model, explanation)
+                created += 1
+        return created
+
+    def _remember(self, key: str, explanation: str, now: float):
+        with self._lock:
+            self._local[key] = (now + self.ttl, explanation)
+            self._local.move_to_end(key)
+            while len(self._local) > self.local_size:
+                self._local.popitem(last=False)
+
+    def _shared_get(self, key: str) -> Optional[str]:
+        if not self._backend_available():
+            return None
+        try:
+            return self._backend().get(key)
+        except Exception as e:
+            self._backend_error(e)
+            return None
+
+    def _shared_set(self, key: str, explanation: str):
+        if not self._backend_available():
+            return
+        try:
+            self._backend().set(key, explanation, self.ttl)
+        except Exception as e:
+            self._backend_error(e)
+
+    def _backend_error(self, error: Exception):
+        # 캐시 테이블이 없을 때만 잠시 프로세스 내 캐시만 사용 (createcachetable 후 자동 복구)
+        # 잠금 등 일시적인 DB 오류는 기록만 하고 다음 요청에서 다시 시도
+        if _is_missing_table(error):
+            self._backend_disabled_until = time.time() + self.retry_after
+            logger.warning(f"명령어 설명 영구 캐시 사용 불가 (createcachetable 필요?), {self.retry_after}초 후 재시도: {error}")
+        else:
+            logger.warning(f"명령어 설명 영구 캐시 오류: {error}")
+
+    def clear_local(self):
+        with self._lock:
+            self._local.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self.local_hits + self.shared_hits
+            lookups = hits + self.misses
+            return {
+                'local_size': len(self._local),
+                'local_max_size': self.local_size,
+                'ttl': self.ttl,
+                'local_hits': self.local_hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'stores': self.stores,
+                'hit_rate': round(hits / lookups, 3) if lookups else 0.0,
+                'shared_backend_available': self._backend_available()
+            }
+
+
+_explanation_cache = None
+_explanation_cache_lock = threading.Lock()
+
+
+def get_explanation_cache() -> ExplanationCache:
+    """프로세스 전역 명령어 설명 캐시 반환"""
+    global _explanation_cache
+    if _explanation_cache is None:
+        with _explanation_cache_lock:
+            if _explanation_cache is None:
+                _explanation_cache = ExplanationCache()
+    return _explanation_cache
@@ -0,0 +1,169 @@
+import threading
+import time
+import logging
+from typing import Dict, Any
+
+import requests
+from django.conf import settings
+
+from .http_pool import get_http_pool
+from .residency import get_residency_manager
+from .circuit import get_circuit_breakers
+
+logger = logging.getLogger('xshell_chatbot')
+
+
+class OllamaHealthMonitor:
+    """Ollama 상태를 주기적으로 갱신하는 백그라운드 모니터
+
+    AIService는 요청마다 Ollama를 직접 확인하지 않고 여기서 마지막으로
+    확인된 상태(snapshot)만 읽는다.
+    """
+
+    def __init__(self, base_url: str = None, interval: float = None):
+        self.base_url = base_url or settings.OLLAMA_BASE_URL
+        self.interval = interval or getattr(settings, 'OLLAMA_HEALTH_CHECK_INTERVAL', 30)
+        self._state = {
+            'available': False,
+            'error_message': '',
+            'models': [],
+            'checked_at': None,
+            'functional_test_passed': False,
+        }
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """모니터 스레드 시작 (이미 실행 중이면 무시)"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run,
+                name='ollama-health-monitor',
+                daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def request_refresh(self):
+        """다음 주기를 기다리지 않고 즉시 재확인 요청 (연결 실패 시 호출)"""
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Ollama 상태 확인 중 오류: {e}")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def refresh(self) -> Dict[str, Any]:
+        """Ollama 상태를 실제로 확인하고 공유 상태 갱신"""
+        http = get_http_pool()
+        was_available = self._state['available']
+        state = {
+            'available': False,
+            'error_message': '',
+            'models': [],
+            'checked_at': time.time(),
+            'functional_test_passed': self._state['functional_test_passed'],
+        }
+
+        try:
+            # 1. 기본 연결 확인
+            response = http.get(f"{self.base_url}/", timeout=3)
+            if response.status_code != 200:
+                state['error_message'] = f"Ollama 서비스 응답 오류: {response.status_code}"
+                return self._publish(state)
+
+            # 2. API 엔드포인트 및 모델 확인
+            response = http.get(f"{self.base_url}/api/tags", timeout=5)
+            if response.status_code != 200:
+                state['error_message'] = f"Ollama API 오류: {response.status_code}"
+                return self._publish(state)
+
+            state['models'] = [
+                {'name': model['name'], 'size': model.get('size', 'Unknown')}
+                for model in response.json().get('models', [])
+            ]
+            if not state['models']:
+                state['error_message'] = "사용 가능한 모델이 없습니다"
+                return self._publish(state)
+            get_residency_manager().update_sizes(state['models'])
+
+            # 3. 간단한 동작 테스트 - 사용 불가 → 가능 전환 시에만 수행
+            if not was_available or not state['functional_test_passed']:
+                state['functional_test_passed'] = self._test_basic_functionality()
+
+            if state['functional_test_passed']:
+                state['available'] = True
+                if not was_available:
+                    # 복구 확인 - 차단 시간이 끝나기를 기다리지 않고 generate 회로를 닫음
+                    get_circuit_breakers(self.base_url).endpoint('generate').reset()
+            else:
+                state['error_message'] = "Ollama 기능 테스트 실패"
+
+        except requests.RequestException as e:
+            state['error_message'] = f"Ollama 연결 실패: {e}"
+            state['functional_test_passed'] = False
+        except Exception as e:
+            state['error_message'] = f"Ollama 초기화 오류: {e}"
+
+        return self._publish(state)
+
+    def _test_basic_functionality(self) -> bool:
+        """기본 기능 테스트"""
+        try:
+            # 가장 간단한 요청으로 테스트
+            response = get_http_pool().post(
+                f"{self.base_url}/api/generate",
+                json={
+                    "model": settings.DEFAULT_AI_MODEL,
+                    "prompt": "Hi",
+                    "stream": False,
+                    "keep_alive": get_residency_manager().keep_alive_for(settings.DEFAULT_AI_MODEL),
+                    "options": {
+                        "num_predict": 3,  # 매우 짧은 응답
+                        "temperature": 0.1
+                    }
+                },
+                timeout=10
+            )
+            return response.status_code == 200
+        except Exception:
+            return False
+
+    def _publish(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            if state['available'] != self._state['available']:
+                logger.info(f"Ollama 상태 변경: available={state['available']} {state['error_message']}")
+            self._state = state
+        return dict(state)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """마지막으로 확인된 상태 (네트워크 I/O 없음)"""
+        with self._lock:
+            return dict(self._state)
+
+
+_health_monitor = None
+_health_monitor_lock = threading.Lock()
+
+
+def get_health_monitor() -> OllamaHealthMonitor:
+    """프로세스 전역 상태 모니터 반환 (최초 호출 시 스레드 시작)"""
+    global _health_monitor
+    if _health_monitor is None:
+        with _health_monitor_lock:
+            if _health_monitor is None:
+                _health_monitor = OllamaHealthMonitor()
+                _health_monitor.start()
+    return _health_monitor
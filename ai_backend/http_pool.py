@@ -0,0 +1,159 @@
+import asyncio
+import threading
+import time
+import logging
+import weakref
+from typing import Dict, Any
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+logger = logging.getLogger('xshell_chatbot')
+
+
+class OllamaHTTPPool:
+    """Ollama 호스트별 keep-alive HTTP 세션 풀 (프로세스 전역, 스레드 안전)"""
+
+    def __init__(self, pool_size: int = None, idle_timeout: float = None):
+        self.pool_size = pool_size or getattr(settings, 'OLLAMA_HTTP_POOL_SIZE', 10)
+        self.idle_timeout = idle_timeout or getattr(settings, 'OLLAMA_HTTP_POOL_IDLE_TIMEOUT', 300)
+        self._sessions = {}  # host -> (session, adapter)
+        self._last_used = {}
+        self._lock = threading.Lock()
+        self._last_eviction = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _host_key(self, url: str) -> str:
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}"
+
+    def _create_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.pool_size,
+            max_retries=0
+        )
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session, adapter
+
+    def session_for(self, url: str) -> requests.Session:
+        """URL의 호스트에 해당하는 공유 세션 반환"""
+        host = self._host_key(url)
+        now = time.monotonic()
+
+        with self._lock:
+            if now - self._last_eviction > self.idle_timeout / 2:
+                self._evict_idle_locked(now)
+
+            entry = self._sessions.get(host)
+            if entry:
+                self.hits += 1
+            else:
+                self.misses += 1
+                entry = self._create_session()
+                self._sessions[host] = entry
+                logger.debug(f"Ollama HTTP 세션 생성: {host} (pool_size={self.pool_size})")
+
+            self._last_used[host] = now
+            return entry[0]
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        return self.session_for(url).request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def evict_idle(self):
+        """idle_timeout 이상 사용되지 않은 세션 정리"""
+        with self._lock:
+            self._evict_idle_locked(time.monotonic())
+
+    def _evict_idle_locked(self, now: float):
+        self._last_eviction = now
+        for host in [h for h, used in self._last_used.items() if now - used > self.idle_timeout]:
+            session, _ = self._sessions.pop(host)
+            del self._last_used[host]
+            session.close()
+            self.evictions += 1
+            logger.debug(f"유휴 Ollama HTTP 세션 정리: {host}")
+
+    def close_all(self):
+        with self._lock:
+            for session, _ in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+            self._last_used.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """세션/커넥션 재사용 통계"""
+        with self._lock:
+            hosts = {}
+            for host, (session, adapter) in self._sessions.items():
+                connections = 0
+                requests_sent = 0
+                pools = adapter.poolmanager.pools
+                for pool in [pools[key] for key in pools.keys()]:
+                    connections += pool.num_connections
+                    requests_sent += pool.num_requests
+                hosts[host] = {
+                    'connections_opened': connections,
+                    'requests': requests_sent,
+                    'connection_reuse': max(requests_sent - connections, 0),
+                    'idle_seconds': round(time.monotonic() - self._last_used[host], 1)
+                }
+
+            return {
+                'pool_size': self.pool_size,
+                'idle_timeout': self.idle_timeout,
+                'session_hits': self.hits,
+                'session_misses': self.misses,
+                'evictions': self.evictions,
+                'hosts': hosts
+            }
+
+
+_http_pool = None
+_http_pool_lock = threading.Lock()
+
+
+def get_http_pool() -> OllamaHTTPPool:
+    """프로세스 전역 HTTP 풀 반환"""
+    global _http_pool
+    if _http_pool is None:
+        with _http_pool_lock:
+            if _http_pool is None:
+                _http_pool = OllamaHTTPPool()
+    return _http_pool
+
+
+_async_clients = weakref.WeakKeyDictionary()  # 이벤트 루프 -> httpx.AsyncClient
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """현재 이벤트 루프에 묶인 공유 비동기 HTTP 클라이언트 반환
+
+    httpx.AsyncClient는 생성된 루프에서만 사용할 수 있으므로 루프별로 하나씩 둔다.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+
+    if client is None or client.is_closed:
+        limits = httpx.Limits(
+            max_connections=getattr(settings, 'OLLAMA_ASYNC_MAX_CONNECTIONS', 256),
+            max_keepalive_connections=getattr(settings, 'OLLAMA_HTTP_POOL_SIZE', 10),
+            keepalive_expiry=getattr(settings, 'OLLAMA_HTTP_POOL_IDLE_TIMEOUT', 300)
+        )
+        client = httpx.AsyncClient(limits=limits)
+        _async_clients[loop] = client
+
+    return client
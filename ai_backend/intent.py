@@ -0,0 +1,150 @@
+import re
+import platform
+from typing import Dict, List, Iterable
+
+IS_WINDOWS = platform.system().lower() == 'windows'
+
+# 공통 명령어 실행 키워드
+COMMAND_TRIGGER_KEYWORDS = ['실행', '명령어', 'execute', 'run', 'command', '터미널']
+
+# Unix/Linux 명령어 키워드
+UNIX_COMMAND_KEYWORDS = COMMAND_TRIGGER_KEYWORDS + [
+    'ls', 'cd', 'pwd', 'ps', 'kill', 'grep', 'find', 'cat',
+    'tail', 'head', 'chmod', 'chown', 'mkdir', 'rm', 'cp', 'mv',
+    'df', 'du', 'top', 'htop', 'free', 'uname', 'whoami', 'id',
+    'tar', 'gzip', 'wget', 'curl', 'ssh', 'scp', 'rsync'
+]
+
+# Windows 명령어 키워드
+WINDOWS_COMMAND_KEYWORDS = COMMAND_TRIGGER_KEYWORDS + [
+    # Windows 특화 명령어
+    'dir', 'cls', 'type', 'copy', 'del', 'md', 'rd', 'cd', 'pushd', 'popd',
+    'tasklist', 'taskkill', 'systeminfo', 'ipconfig', 'netstat', 'ping',
+    # PowerShell 명령어
+    'get-process', 'get-service', 'get-childitem', 'get-location',
+    'set-location', 'new-item', 'remove-item', 'copy-item', 'move-item',
+    'get-content', 'set-content', 'select-string', 'measure-object',
+    'where-object', 'foreach-object', 'get-wmiobject', 'get-computerinfo'
+]
+
+# 코드 분석 관련 키워드
+CODE_KEYWORDS = [
+    '코드', 'code', '스크립트', 'script', '분석', 'analyze',
+    '디버그', 'debug', '오류', 'error', '버그', 'bug', 'exception',
+    'python', 'java', 'javascript', 'c++', 'c#', 'go', 'rust'
+]
+
+# 시스템 관리 관련 키워드
+SYSTEM_KEYWORDS = [
+    '시스템', 'system', '서버', 'server', '모니터링', 'monitoring',
+    '성능', 'performance', '로그', 'log', '설정', 'config',
+    '네트워크', 'network', '방화벽', 'firewall', '보안', 'security'
+]
+
+# 영문 키워드 토큰 (한글 조사나 공백, 구두점은 경계로 취급)
+_ASCII_TOKEN = re.compile(r'[a-z0-9_\-+#]+')
+
+# 굴절형을 원형으로 돌릴 영문 접미사 (긴 것부터)
+_ASCII_SUFFIXES = ('ing', 'es', 'ed', 's')
+
+# 굴절형 매칭을 허용할 최소 키워드 길이 - "goes"가 'go'로, "ids"가 'id'로 읽히지 않도록
+_MIN_STEM_KEYWORD = 3
+
+
+def _stem_candidates(token: str) -> List[str]:
+    """영문 토큰의 원형 후보 (bugs -> bug, running -> run, analyzed -> analyze)"""
+    candidates = []
+    for suffix in _ASCII_SUFFIXES:
+        if not token.endswith(suffix):
+            continue
+        base = token[:-len(suffix)]
+        if len(base) < _MIN_STEM_KEYWORD - 1:
+            continue
+        candidates.append(base)
+        if suffix in ('ing', 'ed', 'es'):
+            candidates.append(base + 'e')
+            if len(base) > 2 and base[-1] == base[-2]:
+                candidates.append(base[:-1])
+    return candidates
+
+
+class IntentMatcher:
+    """키워드 카테고리를 한 번에 매칭하는 사전 컴파일 매처
+
+    영문 키워드는 메시지를 한 번 토큰화한 뒤 사전 조회로 매칭해 단어 경계에서만
+    인정하고 ('ls'가 "also"에, 'go'가 "good"에 매칭되지 않도록), 조사가 붙는
+    한글 키워드만 부분 문자열로 확인한다. 세 글자 이상 영문 키워드는 복수형,
+    -ing/-ed 형도 원형으로 돌려 매칭한다 ("bugs", "failing commands").
+    """
+
+    def __init__(self, categories: Dict[str, Iterable[str]]):
+        self.categories = list(categories)
+        self._ascii_keywords: Dict[str, List[str]] = {}
+        self._hangul_keywords: Dict[str, List[str]] = {}
+        for category, keywords in categories.items():
+            for keyword in keywords:
+                keyword = keyword.lower()
+                table = self._ascii_keywords if keyword.isascii() else self._hangul_keywords
+                table.setdefault(keyword, []).append(category)
+        self._hangul_items = list(self._hangul_keywords.items())
+
+    def match(self, message: str) -> Dict[str, List[str]]:
+        """카테고리별로 매칭된 키워드 목록"""
+        message_lower = message.lower()
+        matches: Dict[str, List[str]] = {}
+
+        if message.isascii():
+            hangul_items = ()
+        else:
+            hangul_items = self._hangul_items
+
+        for keyword, categories in hangul_items:
+            if keyword in message_lower:
+                for category in categories:
+                    matches.setdefault(category, []).append(keyword)
+
+        ascii_keywords = self._ascii_keywords
+        for token in set(_ASCII_TOKEN.findall(message_lower)):
+            keyword = token
+            categories = ascii_keywords.get(token)
+            if categories is None:
+                for keyword in _stem_candidates(token):
+                    if len(keyword) >= _MIN_STEM_KEYWORD:
+                        categories = ascii_keywords.get(keyword)
+                        if categories is not None:
+                            break
+                if categories is None:
+                    continue
+            for category in categories:
+                keywords = matches.setdefault(category, [])
+                if keyword not in keywords:
+                    keywords.append(keyword)
+
+        return matches
+
+    def scores(self, message: str) -> Dict[str, float]:
+        """카테고리별 점수 - 서로 다른 키워드가 많이 매칭될수록 높음 (0~1)"""
+        return {
+            category: round(1 - 0.5 ** len(keywords), 3)
+            for category, keywords in self.match(message).items()
+        }
+
+
+UNIX_INTENT_MATCHER = IntentMatcher({
+    'command_execution': UNIX_COMMAND_KEYWORDS,
+    'code_analysis': CODE_KEYWORDS,
+    'system_admin': SYSTEM_KEYWORDS,
+})
+
+WINDOWS_INTENT_MATCHER = IntentMatcher({
+    'command_execution': WINDOWS_COMMAND_KEYWORDS,
+    'code_analysis': CODE_KEYWORDS,
+    'system_admin': SYSTEM_KEYWORDS,
+})
+
+
+def get_intent_matcher(shell_type: str = None) -> IntentMatcher:
+    """OS/Shell 종류에 맞는 매처 반환"""
+    if IS_WINDOWS or shell_type in ['powershell', 'cmd']:
+        return WINDOWS_INTENT_MATCHER
+    return UNIX_INTENT_MATCHER
@@ -0,0 +1,166 @@
+import threading
+import logging
+from typing import Callable, Dict, List, NamedTuple
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger('xshell_chatbot')
+
+# 메시지 하나당 role/구분자 등에 붙는 대략의 토큰 수
+MESSAGE_OVERHEAD_TOKENS = 4
+TRUNCATION_MARK = '\n...(중략)...\n'
+
+
+def approximate_tokens(text: str) -> int:
+    """빠른 토큰 수 근사 - 영문/숫자는 4글자당 1토큰, 한글 등 그 외 문자는 글자당 1토큰"""
+    if not text:
+        return 0
+    ascii_length = len(text.encode('ascii', 'ignore'))
+    return (ascii_length + 3) // 4 + (len(text) - ascii_length)
+
+
+_tokenizer = None
+_tokenizer_lock = threading.Lock()
+
+
+def get_tokenizer() -> Callable[[str], int]:
+    """PROMPT_TOKENIZER(점 경로의 text -> 토큰 수 함수)가 있으면 사용, 없으면 근사치"""
+    global _tokenizer
+    if _tokenizer is None:
+        with _tokenizer_lock:
+            if _tokenizer is None:
+                path = getattr(settings, 'PROMPT_TOKENIZER', '')
+                tokenizer = approximate_tokens
+                if path:
+                    try:
+                        tokenizer = import_string(path)
+                    except ImportError as e:
+                        logger.warning(f"토크나이저 {path} 로드 실패, 근사치 사용: {e}")
+                _tokenizer = tokenizer
+    return _tokenizer
+
+
+def context_tokens_for(model: str) -> int:
+    """모델의 컨텍스트 길이 (MODEL_CONTEXT_TOKENS에 없으면 OLLAMA_CONTEXT_LENGTH)"""
+    overrides = getattr(settings, 'MODEL_CONTEXT_TOKENS', {})
+    return overrides.get(model) or getattr(settings, 'OLLAMA_CONTEXT_LENGTH', 4096)
+
+
+class PromptPlan(NamedTuple):
+    messages: List[Dict[str, str]]
+    tokens: int
+    dropped: int
+
+
+class PromptBuilder:
+    """모델 컨텍스트 길이에 맞춰 시스템 프롬프트 + 최근 대화 + 현재 메시지를 채우는 빌더
+
+    최신 대화부터 거꾸로 예산이 남는 동안 담고, 오래된 대화는 버린다.
+    대화 창의 system 항목(이전 대화 요약)은 버리지 않고 항상 앞에 둔다.
+    긴 명령어 출력처럼 한 메시지가 너무 크면 앞/뒤만 남겨 한 턴이 예산을 독차지하지 않게 한다.
+    """
+
+    def __init__(self, model: str, context_tokens: int = None, reserve_tokens: int = None,
+                 count_tokens: Callable[[str], int] = None):
+        self.model = model
+        self.context_tokens = context_tokens or context_tokens_for(model)
+        self.reserve_tokens = reserve_tokens or getattr(settings, 'PROMPT_RESPONSE_RESERVE', 512)
+        self.count_tokens = count_tokens or get_tokenizer()
+
+    @property
+    def budget(self) -> int:
+        """프롬프트에 쓸 수 있는 토큰 수 (응답 몫 제외)"""
+        return max(self.context_tokens - self.reserve_tokens, 0)
+
+    @property
+    def message_limit(self) -> int:
+        """이전 대화 메시지 하나가 차지할 수 있는 최대 토큰 수"""
+        return max(self.budget // 4, 64)
+
+    def fit(self, text: str, max_tokens: int) -> str:
+        """max_tokens에 맞게 앞부분과 끝부분만 남김 (출력의 끝에 결과가 있는 경우가 많음)"""
+        tokens = self.count_tokens(text)
+        if tokens <= max_tokens:
+            return text
+        keep = max(int(len(text) * max_tokens / tokens) - len(TRUNCATION_MARK), 0)
+        head = keep * 2 // 3
+        tail = keep - head
+        return text[:head] + TRUNCATION_MARK + (text[-tail:] if tail else '')
+
+    def _pack_history(self, history: List[Dict[str, str]], available: int) -> tuple:
+        """최신 대화부터 available 토큰 안에서 담기 - (시간순 메시지, 사용 토큰, 버린 수)"""
+        packed = []
+        used = 0
+        for index in range(len(history) - 1, -1, -1):
+            entry = history[index]
+            content = self.fit(entry['content'], self.message_limit)
+            cost = self.count_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+            if used + cost > available:
+                return list(reversed(packed)), used, index + 1
+            packed.append({'role': entry['role'], 'content': content})
+            used += cost
+        return list(reversed(packed)), used, 0
+
+    def _split(self, history: List[Dict[str, str]], message: str) -> tuple:
+        """(고정 항목, 대화) - 요약은 예산의 1/4까지, 현재 메시지는 대화에서 제외"""
+        pinned = [
+            {'role': 'system', 'content': self.fit(entry['content'], self.budget // 4)}
+            for entry in history if entry['role'] == 'system'
+        ]
+        turns = [entry for entry in history if entry['role'] != 'system']
+        # 현재 메시지는 저장 후 처리되므로 대화 창의 마지막에 이미 들어 있을 수 있음
+        if turns and turns[-1]['role'] == 'user' and turns[-1]['content'] == message:
+            turns = turns[:-1]
+        return pinned, turns
+
+    def _tokens(self, entries: List[Dict[str, str]]) -> int:
+        return sum(self.count_tokens(entry['content']) + MESSAGE_OVERHEAD_TOKENS for entry in entries)
+
+    def build_chat_messages(self, history: List[Dict[str, str]], message: str,
+                            system_prompt: str = '') -> PromptPlan:
+        """/api/chat용 메시지 목록"""
+        pinned, turns = self._split(history or [], message)
+        message = self.fit(message, self.budget // 2)
+        used = self.count_tokens(message) + MESSAGE_OVERHEAD_TOKENS + self._tokens(pinned)
+        if system_prompt:
+            used += self.count_tokens(system_prompt) + MESSAGE_OVERHEAD_TOKENS
+
+        packed, history_tokens, dropped = self._pack_history(turns, self.budget - used)
+
+        messages = [{'role': 'system', 'content': system_prompt}] if system_prompt else []
+        messages += pinned + packed
+        messages.append({'role': 'user', 'content': message})
+        return PromptPlan(messages, used + history_tokens, dropped)
+
+    def build_context_text(self, history: List[Dict[str, str]], message: str,
+                           system_prompt: str = '', template_tokens: int = 150) -> str:
+        """/api/generate 프롬프트에 넣을 '사용자: ... / AI: ...' 형식의 대화 요약문"""
+        pinned, turns = self._split(history or [], message)
+        used = self.count_tokens(system_prompt) + self.count_tokens(message) + template_tokens + self._tokens(pinned)
+        packed, _, dropped = self._pack_history(turns, self.budget - used)
+        if not packed and not pinned:
+            return "이전 대화 없음"
+
+        lines = [entry['content'] for entry in pinned]
+        if dropped:
+            lines.append(f"(이전 대화 {dropped}개 생략)")
+        for entry in packed:
+            role = "사용자" if entry['role'] == 'user' else "AI"
+            lines.append(f"{role}: {entry['content']}")
+        return "\n".join(lines)
+
+
+_builders: Dict[str, PromptBuilder] = {}
+_builders_lock = threading.Lock()
+
+
+def get_prompt_builder(model: str) -> PromptBuilder:
+    """모델별 프롬프트 빌더 반환"""
+    builder = _builders.get(model)
+    if builder is None:
+        with _builders_lock:
+            builder = _builders.get(model)
+            if builder is None:
+                builder = _builders[model] = PromptBuilder(model)
+    return builder
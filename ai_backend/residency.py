@@ -0,0 +1,200 @@
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Union
+
+from django.conf import settings
+
+from .http_pool import get_http_pool
+
+logger = logging.getLogger('xshell_chatbot')
+
+RESIDENCY_POLICIES = ('pin', 'lru', 'memory')
+KEEP_FOREVER = -1
+
+
+class ModelResidencyManager:
+    """Ollama 모델 상주 관리 - 어떤 모델을 메모리에 계속 올려 둘지 결정
+
+    모든 요청에 keep_alive를 명시해 Ollama 기본값(5분)으로 모델이 내려가지 않게 한다.
+    - pin: OLLAMA_PINNED_MODELS만 계속 상주
+    - lru: 최근 사용한 OLLAMA_MAX_HOT_MODELS개 상주
+    - memory: 최근 사용 순으로 OLLAMA_MEMORY_BUDGET_GB 안에 들어가는 모델 상주
+    상주 대상에서 빠진 모델은 keep_alive=0 요청으로 바로 내려 다음 모델이 올라갈 자리를 만든다.
+    """
+
+    def __init__(self, base_url: str = None, policy: str = None, pinned: List[str] = None,
+                 max_hot: int = None, memory_budget_gb: float = None, idle_keep_alive: str = None):
+        self.base_url = base_url or settings.OLLAMA_BASE_URL
+        self.policy = policy or getattr(settings, 'OLLAMA_RESIDENCY_POLICY', 'pin')
+        if self.policy not in RESIDENCY_POLICIES:
+            logger.warning(f"알 수 없는 모델 상주 정책 '{self.policy}', pin 사용")
+            self.policy = 'pin'
+        self.pinned = pinned if pinned is not None else getattr(
+            settings, 'OLLAMA_PINNED_MODELS', [settings.DEFAULT_AI_MODEL, settings.CODE_AI_MODEL]
+        )
+        self.max_hot = max_hot or getattr(settings, 'OLLAMA_MAX_HOT_MODELS', 2)
+        self.memory_budget = (memory_budget_gb or getattr(settings, 'OLLAMA_MEMORY_BUDGET_GB', 24)) * 1024 ** 3
+        self.idle_keep_alive = idle_keep_alive or getattr(settings, 'OLLAMA_KEEP_ALIVE', '5m')
+        self._recent: 'OrderedDict[str, float]' = OrderedDict()  # model -> 마지막 사용 시각 (오래된 순)
+        self._sizes: Dict[str, int] = {}
+        self._hot: List[str] = self._compute_hot()
+        self._lock = threading.Lock()
+        self._loaded: List[Dict[str, Any]] = []
+        self._loaded_checked_at = None
+        self.warmed_up: Dict[str, Optional[float]] = {}  # model -> 로드 소요 시간 (실패 시 None)
+        self.unloads = 0
+
+    def _compute_hot(self) -> List[str]:
+        if self.policy == 'pin':
+            return list(self.pinned)
+
+        recent = list(reversed(self._recent))  # 최근 사용 순
+        if self.policy == 'lru':
+            return recent[:self.max_hot]
+
+        hot = []
+        used = 0
+        for model in recent:
+            size = self._sizes.get(model, 0)
+            if hot and used + size > self.memory_budget:
+                continue
+            hot.append(model)
+            used += size
+        return hot
+
+    def keep_alive_for(self, model: str) -> Union[int, str]:
+        """요청에 넣을 keep_alive 값 (사용 기록도 갱신)"""
+        self.note_used(model)
+        with self._lock:
+            return KEEP_FOREVER if model in self._hot else self.idle_keep_alive
+
+    def note_used(self, model: str):
+        """모델 사용 기록 - 상주 대상이 바뀌면 빠진 모델을 내림"""
+        with self._lock:
+            self._recent[model] = time.time()
+            self._recent.move_to_end(model)
+            while len(self._recent) > 32:
+                self._recent.popitem(last=False)
+            if self.policy == 'pin':
+                return
+            previous = self._hot
+            self._hot = self._compute_hot()
+            evicted = [m for m in previous if m not in self._hot]
+
+        for evicted_model in evicted:
+            threading.Thread(target=self.unload, args=(evicted_model,), daemon=True).start()
+
+    def update_sizes(self, models: List[Dict[str, Any]]):
+        """/api/tags 모델 크기 반영 (memory 정책용)"""
+        with self._lock:
+            for model in models:
+                if isinstance(model.get('size'), int):
+                    self._sizes[model['name']] = model['size']
+
+    def unload(self, model: str):
+        """모델을 즉시 메모리에서 내림 (keep_alive=0)"""
+        try:
+            get_http_pool().post(
+                f"{self.base_url}/api/generate",
+                json={"model": model, "keep_alive": 0},
+                timeout=10
+            )
+            self.unloads += 1
+            logger.info(f"상주 대상에서 빠진 모델 내림: {model}")
+        except Exception as e:
+            logger.warning(f"모델 {model} 내리기 실패: {e}")
+
+    def warm_up(self, models: List[str] = None) -> Dict[str, Optional[float]]:
+        """모델을 미리 메모리에 올림 (프롬프트 없는 generate 요청은 로드만 수행)"""
+        results = {}
+        for model in models or self.warmup_models():
+            started = time.time()
+            try:
+                response = get_http_pool().post(
+                    f"{self.base_url}/api/generate",
+                    json={"model": model, "keep_alive": self.keep_alive_for(model)},
+                    timeout=300
+                )
+                elapsed = round(time.time() - started, 2) if response.status_code == 200 else None
+            except Exception as e:
+                logger.warning(f"모델 {model} 예열 실패: {e}")
+                elapsed = None
+            results[model] = elapsed
+            if elapsed is not None:
+                logger.info(f"모델 예열 완료: {model} ({elapsed}초)")
+        self.warmed_up.update(results)
+        return results
+
+    def warmup_models(self) -> List[str]:
+        configured = getattr(settings, 'OLLAMA_WARMUP_MODELS', None)
+        if configured:
+            return list(configured)
+        return list(self.pinned) if self.policy == 'pin' else [settings.DEFAULT_AI_MODEL]
+
+    def start_warm_up(self, wait_timeout: float = 300):
+        """Ollama가 사용 가능해지면 백그라운드에서 예열"""
+        def run():
+            from .health import get_health_monitor
+
+            deadline = time.time() + wait_timeout
+            while time.time() < deadline:
+                if get_health_monitor().snapshot()['available']:
+                    self.warm_up()
+                    return
+                time.sleep(2)
+            logger.warning("Ollama가 사용 가능해지지 않아 모델 예열을 건너뜀")
+
+        threading.Thread(target=run, name='ollama-warm-up', daemon=True).start()
+
+    def loaded_models(self) -> List[Dict[str, Any]]:
+        """현재 Ollama에 올라가 있는 모델 (/api/ps)"""
+        try:
+            response = get_http_pool().get(f"{self.base_url}/api/ps", timeout=3)
+            if response.status_code == 200:
+                loaded = [
+                    {
+                        'name': model['name'],
+                        'size_vram': model.get('size_vram'),
+                        'expires_at': model.get('expires_at')
+                    }
+                    for model in response.json().get('models', [])
+                ]
+                with self._lock:
+                    self._loaded = loaded
+                    self._loaded_checked_at = time.time()
+        except Exception as e:
+            logger.debug(f"/api/ps 조회 실패: {e}")
+        with self._lock:
+            return list(self._loaded)
+
+    def stats(self, refresh: bool = False) -> Dict[str, Any]:
+        loaded = self.loaded_models() if refresh else None
+        with self._lock:
+            return {
+                'policy': self.policy,
+                'hot_models': list(self._hot),
+                'idle_keep_alive': self.idle_keep_alive,
+                'recent_models': list(reversed(self._recent)),
+                'loaded_models': loaded if loaded is not None else list(self._loaded),
+                'loaded_checked_at': self._loaded_checked_at,
+                'warmed_up': dict(self.warmed_up),
+                'unloads': self.unloads
+            }
+
+
+_residency_manager = None
+_residency_manager_lock = threading.Lock()
+
+
+def get_residency_manager() -> ModelResidencyManager:
+    """프로세스 전역 모델 상주 관리자 반환 (OLLAMA_WARMUP이면 최초 호출 시 예열 시작)"""
+    global _residency_manager
+    if _residency_manager is None:
+        with _residency_manager_lock:
+            if _residency_manager is None:
+                _residency_manager = ModelResidencyManager()
+                if getattr(settings, 'OLLAMA_WARMUP', True):
+                    _residency_manager.start_warm_up()
+    return _residency_manager
@@ -1,12 +1,27 @@
 import requests
+import httpx
 import json
 import re
 import logging
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Callable, Awaitable, Generator, AsyncGenerator, Iterator, AsyncIterator
 from django.conf import settings
-from django.core.cache import cache
+from asgiref.sync import sync_to_async
 
 from chatbot.models import ChatSession, ChatMessage, AIModel
+from chatbot.session_context import get_session_context_store
+from xshell_integration.command_policy import is_dangerous_command
+from xshell_integration.speculative import get_speculative_executor
+from .http_pool import get_http_pool, get_async_http_client
+from .health import get_health_monitor
+from .intent import get_intent_matcher
+from .command_index import get_command_index, SEED_PHRASES
+from .explain_cache import get_explanation_cache
+from .prompt_budget import get_prompt_builder
+from .summarizer import get_conversation_summarizer
+from .residency import get_residency_manager
+from .admission import get_admission_controller, llm_priority, PRIORITY_BACKGROUND
+from .coalesce import get_single_flight, flight_key
+from .circuit import get_circuit_breakers, CircuitOpenError, UNSUPPORTED_RETRY_SECONDS
 
 logger = logging.getLogger('xshell_chatbot')
 
@@ -18,19 +33,48 @@ class OllamaClient:
         self.base_url = base_url or settings.OLLAMA_BASE_URL
         self.model = model or settings.DEFAULT_AI_MODEL
         self.timeout = 30
+        self.http = get_http_pool()
     
-    def generate(self, prompt: str, system_prompt: str = "", stream: bool = False) -> Dict[str, Any]:
-        """텍스트 생성 - 안전한 오류 처리 포함"""
+    def _slot(self):
+        """Ollama 호출 슬롯 - 모델별 동시 실행 수 제한, 없으면 우선순위대로 대기"""
+        return get_admission_controller().slot(self.model)
+    
+    def _breaker(self, endpoint: str):
+        """엔드포인트(chat/generate)별 회로 차단기"""
+        return get_circuit_breakers(self.base_url).endpoint(endpoint)
+    
+    def _record_status(self, endpoint: str, status_code: int):
+        """응답 상태를 회로 차단기에 반영 - 5xx만 서버 장애로 봄"""
+        if status_code >= 500:
+            self._breaker(endpoint).record_failure(f"/api/{endpoint} 코드 {status_code}")
+        else:
+            self._breaker(endpoint).record_success()
+    
+    def _connection_failed(self):
+        """연결 실패 - 상태 재확인을 요청하고 모든 엔드포인트 회로에 반영"""
+        get_health_monitor().request_refresh()
+        get_circuit_breakers(self.base_url).record_connection_failure("연결할 수 없음")
+    
+    def _record_chat_status(self, status_code: int):
+        """/api/chat 응답 상태 반영 - 엔드포인트가 없으면(404) 한동안 바로 generate 사용"""
+        if status_code == 404:
+            self._breaker('chat').trip("/api/chat 엔드포인트 없음", UNSUPPORTED_RETRY_SECONDS)
+        else:
+            self._record_status('chat', status_code)
+    
+    def _generate_payload(self, prompt: str, system_prompt: str, stream: bool) -> Dict[str, Any]:
+        """/api/generate 요청 본문 생성"""
         
         # 입력 검증
         if not prompt.strip():
             raise Exception("빈 프롬프트는 처리할 수 없습니다")
         
-        payload = {
+        return {
             "model": self.model,
             "prompt": prompt.strip(),
             "system": system_prompt,
             "stream": stream,
+            "keep_alive": get_residency_manager().keep_alive_for(self.model),
             "options": {
                 "temperature": 0.7,
                 "top_p": 0.9,
@@ -39,113 +83,256 @@ class OllamaClient:
                 "stop": ["\n\n\n"]  # 과도한 빈 줄 방지
             }
         }
-        
-        try:
-            response = requests.post(
-                f"{self.base_url}/api/generate",
-                json=payload,
-                timeout=self.timeout
-            )
-            
-            # 상태 코드별 구체적인 오류 처리
-            if response.status_code == 404:
-                raise Exception("Ollama generate API를 찾을 수 없습니다. Ollama 설치를 확인하세요.")
-            elif response.status_code == 500:
-                raise Exception(f"Ollama 내부 오류가 발생했습니다. 모델 '{self.model}'이 손상되었거나 메모리가 부족할 수 있습니다.")
-            elif response.status_code == 400:
-                raise Exception(f"잘못된 요청입니다. 모델 '{self.model}'이 존재하지 않을 수 있습니다.")
-            elif response.status_code != 200:
-                raise Exception(f"Ollama API 오류 (코드: {response.status_code}): {response.text}")
-            
-            if stream:
-                return response
-            else:
-                result = response.json()
-                
-                # 응답 검증
-                if not result.get('response'):
-                    raise Exception("Ollama에서 빈 응답을 반환했습니다")
-                
-                return result
-                
-        except requests.Timeout:
-            raise Exception(f"Ollama 응답 시간 초과 ({self.timeout}초). 더 작은 모델을 사용하거나 시간 제한을 늘려보세요.")
-        except requests.ConnectionError:
-            raise Exception("Ollama 서비스에 연결할 수 없습니다. 'ollama serve' 명령어로 서비스를 시작하세요.")
-        except requests.RequestException as e:
-            logger.error(f"Ollama API 호출 실패: {e}")
-            raise Exception(f"AI 서비스 오류: {e}")
-        except json.JSONDecodeError:
-            raise Exception("Ollama에서 잘못된 응답 형식을 반환했습니다")
-        except Exception as e:
-            if "AI 서비스" in str(e) or "Ollama" in str(e):
-                raise e
-            else:
-                raise Exception(f"예상치 못한 오류가 발생했습니다: {e}")
     
-    def chat(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
-        """채팅 형식 생성 - /api/chat 또는 /api/generate 사용"""
+    def _chat_payload(self, messages: List[Dict[str, str]], stream: bool) -> Dict[str, Any]:
+        """/api/chat 요청 본문 생성"""
         
         # 입력 검증
         if not messages or not isinstance(messages, list):
             raise Exception("유효한 메시지 목록이 필요합니다")
         
-        # 첫 번째 시도: /api/chat (최신 버전)
-        chat_payload = {
+        return {
             "model": self.model,
             "messages": messages,
-            "stream": False,
+            "stream": stream,
+            "keep_alive": get_residency_manager().keep_alive_for(self.model),
             "options": {
                 "temperature": 0.7,
                 "num_predict": 500
             }
         }
+    
+    def _check_generate_status(self, status_code: int, text: str = ''):
+        """/api/generate 상태 코드별 구체적인 오류 처리"""
+        if status_code == 404:
+            raise Exception("Ollama generate API를 찾을 수 없습니다. Ollama 설치를 확인하세요.")
+        elif status_code == 500:
+            raise Exception(f"Ollama 내부 오류가 발생했습니다. 모델 '{self.model}'이 손상되었거나 메모리가 부족할 수 있습니다.")
+        elif status_code == 400:
+            raise Exception(f"잘못된 요청입니다. 모델 '{self.model}'이 존재하지 않을 수 있습니다.")
+        elif status_code != 200:
+            raise Exception(f"Ollama API 오류 (코드: {status_code}): {text}")
+    
+    def _validate_generate_result(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        # 응답 검증
+        if not result.get('response'):
+            raise Exception("Ollama에서 빈 응답을 반환했습니다")
         
-        try:
-            response = requests.post(
-                f"{self.base_url}/api/chat",
-                json=chat_payload,
-                timeout=self.timeout
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                # 응답 형식 검증
-                if result.get('message', {}).get('content'):
-                    return result
+        return result
+    
+    def _flight_key(self, endpoint: str, payload: Dict[str, Any]) -> str:
+        return flight_key(f"{self.base_url}/api/{endpoint}", payload)
+    
+    def generate(self, prompt: str, system_prompt: str = "", stream: bool = False) -> Dict[str, Any]:
+        """텍스트 생성 - 진행 중인 동일 요청이 있으면 그 결과를 함께 사용"""
+        if stream:
+            return self._generate_upstream(prompt, system_prompt, stream=True)
+        key = self._flight_key('generate', self._generate_payload(prompt, system_prompt, False))
+        return get_single_flight().do(key, lambda: self._generate_upstream(prompt, system_prompt))
+    
+    def chat(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        """채팅 형식 생성 - 진행 중인 동일 요청이 있으면 그 결과를 함께 사용"""
+        key = self._flight_key('chat', self._chat_payload(messages, stream=False))
+        return get_single_flight().do(key, lambda: self._chat_upstream(messages))
+    
+    def generate_stream(self, prompt: str, system_prompt: str = "") -> Iterator[str]:
+        """/api/generate 토큰 스트림 - 동일 요청이 진행 중이면 같은 스트림을 함께 구독"""
+        key = self._flight_key('generate', self._generate_payload(prompt, system_prompt, True))
+        return get_single_flight().stream(key, lambda: self._generate_stream_upstream(prompt, system_prompt))
+    
+    def chat_stream(self, messages: List[Dict[str, str]]) -> Iterator[str]:
+        """/api/chat 토큰 스트림 - 동일 요청이 진행 중이면 같은 스트림을 함께 구독"""
+        key = self._flight_key('chat', self._chat_payload(messages, stream=True))
+        return get_single_flight().stream(key, lambda: self._chat_stream_upstream(messages))
+    
+    def _generate_upstream(self, prompt: str, system_prompt: str = "", stream: bool = False) -> Dict[str, Any]:
+        """텍스트 생성 - 안전한 오류 처리 포함"""
+        
+        # Ollama 장애 중이면 연결을 기다리지 않고 바로 실패
+        self._breaker('generate').check()
+        with self._slot():
+            payload = self._generate_payload(prompt, system_prompt, stream)
+            
+            try:
+                response = self.http.post(
+                    f"{self.base_url}/api/generate",
+                    json=payload,
+                    timeout=self.timeout,
+                    stream=stream
+                )
+                self._record_status('generate', response.status_code)
+                
+                # 상태 코드별 구체적인 오류 처리
+                self._check_generate_status(response.status_code, response.text if response.status_code != 200 else '')
+                
+                if stream:
+                    return response
                 else:
-                    logger.warning("Chat API에서 빈 응답 반환, generate로 폴백")
-                    return self._fallback_to_generate(messages)
+                    return self._validate_generate_result(response.json())
                     
-            elif response.status_code == 404:
-                # /api/chat이 없으면 /api/generate로 폴백
-                logger.info("Ollama /api/chat 엔드포인트가 없음, /api/generate 사용")
-                return self._fallback_to_generate(messages)
-                
-            elif response.status_code == 500:
-                logger.warning("Chat API 500 오류, generate로 폴백 시도")
-                return self._fallback_to_generate(messages)
+            except requests.Timeout:
+                self._breaker('generate').record_failure("응답 시간 초과")
+                raise Exception(f"Ollama 응답 시간 초과 ({self.timeout}초). 더 작은 모델을 사용하거나 시간 제한을 늘려보세요.")
+            except requests.ConnectionError:
+                self._connection_failed()
+                raise Exception("Ollama 서비스에 연결할 수 없습니다. 'ollama serve' 명령어로 서비스를 시작하세요.")
+            except requests.RequestException as e:
+                self._breaker('generate').record_failure(str(e))
+                logger.error(f"Ollama API 호출 실패: {e}")
+                raise Exception(f"AI 서비스 오류: {e}")
+            except json.JSONDecodeError:
+                raise Exception("Ollama에서 잘못된 응답 형식을 반환했습니다")
+            except Exception as e:
+                if "AI 서비스" in str(e) or "Ollama" in str(e):
+                    raise e
+                else:
+                    raise Exception(f"예상치 못한 오류가 발생했습니다: {e}")
+    
+    def _chat_upstream(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        """채팅 형식 생성 - /api/chat 또는 /api/generate 사용"""
+        
+        # /api/chat이 없거나 장애 중이면 매번 시도하지 않고 바로 generate 사용
+        if not self._breaker('chat').allow():
+            return self._fallback_to_generate(messages)
+        
+        # 첫 번째 시도: /api/chat (최신 버전)
+        # 폴백은 슬롯을 놓은 뒤 호출 - 슬롯을 쥔 채 generate를 부르면 같은 요청을 합쳐 기다리는 동안
+        # 그 요청이 이 슬롯을 기다리는 순환 대기가 생김
+        with self._slot():
+            chat_payload = self._chat_payload(messages, stream=False)
+            
+            try:
+                response = self.http.post(
+                    f"{self.base_url}/api/chat",
+                    json=chat_payload,
+                    timeout=self.timeout
+                )
+                self._record_chat_status(response.status_code)
                 
-            else:
-                # 다른 오류는 즉시 발생
-                if response.status_code == 400:
-                    raise Exception(f"잘못된 채팅 요청입니다. 모델 '{self.model}'을 확인하세요.")
+                if response.status_code == 200:
+                    result = response.json()
+                    # 응답 형식 검증
+                    if result.get('message', {}).get('content'):
+                        return result
+                    else:
+                        logger.warning("Chat API에서 빈 응답 반환, generate로 폴백")
+                        
+                elif response.status_code == 404:
+                    # /api/chat이 없으면 /api/generate로 폴백
+                    logger.info("Ollama /api/chat 엔드포인트가 없음, /api/generate 사용")
+                    
+                elif response.status_code == 500:
+                    logger.warning("Chat API 500 오류, generate로 폴백 시도")
+                    
                 else:
+                    # 다른 오류는 즉시 발생
+                    if response.status_code == 400:
+                        raise Exception(f"잘못된 채팅 요청입니다. 모델 '{self.model}'을 확인하세요.")
+                    else:
+                        raise Exception(f"Chat API 오류 (코드: {response.status_code}): {response.text}")
+                    
+            except requests.Timeout:
+                self._breaker('chat').record_failure("응답 시간 초과")
+                logger.warning("Chat API 시간 초과, generate로 폴백")
+            except requests.ConnectionError:
+                self._connection_failed()
+                raise Exception("Ollama 서비스에 연결할 수 없습니다. 'ollama serve' 명령어로 서비스를 시작하세요.")
+            except requests.RequestException as e:
+                self._breaker('chat').record_failure(str(e))
+                logger.warning(f"Chat API 실패, generate로 폴백: {e}")
+        
+        # 여기까지 오면 chat 실패 - 슬롯을 놓은 상태에서 generate로 폴백
+        return self._fallback_to_generate(messages)
+    
+    def _generate_stream_upstream(self, prompt: str, system_prompt: str = "") -> Generator[str, None, None]:
+        """/api/generate NDJSON 스트림을 토큰 청크 단위로 반환"""
+        with self._slot():
+            response = self._generate_upstream(prompt, system_prompt, stream=True)
+            try:
+                yield from self._iter_ndjson(response, lambda chunk: chunk.get('response', ''))
+            finally:
+                response.close()
+    
+    def _chat_stream_upstream(self, messages: List[Dict[str, str]]) -> Generator[str, None, None]:
+        """/api/chat NDJSON 스트림을 토큰 청크 단위로 반환 (없으면 generate로 폴백)"""
+        
+        if not self._breaker('chat').allow():
+            system_prompt, user_prompt = self._messages_to_prompt(messages)
+            yield from self.generate_stream(user_prompt.strip(), system_prompt)
+            return
+        
+        # 폴백 generate 스트림은 슬롯을 놓은 뒤 구독 (_chat_upstream과 같은 이유)
+        with self._slot():
+            chat_payload = self._chat_payload(messages, stream=True)
+            
+            try:
+                response = self.http.post(
+                    f"{self.base_url}/api/chat",
+                    json=chat_payload,
+                    timeout=self.timeout,
+                    stream=True
+                )
+            except requests.ConnectionError:
+                self._connection_failed()
+                raise Exception("Ollama 서비스에 연결할 수 없습니다. 'ollama serve' 명령어로 서비스를 시작하세요.")
+            except requests.RequestException as e:
+                self._breaker('chat').record_failure(str(e))
+                logger.warning(f"Chat 스트림 실패, generate로 폴백: {e}")
+                response = None
+            
+            if response is not None:
+                self._record_chat_status(response.status_code)
+                if response.status_code in (404, 500):
+                    response.close()
+                    logger.info(f"Chat 스트림 사용 불가 (코드: {response.status_code}), generate 스트림 사용")
+                    response = None
+                elif response.status_code == 400:
+                    response.close()
+                    raise Exception(f"잘못된 채팅 요청입니다. 모델 '{self.model}'을 확인하세요.")
+                elif response.status_code != 200:
+                    response.close()
                     raise Exception(f"Chat API 오류 (코드: {response.status_code}): {response.text}")
+            
+            if response is not None:
+                try:
+                    yield from self._iter_ndjson(response, lambda chunk: chunk.get('message', {}).get('content', ''))
+                finally:
+                    response.close()
+                return
+        
+        system_prompt, user_prompt = self._messages_to_prompt(messages)
+        yield from self.generate_stream(user_prompt.strip(), system_prompt)
+    
+    def _iter_ndjson(self, response, extract: Callable[[Dict[str, Any]], str]) -> Generator[str, None, None]:
+        """Ollama NDJSON 응답을 줄 단위로 파싱하여 텍스트 청크 반환"""
+        try:
+            for line in response.iter_lines():
+                if not line:
+                    continue
                 
-        except requests.Timeout:
-            logger.warning("Chat API 시간 초과, generate로 폴백")
-            return self._fallback_to_generate(messages)
-        except requests.ConnectionError:
-            raise Exception("Ollama 서비스에 연결할 수 없습니다. 'ollama serve' 명령어로 서비스를 시작하세요.")
+                text, done = self._parse_stream_line(line, extract)
+                if text:
+                    yield text
+                
+                if done:
+                    break
         except requests.RequestException as e:
-            logger.warning(f"Chat API 실패, generate로 폴백: {e}")
-            return self._fallback_to_generate(messages)
+            raise Exception(f"Ollama 스트리밍 중 연결이 끊어졌습니다: {e}")
     
-    def _fallback_to_generate(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
-        """chat API 실패시 generate API로 폴백"""
+    def _parse_stream_line(self, line, extract: Callable[[Dict[str, Any]], str]) -> tuple:
+        """NDJSON 한 줄을 (텍스트, 완료 여부)로 변환"""
+        try:
+            chunk = json.loads(line)
+        except json.JSONDecodeError:
+            raise Exception("Ollama에서 잘못된 스트리밍 응답 형식을 반환했습니다")
+        
+        if chunk.get('error'):
+            raise Exception(f"Ollama 스트리밍 오류: {chunk['error']}")
         
-        # 메시지들을 하나의 프롬프트로 변환
+        return extract(chunk), bool(chunk.get('done'))
+    
+    def _messages_to_prompt(self, messages: List[Dict[str, str]]) -> tuple:
+        """chat 메시지 목록을 (system_prompt, user_prompt)로 변환"""
         system_prompt = ""
         user_prompt = ""
         
@@ -163,109 +350,307 @@ class OllamaClient:
             elif role == 'assistant':
                 user_prompt += f"\n도우미: {content}"
         
+        return system_prompt, user_prompt
+    
+    def _fallback_to_generate(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        """chat API 실패시 generate API로 폴백"""
+        
+        system_prompt, user_prompt = self._messages_to_prompt(messages)
+        
         # generate API 호출
         try:
             result = self.generate(user_prompt.strip(), system_prompt)
-            
-            # chat API 형식으로 응답 변환
-            return {
-                "message": {
-                    "role": "assistant",
-                    "content": result.get("response", "응답을 생성할 수 없습니다.")
-                },
-                "model": self.model,
-                "created_at": result.get("created_at"),
-                "done": result.get("done", True),
-                "fallback_used": True  # 폴백 사용 표시
-            }
-            
         except Exception as e:
-            logger.error(f"Generate API도 실패: {e}")
-            # 더 구체적인 오류 메시지
-            if "500" in str(e):
-                raise Exception("AI 모델에 문제가 있습니다. fix-ollama-500.bat을 실행하거나 시스템을 재시작해보세요.")
-            elif "404" in str(e):
-                raise Exception("Ollama API를 찾을 수 없습니다. Ollama가 올바르게 설치되었는지 확인하세요.")
-            elif "연결" in str(e):
-                raise Exception("Ollama 서비스가 실행되지 않습니다. 'ollama serve' 명령어로 시작하세요.")
-            else:
-                raise Exception(f"AI 서비스 오류: {e}")
+            raise self._fallback_error(e)
+        
+        return self._generate_result_as_chat(result)
+    
+    def _generate_result_as_chat(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """generate 응답을 chat API 형식으로 변환"""
+        return {
+            "message": {
+                "role": "assistant",
+                "content": result.get("response", "응답을 생성할 수 없습니다.")
+            },
+            "model": self.model,
+            "created_at": result.get("created_at"),
+            "done": result.get("done", True),
+            "fallback_used": True  # 폴백 사용 표시
+        }
+    
+    def _fallback_error(self, e: Exception) -> Exception:
+        """폴백 generate 실패를 사용자용 오류로 변환"""
+        logger.error(f"Generate API도 실패: {e}")
+        if isinstance(e, CircuitOpenError):
+            return e
+        # 더 구체적인 오류 메시지
+        if "500" in str(e):
+            return Exception("AI 모델에 문제가 있습니다. fix-ollama-500.bat을 실행하거나 시스템을 재시작해보세요.")
+        elif "404" in str(e):
+            return Exception("Ollama API를 찾을 수 없습니다. Ollama가 올바르게 설치되었는지 확인하세요.")
+        elif "연결" in str(e):
+            return Exception("Ollama 서비스가 실행되지 않습니다. 'ollama serve' 명령어로 시작하세요.")
+        else:
+            return Exception(f"AI 서비스 오류: {e}")
     
     def is_available(self) -> bool:
         """Ollama 서비스 사용 가능 여부 확인"""
         try:
-            response = requests.get(f"{self.base_url}/api/tags", timeout=5)
+            response = self.http.get(f"{self.base_url}/api/tags", timeout=5)
             return response.status_code == 200
         except:
             return False
 
 
-class AIService:
-    """AI 서비스 메인 클래스"""
+class AsyncOllamaClient(OllamaClient):
+    """Ollama AI 비동기 클라이언트 - 이벤트 루프에서 직접 I/O (Channels 컨슈머용)
     
-    def __init__(self):
-        # Ollama 연결 상태 확인 (더 안전하게)
-        self.ollama_available = False
-        self.error_message = ""
-        
-        try:
-            # 1. 기본 연결 확인
-            response = requests.get(f"{settings.OLLAMA_BASE_URL}/", timeout=3)
-            if response.status_code != 200:
-                self.error_message = f"Ollama 서비스 응답 오류: {response.status_code}"
-                return
+    요청 본문, 상태 코드 처리, 폴백 규칙은 OllamaClient와 동일하다.
+    """
+    
+    def _timeout(self) -> httpx.Timeout:
+        return httpx.Timeout(self.timeout, connect=5.0)
+    
+    def _aslot(self):
+        """Ollama 호출 슬롯 (비동기 대기)"""
+        return get_admission_controller().aslot(self.model)
+    
+    async def generate(self, prompt: str, system_prompt: str = "") -> Dict[str, Any]:
+        """텍스트 생성 (비동기) - 진행 중인 동일 요청이 있으면 그 결과를 함께 사용"""
+        key = self._flight_key('generate', self._generate_payload(prompt, system_prompt, False))
+        return await get_single_flight().ado(key, lambda: self._generate_upstream(prompt, system_prompt))
+    
+    async def chat(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        """채팅 형식 생성 (비동기) - 진행 중인 동일 요청이 있으면 그 결과를 함께 사용"""
+        key = self._flight_key('chat', self._chat_payload(messages, stream=False))
+        return await get_single_flight().ado(key, lambda: self._chat_upstream(messages))
+    
+    def generate_stream(self, prompt: str, system_prompt: str = "") -> AsyncIterator[str]:
+        """/api/generate 토큰 스트림 (비동기) - 동일 요청이 진행 중이면 같은 스트림을 함께 구독"""
+        key = self._flight_key('generate', self._generate_payload(prompt, system_prompt, True))
+        return get_single_flight().astream(key, lambda: self._generate_stream_upstream(prompt, system_prompt))
+    
+    def chat_stream(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """/api/chat 토큰 스트림 (비동기) - 동일 요청이 진행 중이면 같은 스트림을 함께 구독"""
+        key = self._flight_key('chat', self._chat_payload(messages, stream=True))
+        return get_single_flight().astream(key, lambda: self._chat_stream_upstream(messages))
+    
+    async def _generate_upstream(self, prompt: str, system_prompt: str = "") -> Dict[str, Any]:
+        """텍스트 생성 (비동기)"""
+        self._breaker('generate').check()
+        async with self._aslot():
+            payload = self._generate_payload(prompt, system_prompt, stream=False)
             
-            # 2. API 엔드포인트 확인
-            response = requests.get(f"{settings.OLLAMA_BASE_URL}/api/tags", timeout=5)
-            if response.status_code != 200:
-                self.error_message = f"Ollama API 오류: {response.status_code}"
-                return
+            try:
+                response = await get_async_http_client().post(
+                    f"{self.base_url}/api/generate",
+                    json=payload,
+                    timeout=self._timeout()
+                )
+                self._record_status('generate', response.status_code)
+                self._check_generate_status(response.status_code, response.text if response.status_code != 200 else '')
+                return self._validate_generate_result(response.json())
+                
+            except httpx.TimeoutException:
+                self._breaker('generate').record_failure("응답 시간 초과")
+                raise Exception(f"Ollama 응답 시간 초과 ({self.timeout}초). 더 작은 모델을 사용하거나 시간 제한을 늘려보세요.")
+            except httpx.ConnectError:
+                self._connection_failed()
+                raise Exception("Ollama 서비스에 연결할 수 없습니다. 'ollama serve' 명령어로 서비스를 시작하세요.")
+            except httpx.HTTPError as e:
+                self._breaker('generate').record_failure(str(e))
+                logger.error(f"Ollama API 호출 실패: {e}")
+                raise Exception(f"AI 서비스 오류: {e}")
+            except json.JSONDecodeError:
+                raise Exception("Ollama에서 잘못된 응답 형식을 반환했습니다")
+    
+    async def _generate_stream_upstream(self, prompt: str, system_prompt: str = "") -> AsyncGenerator[str, None]:
+        """/api/generate NDJSON 스트림을 토큰 청크 단위로 반환 (비동기)"""
+        self._breaker('generate').check()
+        async with self._aslot():
+            payload = self._generate_payload(prompt, system_prompt, stream=True)
             
-            # 3. 모델 확인
-            models = response.json().get('models', [])
-            if not models:
-                self.error_message = "사용 가능한 모델이 없습니다"
-                return
+            try:
+                async with get_async_http_client().stream(
+                    'POST',
+                    f"{self.base_url}/api/generate",
+                    json=payload,
+                    timeout=self._timeout()
+                ) as response:
+                    self._record_status('generate', response.status_code)
+                    if response.status_code != 200:
+                        await response.aread()
+                        self._check_generate_status(response.status_code, response.text)
+                    
+                    async for text in self._aiter_ndjson(response, lambda chunk: chunk.get('response', '')):
+                        yield text
+                        
+            except httpx.TimeoutException:
+                self._breaker('generate').record_failure("응답 시간 초과")
+                raise Exception(f"Ollama 응답 시간 초과 ({self.timeout}초). 더 작은 모델을 사용하거나 시간 제한을 늘려보세요.")
+            except httpx.ConnectError:
+                self._connection_failed()
+                raise Exception("Ollama 서비스에 연결할 수 없습니다. 'ollama serve' 명령어로 서비스를 시작하세요.")
+            except httpx.HTTPError as e:
+                self._breaker('generate').record_failure(str(e))
+                raise Exception(f"Ollama 스트리밍 중 연결이 끊어졌습니다: {e}")
+    
+    async def _chat_upstream(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        """채팅 형식 생성 (비동기) - /api/chat 또는 /api/generate 사용"""
+        if not self._breaker('chat').allow():
+            return await self._fallback_to_generate_async(messages)
+        
+        # 폴백은 슬롯을 놓은 뒤 호출 (동기 버전과 같은 이유)
+        async with self._aslot():
+            chat_payload = self._chat_payload(messages, stream=False)
             
-            # 4. 클라이언트 초기화
-            self.ollama_client = OllamaClient()
-            self.code_client = OllamaClient(model=settings.CODE_AI_MODEL)
+            try:
+                response = await get_async_http_client().post(
+                    f"{self.base_url}/api/chat",
+                    json=chat_payload,
+                    timeout=self._timeout()
+                )
+            except httpx.ConnectError:
+                self._connection_failed()
+                raise Exception("Ollama 서비스에 연결할 수 없습니다. 'ollama serve' 명령어로 서비스를 시작하세요.")
+            except httpx.TimeoutException:
+                self._breaker('chat').record_failure("응답 시간 초과")
+                logger.warning("Chat API 시간 초과, generate로 폴백")
+                response = None
+            except httpx.HTTPError as e:
+                self._breaker('chat').record_failure(str(e))
+                logger.warning(f"Chat API 실패, generate로 폴백: {e}")
+                response = None
             
-            # 5. 간단한 동작 테스트
-            test_result = self._test_basic_functionality()
-            if test_result:
-                self.ollama_available = True
-            else:
-                self.error_message = "Ollama 기능 테스트 실패"
-                
-        except requests.RequestException as e:
-            self.error_message = f"Ollama 연결 실패: {e}"
+            if response is not None:
+                self._record_chat_status(response.status_code)
+                if response.status_code == 200:
+                    result = response.json()
+                    if result.get('message', {}).get('content'):
+                        return result
+                    logger.warning("Chat API에서 빈 응답 반환, generate로 폴백")
+                elif response.status_code in (404, 500):
+                    logger.info(f"Chat API 사용 불가 (코드: {response.status_code}), generate로 폴백")
+                elif response.status_code == 400:
+                    raise Exception(f"잘못된 채팅 요청입니다. 모델 '{self.model}'을 확인하세요.")
+                else:
+                    raise Exception(f"Chat API 오류 (코드: {response.status_code}): {response.text}")
+        
+        return await self._fallback_to_generate_async(messages)
+    
+    async def _chat_stream_upstream(self, messages: List[Dict[str, str]]) -> AsyncGenerator[str, None]:
+        """/api/chat NDJSON 스트림을 토큰 청크 단위로 반환 (비동기, 없으면 generate로 폴백)"""
+        if not self._breaker('chat').allow():
+            system_prompt, user_prompt = self._messages_to_prompt(messages)
+            async for text in self.generate_stream(user_prompt.strip(), system_prompt):
+                yield text
+            return
+        
+        async with self._aslot():
+            chat_payload = self._chat_payload(messages, stream=True)
+            use_fallback = False
+            
+            try:
+                async with get_async_http_client().stream(
+                    'POST',
+                    f"{self.base_url}/api/chat",
+                    json=chat_payload,
+                    timeout=self._timeout()
+                ) as response:
+                    self._record_chat_status(response.status_code)
+                    if response.status_code in (404, 500):
+                        logger.info(f"Chat 스트림 사용 불가 (코드: {response.status_code}), generate 스트림 사용")
+                        use_fallback = True
+                    elif response.status_code == 400:
+                        raise Exception(f"잘못된 채팅 요청입니다. 모델 '{self.model}'을 확인하세요.")
+                    elif response.status_code != 200:
+                        await response.aread()
+                        raise Exception(f"Chat API 오류 (코드: {response.status_code}): {response.text}")
+                    else:
+                        async for text in self._aiter_ndjson(
+                            response, lambda chunk: chunk.get('message', {}).get('content', '')
+                        ):
+                            yield text
+                            
+            except httpx.ConnectError:
+                self._connection_failed()
+                raise Exception("Ollama 서비스에 연결할 수 없습니다. 'ollama serve' 명령어로 서비스를 시작하세요.")
+            except httpx.HTTPError as e:
+                self._breaker('chat').record_failure(str(e))
+                raise Exception(f"Ollama 스트리밍 중 연결이 끊어졌습니다: {e}")
+        
+        # 폴백 generate 스트림은 슬롯을 놓은 뒤 구독
+        if use_fallback:
+            system_prompt, user_prompt = self._messages_to_prompt(messages)
+            async for text in self.generate_stream(user_prompt.strip(), system_prompt):
+                yield text
+    
+    async def _aiter_ndjson(self, response: httpx.Response,
+                            extract: Callable[[Dict[str, Any]], str]) -> AsyncGenerator[str, None]:
+        """Ollama NDJSON 응답을 줄 단위로 파싱하여 텍스트 청크 반환 (비동기)"""
+        async for line in response.aiter_lines():
+            if not line:
+                continue
+            
+            text, done = self._parse_stream_line(line, extract)
+            if text:
+                yield text
+            
+            if done:
+                break
+    
+    async def _fallback_to_generate_async(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        """chat API 실패시 generate API로 폴백 (비동기)"""
+        system_prompt, user_prompt = self._messages_to_prompt(messages)
+        
+        try:
+            result = await self.generate(user_prompt.strip(), system_prompt)
         except Exception as e:
-            self.error_message = f"Ollama 초기화 오류: {e}"
+            raise self._fallback_error(e)
+        
+        return self._generate_result_as_chat(result)
     
-    def _test_basic_functionality(self):
-        """기본 기능 테스트"""
+    async def is_available(self) -> bool:
+        """Ollama 서비스 사용 가능 여부 확인 (비동기)"""
         try:
-            # 가장 간단한 요청으로 테스트
-            response = requests.post(
-                f"{settings.OLLAMA_BASE_URL}/api/generate",
-                json={
-                    "model": settings.DEFAULT_AI_MODEL,
-                    "prompt": "Hi",
-                    "stream": False,
-                    "options": {
-                        "num_predict": 3,  # 매우 짧은 응답
-                        "temperature": 0.1
-                    }
-                },
-                timeout=10
-            )
+            response = await get_async_http_client().get(f"{self.base_url}/api/tags", timeout=5)
             return response.status_code == 200
-        except:
+        except httpx.HTTPError:
             return False
+
+
+class AIService:
+    """AI 서비스 메인 클래스"""
+    
+    def __init__(self):
+        # Ollama 상태는 백그라운드 모니터가 주기적으로 갱신한 값을 사용 (네트워크 I/O 없음)
+        self.health_monitor = get_health_monitor()
+        health = self.health_monitor.snapshot()
+        
+        # 첫 확인 전에는 사용 가능하다고 가정하고 실제 호출 결과에 맡김
+        self.ollama_available = health['available'] or health['checked_at'] is None
+        self.error_message = health['error_message']
         
-    def process_message(self, message: str, session_id: str, message_type: str = 'user', context: Dict = None) -> Dict[str, Any]:
-        """메시지 처리 및 적절한 AI 응답 생성"""
+        # 긴 세션의 오래된 대화를 주기적으로 요약 (백그라운드)
+        get_conversation_summarizer()
+        
+        # 모델 상주 관리 (최초 생성 시 설정된 모델 예열)
+        get_residency_manager()
+        
+        self.ollama_client = OllamaClient()
+        self.code_client = OllamaClient(model=settings.CODE_AI_MODEL)
+        
+        # Channels 컨슈머용 비동기 클라이언트 (aprocess_message)
+        self.async_ollama_client = AsyncOllamaClient()
+        self.async_code_client = AsyncOllamaClient(model=settings.CODE_AI_MODEL)
+        
+    def process_message(self, message: str, session_id: str, message_type: str = 'user', context: Dict = None,
+                        on_token: Callable[[str], None] = None) -> Dict[str, Any]:
+        """메시지 처리 및 적절한 AI 응답 생성
+        
+        on_token이 주어지면 LLM 응답을 스트리밍으로 받아 청크마다 호출한다.
+        반환값은 스트리밍 여부와 관계없이 완성된 전체 응답이다.
+        """
         
         context = context or {}
         
@@ -279,16 +664,52 @@ class AIService:
         if intent['type'] == 'command_execution':
             return self.handle_command_request(message, session_context, intent, context)
         elif intent['type'] == 'code_analysis':
-            return self.handle_code_analysis(message, session_context, intent, context)
+            return self.handle_code_analysis(message, session_context, intent, context, on_token)
+        elif intent['type'] == 'system_admin':
+            return self.handle_system_admin(message, session_context, intent, context, on_token)
+        elif intent['type'] == 'general_chat':
+            return self.handle_general_chat(message, session_context, intent, context, on_token)
+        else:
+            return self.handle_default(message, session_context, context)
+    
+    async def aprocess_message(self, message: str, session_id: str, message_type: str = 'user', context: Dict = None,
+                               on_token: Callable[[str], None] = None,
+                               on_ready: Callable[[Dict[str, Any]], Awaitable[None]] = None) -> Dict[str, Any]:
+        """메시지 처리 (비동기) - LLM I/O는 이벤트 루프에서, DB 접근만 짧은 sync_to_async로 처리
+        
+        on_ready는 명령어 요청에서 설명이 끝나기 전에 실행 버튼용 메타데이터를 먼저 받는다.
+        """
+        
+        context = context or {}
+        
+        # 의도 분석 - 명령어 추출이 LLM을 필요로 하면 비동기로 수행
+        intent = self.analyze_intent(message, context, extract=False)
+        if intent['type'] == 'command_execution':
+            if not intent['details'].get('command'):
+                command = await self.aextract_command(message)
+                intent['extracted_command'] = command
+                intent['details']['command'] = command
+            # 명령어 요청은 이전 대화를 쓰지 않으므로 세션 컨텍스트 조회 생략
+            return await self.ahandle_command_request(message, [], intent, context, on_token, on_ready)
+        
+        # 세션 컨텍스트 가져오기
+        session_context = await sync_to_async(self.get_session_context)(session_id)
+        
+        # 의도에 따른 처리
+        if intent['type'] == 'code_analysis':
+            return await self.ahandle_code_analysis(message, session_context, intent, context, on_token)
         elif intent['type'] == 'system_admin':
-            return self.handle_system_admin(message, session_context, intent, context)
+            return await self.ahandle_system_admin(message, session_context, intent, context, on_token)
         elif intent['type'] == 'general_chat':
-            return self.handle_general_chat(message, session_context, intent, context)
+            return await self.ahandle_general_chat(message, session_context, intent, context, on_token)
         else:
             return self.handle_default(message, session_context, context)
     
-    def analyze_intent(self, message: str, context: Dict = None) -> Dict[str, Any]:
-        """사용자 메시지의 의도 분석 - 컨텍스트 고려"""
+    def analyze_intent(self, message: str, context: Dict = None, extract: bool = True) -> Dict[str, Any]:
+        """사용자 메시지의 의도 분석 - 컨텍스트 고려
+        
+        extract=False이면 명령어 추출(LLM 호출 가능)을 호출자에게 맡긴다.
+        """
         
         context = context or {}
         shell_type = context.get('shell_type')
@@ -307,56 +728,17 @@ class AIService:
                 }
             }
         
-        # OS별 명령어 키워드 정의
-        import platform
-        is_windows = platform.system().lower() == 'windows'
-        
-        if is_windows or shell_type in ['powershell', 'cmd']:
-            # Windows 명령어 키워드
-            command_keywords = [
-                '실행', '명령어', 'execute', 'run', 'command', '터미널',
-                # Windows 특화 명령어
-                'dir', 'cls', 'type', 'copy', 'del', 'md', 'rd', 'cd', 'pushd', 'popd',
-                'tasklist', 'taskkill', 'systeminfo', 'ipconfig', 'netstat', 'ping',
-                # PowerShell 명령어
-                'get-process', 'get-service', 'get-childitem', 'get-location',
-                'set-location', 'new-item', 'remove-item', 'copy-item', 'move-item',
-                'get-content', 'set-content', 'select-string', 'measure-object',
-                'where-object', 'foreach-object', 'get-wmiobject', 'get-computerinfo'
-            ]
-        else:
-            # Unix/Linux 명령어 키워드
-            command_keywords = [
-                '실행', '명령어', 'execute', 'run', 'command', '터미널',
-                'ls', 'cd', 'pwd', 'ps', 'kill', 'grep', 'find', 'cat',
-                'tail', 'head', 'chmod', 'chown', 'mkdir', 'rm', 'cp', 'mv',
-                'df', 'du', 'top', 'htop', 'free', 'uname', 'whoami', 'id',
-                'tar', 'gzip', 'wget', 'curl', 'ssh', 'scp', 'rsync'
-            ]
-        
-        # 코드 분석 관련 키워드
-        code_keywords = [
-            '코드', 'code', '스크립트', 'script', '분석', 'analyze',
-            '디버그', 'debug', '오류', 'error', '버그', 'bug', 'exception',
-            'python', 'java', 'javascript', 'c++', 'c#', 'go', 'rust'
-        ]
-        
-        # 시스템 관리 관련 키워드
-        system_keywords = [
-            '시스템', 'system', '서버', 'server', '모니터링', 'monitoring',
-            '성능', 'performance', '로그', 'log', '설정', 'config',
-            '네트워크', 'network', '방화벽', 'firewall', '보안', 'security'
-        ]
-        
-        message_lower = message.lower()
+        # 사전 컴파일된 매처로 한 번에 카테고리별 점수 계산
+        scores = get_intent_matcher(shell_type).scores(message)
         
         # 명령어 패턴 감지
-        if any(keyword in message_lower for keyword in command_keywords):
-            extracted_command = self.extract_command(message)
+        if 'command_execution' in scores:
+            extracted_command = self.extract_command(message) if extract else None
             return {
                 'type': 'command_execution',
                 'confidence': 0.9,
                 'extracted_command': extracted_command,
+                'scores': scores,
                 'details': {
                     'command': extracted_command,
                     'shell_type': shell_type
@@ -364,18 +746,20 @@ class AIService:
             }
         
         # 코드 분석 패턴 감지
-        elif any(keyword in message_lower for keyword in code_keywords):
+        elif 'code_analysis' in scores:
             return {
                 'type': 'code_analysis',
                 'confidence': 0.8,
+                'scores': scores,
                 'details': {'shell_type': shell_type}
             }
         
         # 시스템 관리 패턴 감지
-        elif any(keyword in message_lower for keyword in system_keywords):
+        elif 'system_admin' in scores:
             return {
                 'type': 'system_admin',
                 'confidence': 0.8,
+                'scores': scores,
                 'details': {'shell_type': shell_type}
             }
         
@@ -384,17 +768,59 @@ class AIService:
             return {
                 'type': 'general_chat',
                 'confidence': 0.6,
+                'scores': scores,
                 'details': {'shell_type': shell_type}
             }
     
     def extract_command(self, message: str) -> Optional[str]:
         """메시지에서 실행할 명령어 추출 - Windows/Linux 명령어 지원"""
         
+        get_command_index().refresh_if_stale()
+        command = self._extract_command_local(message)
+        if command:
+            return command
+        
+        # AI를 사용한 명령어 추출
+        try:
+            system_prompt, prompt = self._extract_command_prompt(message)
+            response = self.code_client.generate(prompt, system_prompt)
+            return self._parse_extracted_command(response)
+        except Exception as e:
+            logger.warning(f"AI 명령어 추출 실패: {e}")
+        
+        return None
+    
+    async def aextract_command(self, message: str) -> Optional[str]:
+        """메시지에서 실행할 명령어 추출 (비동기)"""
+        
+        await sync_to_async(get_command_index().refresh_if_stale)()
+        command = self._extract_command_local(message)
+        if command:
+            return command
+        
+        try:
+            system_prompt, prompt = self._extract_command_prompt(message)
+            response = await self.async_code_client.generate(prompt, system_prompt)
+            return self._parse_extracted_command(response)
+        except Exception as e:
+            logger.warning(f"AI 명령어 추출 실패: {e}")
+        
+        return None
+    
+    def _extract_command_local(self, message: str) -> Optional[str]:
+        """정규식/로컬 인덱스로 명령어 추출 (LLM 호출 없음)"""
+        
         # 백틱으로 감싸진 명령어 찾기
         backtick_match = re.search(r'`([^`]+)`', message)
         if backtick_match:
             return backtick_match.group(1).strip()
         
+        # 자연어 표현 → 명령어 인덱스 (신뢰도가 충분할 때만 사용, 애매하면 LLM으로)
+        match = get_command_index().lookup(message)
+        if match and match.confidence >= getattr(settings, 'COMMAND_INDEX_MIN_CONFIDENCE', 0.75):
+            logger.debug(f"로컬 인덱스 명령어 추출: {match.command} ({match.confidence}, {match.source})")
+            return match.command
+        
         # 명령어 키워드 다음의 텍스트 추출
         command_patterns = [
             r'실행해(?:주세요|줘)?\s*:?\s*(.+)',
@@ -408,90 +834,112 @@ class AIService:
             if match:
                 return match.group(1).strip()
         
-        # AI를 사용한 명령어 추출
-        try:
-            import platform
-            is_windows = platform.system().lower() == 'windows'
+        return None
+    
+    def _extract_command_prompt(self, message: str) -> tuple:
+        """명령어 추출용 (system_prompt, prompt)"""
+        import platform
+        is_windows = platform.system().lower() == 'windows'
+        
+        if is_windows:
+            system_prompt = """당신은 Windows 명령어 전문가입니다.
+            사용자의 자연어 요청에서 실행할 Windows 명령어를 추출하세요."""
             
-            if is_windows:
-                system_prompt = """당신은 Windows 명령어 전문가입니다.
-                사용자의 자연어 요청에서 실행할 Windows 명령어를 추출하세요."""
-                
-                prompt = f"""
-                다음 텍스트에서 실행할 Windows 명령어(Command Prompt 또는 PowerShell)를 추출해주세요.
-                명령어만 반환하고 다른 설명은 하지 마세요.
-                명령어가 없으면 'NONE'을 반환하세요.
-                
-                텍스트: "{message}"
-                
-                예시:
-                - "파일 목록 보여줘" → dir
-                - "프로세스 확인해줘" → Get-Process
-                - "시스템 정보 알려줘" → systeminfo
-                """
-            else:
-                system_prompt = """당신은 리눅스/유닉스 명령어 전문가입니다.
-                사용자의 자연어 요청에서 실행할 명령어를 추출하세요."""
-                
-                prompt = f"""
-                다음 텍스트에서 실행할 리눅스/유닉스 명령어를 추출해주세요.
-                명령어만 반환하고 다른 설명은 하지 마세요.
-                명령어가 없으면 'NONE'을 반환하세요.
-                
-                텍스트: "{message}"
-                
-                예시:
-                - "파일 목록 보여줘" → ls -la
-                - "프로세스 확인해줘" → ps aux
-                - "디스크 사용량 확인해줘" → df -h
-                """
+            prompt = f"""
+            다음 텍스트에서 실행할 Windows 명령어(Command Prompt 또는 PowerShell)를 추출해주세요.
+            명령어만 반환하고 다른 설명은 하지 마세요.
+            명령어가 없으면 'NONE'을 반환하세요.
             
-            response = self.code_client.generate(prompt, system_prompt)
-            extracted = response.get('response', '').strip()
+            텍스트: "{message}"
             
-            if extracted and extracted != 'NONE' and not extracted.startswith('명령어'):
-                return extracted
-                
-        except Exception as e:
-            logger.warning(f"AI 명령어 추출 실패: {e}")
+            예시:
+            {self._command_examples('windows')}
+            """
+        else:
+            system_prompt = """당신은 리눅스/유닉스 명령어 전문가입니다.
+            사용자의 자연어 요청에서 실행할 명령어를 추출하세요."""
+            
+            prompt = f"""
+            다음 텍스트에서 실행할 리눅스/유닉스 명령어를 추출해주세요.
+            명령어만 반환하고 다른 설명은 하지 마세요.
+            명령어가 없으면 'NONE'을 반환하세요.
+            
+            텍스트: "{message}"
+            
+            예시:
+            {self._command_examples('unix')}
+            """
+        
+        return system_prompt, prompt
+    
+    def _command_examples(self, shell_family: str) -> str:
+        """추출 프롬프트용 예시 (로컬 인덱스 기본 표현과 동일)"""
+        return '\n            '.join(
+            f'- "{phrase}" → {command}' for phrase, command in SEED_PHRASES[shell_family][:3]
+        )
+    
+    def _parse_extracted_command(self, response: Dict[str, Any]) -> Optional[str]:
+        extracted = response.get('response', '').strip()
         
+        if extracted and extracted != 'NONE' and not extracted.startswith('명령어'):
+            return extracted
         return None
     
     def get_session_context(self, session_id: str, limit: int = 10) -> List[Dict[str, str]]:
-        """세션의 최근 대화 컨텍스트 가져오기"""
+        """세션의 최근 대화 컨텍스트 가져오기 (메시지 저장 시 갱신되는 메모리 창)"""
+        return get_session_context_store().get(session_id, limit)
+    
+    def handle_command_request(self, message: str, context: List[Dict], intent: Dict, user_context: Dict = None) -> Dict[str, Any]:
+        """명령어 실행 요청 처리"""
         
-        cache_key = f"session_context_{session_id}"
-        cached_context = cache.get(cache_key)
+        user_context = user_context or {}
+        command = intent['details'].get('command')
+        shell_type = user_context.get('shell_type') or intent['details'].get('shell_type')
         
-        if cached_context:
-            return cached_context
+        precheck = self._precheck_command_request(command, shell_type)
+        if precheck:
+            return precheck
         
-        try:
-            session = ChatSession.objects.get(session_id=session_id)
-            messages = session.messages.order_by('-timestamp')[:limit]
-            
-            context = []
-            for msg in reversed(messages):
-                role = 'user' if msg.message_type == 'user' else 'assistant'
-                context.append({
-                    'role': role,
-                    'content': msg.content
-                })
-            
-            # 캐시에 저장 (5분)
-            cache.set(cache_key, context, 300)
-            return context
-            
-        except ChatSession.DoesNotExist:
-            return []
+        # 읽기 전용 명령어는 설명을 만드는 동안 실행 버튼 대상(기본 세션)에서 미리 실행 (opt-in)
+        get_speculative_executor().start(command, 'default', user_context.get('shell_type'))
+        
+        # 명령어 설명 및 실행 안내
+        explanation = self.explain_command(command, shell_type)
+        return self._command_ready_response(command, explanation, shell_type)
     
-    def handle_command_request(self, message: str, context: List[Dict], intent: Dict, user_context: Dict = None) -> Dict[str, Any]:
-        """명령어 실행 요청 처리"""
+    async def ahandle_command_request(self, message: str, context: List[Dict], intent: Dict, user_context: Dict = None,
+                                      on_token: Callable[[str], None] = None,
+                                      on_ready: Callable[[Dict[str, Any]], Awaitable[None]] = None) -> Dict[str, Any]:
+        """명령어 실행 요청 처리 (비동기)
+        
+        위험 명령어 검사는 LLM 없이 로컬에서 바로 끝내고, 스트리밍 중이면 실행 버튼(on_ready)을
+        먼저 보낸 뒤 설명을 토큰 단위로 보낸다. 설명을 기다리지 않고 실행할 수 있다.
+        """
         
         user_context = user_context or {}
         command = intent['details'].get('command')
         shell_type = user_context.get('shell_type') or intent['details'].get('shell_type')
         
+        precheck = self._precheck_command_request(command, shell_type)
+        if precheck:
+            return precheck
+        
+        # 읽기 전용 명령어는 설명을 만드는 동안 실행 버튼 대상(기본 세션)에서 미리 실행 (opt-in)
+        get_speculative_executor().start(command, 'default', user_context.get('shell_type'))
+        
+        if on_token is None:
+            explanation = await self.aexplain_command(command, shell_type)
+            return self._command_ready_response(command, explanation, shell_type)
+        
+        if on_ready:
+            await on_ready(self._command_ready_metadata(command, None, shell_type))
+        on_token(self._command_ready_header(command))
+        explanation = await self.aexplain_command(command, shell_type, on_token)
+        return self._command_ready_response(command, explanation, shell_type)
+    
+    def _precheck_command_request(self, command: Optional[str], shell_type: Optional[str]) -> Optional[Dict[str, Any]]:
+        """명령어가 없거나 위험한 경우의 응답 (LLM 호출 없음), 통과하면 None"""
+        
         if not command:
             # OS별 예시 명령어 제공
             import platform
@@ -537,11 +985,8 @@ class AIService:
                 }
             }
         
-        # 위험한 명령어 체크
-        from xshell_integration.services import XShellService
-        xshell_service = XShellService()
-        
-        if xshell_service.is_dangerous_command(command):
+        # 위험한 명령어 체크 (로컬 패턴 검사 - 서비스 생성 없음)
+        if is_dangerous_command(command):
             return {
                 'content': f"⚠️ 위험한 명령어가 감지되었습니다: `{command}`\n"
                           "이 명령어는 시스템에 손상을 줄 수 있어서 실행을 권장하지 않습니다.",
@@ -552,33 +997,69 @@ class AIService:
                 }
             }
         
-        # 명령어 설명 및 실행 안내
-        explanation = self.explain_command(command, shell_type)
-        
+        return None
+    
+    def _command_ready_header(self, command: str) -> str:
+        return f"명령어 `{command}`를 실행하겠습니다.\n\n**명령어 설명:**\n"
+    
+    def _command_ready_metadata(self, command: str, explanation: Optional[str], shell_type: Optional[str]) -> Dict[str, Any]:
         return {
-            'content': f"명령어 `{command}`를 실행하겠습니다.\n\n"
-                      f"**명령어 설명:**\n{explanation}\n\n"
+            'type': 'command_ready',
+            'command': command,
+            'explanation': explanation,
+            'shell_type': shell_type,
+            'execute_button': True
+        }
+    
+    def _command_ready_response(self, command: str, explanation: str, shell_type: Optional[str]) -> Dict[str, Any]:
+        return {
+            'content': f"{self._command_ready_header(command)}{explanation}\n\n"
                       f"실행하려면 아래 버튼을 클릭하거나 '실행'이라고 입력해주세요.",
-            'metadata': {
-                'type': 'command_ready',
-                'command': command,
-                'explanation': explanation,
-                'shell_type': shell_type,
-                'execute_button': True
-            }
+            'metadata': self._command_ready_metadata(command, explanation, shell_type)
         }
     
-    def handle_code_analysis(self, message: str, context: List[Dict], intent: Dict, user_context: Dict = None) -> Dict[str, Any]:
+    def handle_code_analysis(self, message: str, context: List[Dict], intent: Dict, user_context: Dict = None,
+                             on_token: Callable[[str], None] = None) -> Dict[str, Any]:
         """코드 분석 요청 처리"""
         
         user_context = user_context or {}
         shell_type = user_context.get('shell_type')
+        system_prompt, prompt = self._code_analysis_prompt(message, context, shell_type)
+        
+        try:
+            response = self._generate(self.code_client, prompt, system_prompt, on_token)
+            return self._code_analysis_response(response, shell_type)
+        except Exception as e:
+            return {
+                'content': f"코드 분석 중 오류가 발생했습니다: {str(e)}",
+                'metadata': {'type': 'error'}
+            }
+    
+    async def ahandle_code_analysis(self, message: str, context: List[Dict], intent: Dict, user_context: Dict = None,
+                                    on_token: Callable[[str], None] = None) -> Dict[str, Any]:
+        """코드 분석 요청 처리 (비동기)"""
+        
+        user_context = user_context or {}
+        shell_type = user_context.get('shell_type')
+        system_prompt, prompt = self._code_analysis_prompt(message, context, shell_type)
+        
+        try:
+            response = await self._agenerate(self.async_code_client, prompt, system_prompt, on_token)
+            return self._code_analysis_response(response, shell_type)
+        except Exception as e:
+            return {
+                'content': f"코드 분석 중 오류가 발생했습니다: {str(e)}",
+                'metadata': {'type': 'error'}
+            }
+    
+    def _code_analysis_prompt(self, message: str, context: List[Dict], shell_type: Optional[str]) -> tuple:
+        """코드 분석용 (system_prompt, prompt)"""
         
         system_prompt = """당신은 코드 분석 전문가입니다. 
         사용자가 제공한 코드나 오류를 분석하고 해결책을 제시하세요."""
         
         # 이전 컨텍스트 포함
-        context_str = self.format_context(context)
+        context_str = self.format_context(context, message, system_prompt, self.code_client.model)
         
         # Shell 타입별 컨텍스트 추가
         shell_context = ""
@@ -598,27 +1079,54 @@ class AIService:
         4. 추가 권장사항
         """
         
-        try:
-            response = self.code_client.generate(prompt, system_prompt)
-            return {
-                'content': response.get('response', 'AI 응답을 생성할 수 없습니다.'),
-                'metadata': {
-                    'type': 'code_analysis',
-                    'model_used': self.code_client.model,
-                    'shell_type': shell_type
-                }
+        return system_prompt, prompt
+    
+    def _code_analysis_response(self, response: Dict[str, Any], shell_type: Optional[str]) -> Dict[str, Any]:
+        return {
+            'content': response.get('response', 'AI 응답을 생성할 수 없습니다.'),
+            'metadata': {
+                'type': 'code_analysis',
+                'model_used': self.code_client.model,
+                'shell_type': shell_type
             }
+        }
+    
+    def handle_system_admin(self, message: str, context: List[Dict], intent: Dict, user_context: Dict = None,
+                            on_token: Callable[[str], None] = None) -> Dict[str, Any]:
+        """시스템 관리 요청 처리"""
+        
+        user_context = user_context or {}
+        shell_type = user_context.get('shell_type')
+        system_prompt, prompt = self._system_admin_prompt(message, context, shell_type)
+        
+        try:
+            response = self._generate(self.ollama_client, prompt, system_prompt, on_token)
+            return self._system_admin_response(response, shell_type)
         except Exception as e:
             return {
-                'content': f"코드 분석 중 오류가 발생했습니다: {str(e)}",
+                'content': f"시스템 관리 조언 생성 중 오류가 발생했습니다: {str(e)}",
                 'metadata': {'type': 'error'}
             }
     
-    def handle_system_admin(self, message: str, context: List[Dict], intent: Dict, user_context: Dict = None) -> Dict[str, Any]:
-        """시스템 관리 요청 처리"""
+    async def ahandle_system_admin(self, message: str, context: List[Dict], intent: Dict, user_context: Dict = None,
+                                   on_token: Callable[[str], None] = None) -> Dict[str, Any]:
+        """시스템 관리 요청 처리 (비동기)"""
         
         user_context = user_context or {}
         shell_type = user_context.get('shell_type')
+        system_prompt, prompt = self._system_admin_prompt(message, context, shell_type)
+        
+        try:
+            response = await self._agenerate(self.async_ollama_client, prompt, system_prompt, on_token)
+            return self._system_admin_response(response, shell_type)
+        except Exception as e:
+            return {
+                'content': f"시스템 관리 조언 생성 중 오류가 발생했습니다: {str(e)}",
+                'metadata': {'type': 'error'}
+            }
+    
+    def _system_admin_prompt(self, message: str, context: List[Dict], shell_type: Optional[str]) -> tuple:
+        """시스템 관리용 (system_prompt, prompt)"""
         
         # Shell 타입에 따른 시스템 프롬프트
         if shell_type in ['powershell', 'cmd']:
@@ -628,7 +1136,7 @@ class AIService:
             system_prompt = """당신은 시스템 관리 전문가입니다.
             리눅스/유닉스 시스템 관리, 모니터링, 트러블슈팅에 대한 조언을 제공하세요."""
         
-        context_str = self.format_context(context)
+        context_str = self.format_context(context, message, system_prompt, self.ollama_client.model)
         
         # Shell 타입별 컨텍스트 추가
         shell_context = ""
@@ -648,23 +1156,20 @@ class AIService:
         4. 관련 명령어 (있다면)
         """
         
-        try:
-            response = self.ollama_client.generate(prompt, system_prompt)
-            return {
-                'content': response.get('response', 'AI 응답을 생성할 수 없습니다.'),
-                'metadata': {
-                    'type': 'system_admin',
-                    'model_used': self.ollama_client.model,
-                    'shell_type': shell_type
-                }
-            }
-        except Exception as e:
-            return {
-                'content': f"시스템 관리 조언 생성 중 오류가 발생했습니다: {str(e)}",
-                'metadata': {'type': 'error'}
+        return system_prompt, prompt
+    
+    def _system_admin_response(self, response: Dict[str, Any], shell_type: Optional[str]) -> Dict[str, Any]:
+        return {
+            'content': response.get('response', 'AI 응답을 생성할 수 없습니다.'),
+            'metadata': {
+                'type': 'system_admin',
+                'model_used': self.ollama_client.model,
+                'shell_type': shell_type
             }
+        }
     
-    def handle_general_chat(self, message: str, context: List[Dict], intent: Dict, user_context: Dict = None) -> Dict[str, Any]:
+    def handle_general_chat(self, message: str, context: List[Dict], intent: Dict, user_context: Dict = None,
+                            on_token: Callable[[str], None] = None) -> Dict[str, Any]:
         """일반 대화 처리"""
         
         user_context = user_context or {}
@@ -672,93 +1177,173 @@ class AIService:
         
         # Ollama가 사용 불가능한 경우 상세한 안내
         if not self.ollama_available:
-            error_details = self.error_message or "알 수 없는 오류"
-            
-            return {
-                'content': f"💔 **AI 서비스 연결 오류**\n\n"
-                          f"**오류 내용:** {error_details}\n\n"
-                          f"**해결 방법:**\n\n"
-                          f"🔧 **즉시 해결**\n"
-                          f"1. `fix-ollama-500.bat` 실행 (자동 진단 및 수정)\n"
-                          f"2. 또는 `test-ollama.bat` 실행 (상세 진단)\n\n"
-                          f"🚀 **수동 해결**\n"
-                          f"1. Ollama 재시작: `ollama serve`\n"
-                          f"2. 모델 설치: `ollama pull llama3.2:3b`\n"
-                          f"3. 시스템 재시작 (권장)\n\n"
-                          f"📥 **Ollama 설치가 필요한 경우**\n"
-                          f"• 자동 설치: `install-ollama-simple.bat`\n"
-                          f"• 수동 설치: https://ollama.com/download\n\n"
-                          f"**현재 사용 가능한 기능:**\n"
-                          f"• XShell 세션 연결 및 명령어 실행\n"
-                          f"• 터미널 작업 지원\n\n"
-                          f"AI 기능이 복구되면 지능적인 대화와 코드 분석을 이용할 수 있습니다! 🤖",
-                'metadata': {
-                    'type': 'ai_service_error',
-                    'error_details': error_details,
-                    'shell_type': shell_type,
-                    'capabilities': ['command_execution', 'xshell_integration'],
-                    'repair_tools': ['fix-ollama-500.bat', 'test-ollama.bat', 'install-ollama-simple.bat']
-                }
-            }
+            return self._ai_unavailable_response(shell_type)
         
-        # Shell 타입별 시스템 프롬프트
-        if shell_type in ['powershell', 'cmd']:
-            system_prompt = """당신은 Windows XShell 터미널 도우미입니다.
-            친근하고 도움이 되는 방식으로 대화하며, 필요시 Windows 터미널 작업을 도와주세요."""
-        else:
-            system_prompt = """당신은 XShell 터미널 도우미입니다.
-            친근하고 도움이 되는 방식으로 대화하며, 필요시 터미널 작업을 도와주세요."""
+        # Chat API 사용 - 모델 컨텍스트 길이에 맞춰 최근 대화부터 채움
+        messages = self._chat_messages(self.ollama_client.model, context, message)
         
-        # Chat API 사용
-        messages = context + [{'role': 'user', 'content': message}]
+        try:
+            response = self._chat(self.ollama_client, messages, on_token)
+            return self._general_chat_response(response, shell_type)
+        except Exception as e:
+            return self._general_chat_error_response(e, shell_type)
+    
+    async def ahandle_general_chat(self, message: str, context: List[Dict], intent: Dict, user_context: Dict = None,
+                                   on_token: Callable[[str], None] = None) -> Dict[str, Any]:
+        """일반 대화 처리 (비동기)"""
+        
+        user_context = user_context or {}
+        shell_type = user_context.get('shell_type')
+        
+        if not self.ollama_available:
+            return self._ai_unavailable_response(shell_type)
+        
+        messages = self._chat_messages(self.async_ollama_client.model, context, message)
         
         try:
-            response = self.ollama_client.chat(messages)
-            return {
-                'content': response.get('message', {}).get('content', 'AI 응답을 생성할 수 없습니다.'),
-                'metadata': {
-                    'type': 'general_chat',
-                    'model_used': self.ollama_client.model,
-                    'shell_type': shell_type
-                }
-            }
+            response = await self._achat(self.async_ollama_client, messages, on_token)
+            return self._general_chat_response(response, shell_type)
         except Exception as e:
-            # 구체적인 오류 분석
-            error_str = str(e)
-            if "500" in error_str:
-                repair_message = "🔧 **Ollama 500 오류 해결 방법:**\n" \
-                               "1. `fix-ollama-500.bat` 실행 (자동 수정)\n" \
-                               "2. 시스템 재시작 후 재시도\n" \
-                               "3. 더 작은 모델 사용: `ollama pull llama3.2:1b`"
-            elif "404" in error_str:
-                repair_message = "🔧 **API 엔드포인트 오류:**\n" \
-                               "Ollama 버전이 낮을 수 있습니다. 최신 버전으로 업데이트하세요."
-            elif "timeout" in error_str.lower():
-                repair_message = "⏱️ **응답 시간 초과:**\n" \
-                                "모델이 너무 크거나 메모리가 부족할 수 있습니다.\n" \
-                                "더 작은 모델을 사용해보세요."
-            elif "connection" in error_str.lower():
-                repair_message = "🔌 **연결 오류:**\n" \
-                                "`ollama serve` 명령어로 서비스를 시작하세요."
-            else:
-                repair_message = "🛠️ **일반적인 해결 방법:**\n" \
-                                "1. `fix-ollama-500.bat` 실행\n" \
-                                "2. Ollama 서비스 재시작\n" \
-                                "3. 시스템 재시작"
-            
-            return {
-                'content': f"😅 **AI 응답 생성 중 오류가 발생했습니다**\n\n"
-                          f"**오류 내용:** {error_str}\n\n"
-                          f"{repair_message}\n\n"
-                          f"**임시 해결책:**\n"
-                          f"XShell 기능(명령어 실행, 터미널 작업)은 정상적으로 사용 가능합니다.\n"
-                          f"AI 기능이 복구되면 더 스마트한 도움을 받을 수 있습니다! 🚀",
-                'metadata': {
-                    'type': 'ai_error',
-                    'error_details': error_str,
-                    'shell_type': shell_type
-                }
+            return self._general_chat_error_response(e, shell_type)
+    
+    def _general_chat_response(self, response: Dict[str, Any], shell_type: Optional[str]) -> Dict[str, Any]:
+        return {
+            'content': response.get('message', {}).get('content', 'AI 응답을 생성할 수 없습니다.'),
+            'metadata': {
+                'type': 'general_chat',
+                'model_used': self.ollama_client.model,
+                'shell_type': shell_type
+            }
+        }
+    
+    def _ai_unavailable_response(self, shell_type: Optional[str]) -> Dict[str, Any]:
+        """Ollama 사용 불가 시 상세한 안내"""
+        error_details = self.error_message or "알 수 없는 오류"
+        
+        return {
+            'content': f"💔 **AI 서비스 연결 오류**\n\n"
+                      f"**오류 내용:** {error_details}\n\n"
+                      f"**해결 방법:**\n\n"
+                      f"🔧 **즉시 해결**\n"
+                      f"1. `fix-ollama-500.bat` 실행 (자동 진단 및 수정)\n"
+                      f"2. 또는 `test-ollama.bat` 실행 (상세 진단)\n\n"
+                      f"🚀 **수동 해결**\n"
+                      f"1. Ollama 재시작: `ollama serve`\n"
+                      f"2. 모델 설치: `ollama pull llama3.2:3b`\n"
+                      f"3. 시스템 재시작 (권장)\n\n"
+                      f"📥 **Ollama 설치가 필요한 경우**\n"
+                      f"• 자동 설치: `install-ollama-simple.bat`\n"
+                      f"• 수동 설치: https://ollama.com/download\n\n"
+                      f"**현재 사용 가능한 기능:**\n"
+                      f"• XShell 세션 연결 및 명령어 실행\n"
+                      f"• 터미널 작업 지원\n\n"
+                      f"AI 기능이 복구되면 지능적인 대화와 코드 분석을 이용할 수 있습니다! 🤖",
+            'metadata': {
+                'type': 'ai_service_error',
+                'error_details': error_details,
+                'shell_type': shell_type,
+                'capabilities': ['command_execution', 'xshell_integration'],
+                'repair_tools': ['fix-ollama-500.bat', 'test-ollama.bat', 'install-ollama-simple.bat']
             }
+        }
+    
+    def _general_chat_error_response(self, e: Exception, shell_type: Optional[str]) -> Dict[str, Any]:
+        """구체적인 오류 분석"""
+        error_str = str(e)
+        if "500" in error_str:
+            repair_message = "🔧 **Ollama 500 오류 해결 방법:**\n" \
+                           "1. `fix-ollama-500.bat` 실행 (자동 수정)\n" \
+                           "2. 시스템 재시작 후 재시도\n" \
+                           "3. 더 작은 모델 사용: `ollama pull llama3.2:1b`"
+        elif "404" in error_str:
+            repair_message = "🔧 **API 엔드포인트 오류:**\n" \
+                           "Ollama 버전이 낮을 수 있습니다. 최신 버전으로 업데이트하세요."
+        elif "timeout" in error_str.lower():
+            repair_message = "⏱️ **응답 시간 초과:**\n" \
+                            "모델이 너무 크거나 메모리가 부족할 수 있습니다.\n" \
+                            "더 작은 모델을 사용해보세요."
+        elif "connection" in error_str.lower():
+            repair_message = "🔌 **연결 오류:**\n" \
+                            "`ollama serve` 명령어로 서비스를 시작하세요."
+        else:
+            repair_message = "🛠️ **일반적인 해결 방법:**\n" \
+                            "1. `fix-ollama-500.bat` 실행\n" \
+                            "2. Ollama 서비스 재시작\n" \
+                            "3. 시스템 재시작"
+        
+        return {
+            'content': f"😅 **AI 응답 생성 중 오류가 발생했습니다**\n\n"
+                      f"**오류 내용:** {error_str}\n\n"
+                      f"{repair_message}\n\n"
+                      f"**임시 해결책:**\n"
+                      f"XShell 기능(명령어 실행, 터미널 작업)은 정상적으로 사용 가능합니다.\n"
+                      f"AI 기능이 복구되면 더 스마트한 도움을 받을 수 있습니다! 🚀",
+            'metadata': {
+                'type': 'ai_error',
+                'error_details': error_str,
+                'shell_type': shell_type
+            }
+        }
+    
+    def _generate(self, client: OllamaClient, prompt: str, system_prompt: str,
+                  on_token: Callable[[str], None] = None) -> Dict[str, Any]:
+        """generate 호출 - on_token이 있으면 스트리밍으로 받아 조립"""
+        if not on_token:
+            return client.generate(prompt, system_prompt)
+        
+        chunks = []
+        for chunk in client.generate_stream(prompt, system_prompt):
+            chunks.append(chunk)
+            on_token(chunk)
+        
+        if not chunks:
+            raise Exception("Ollama에서 빈 응답을 반환했습니다")
+        return {'response': ''.join(chunks), 'model': client.model, 'done': True}
+    
+    def _chat(self, client: OllamaClient, messages: List[Dict[str, str]],
+              on_token: Callable[[str], None] = None) -> Dict[str, Any]:
+        """chat 호출 - on_token이 있으면 스트리밍으로 받아 조립"""
+        if not on_token:
+            return client.chat(messages)
+        
+        chunks = []
+        for chunk in client.chat_stream(messages):
+            chunks.append(chunk)
+            on_token(chunk)
+        
+        if not chunks:
+            raise Exception("Ollama에서 빈 응답을 반환했습니다")
+        return {'message': {'role': 'assistant', 'content': ''.join(chunks)}, 'model': client.model, 'done': True}
+    
+    async def _agenerate(self, client: AsyncOllamaClient, prompt: str, system_prompt: str,
+                         on_token: Callable[[str], None] = None) -> Dict[str, Any]:
+        """비동기 generate 호출 - on_token이 있으면 스트리밍으로 받아 조립"""
+        if not on_token:
+            return await client.generate(prompt, system_prompt)
+        
+        chunks = []
+        async for chunk in client.generate_stream(prompt, system_prompt):
+            chunks.append(chunk)
+            on_token(chunk)
+        
+        if not chunks:
+            raise Exception("Ollama에서 빈 응답을 반환했습니다")
+        return {'response': ''.join(chunks), 'model': client.model, 'done': True}
+    
+    async def _achat(self, client: AsyncOllamaClient, messages: List[Dict[str, str]],
+                     on_token: Callable[[str], None] = None) -> Dict[str, Any]:
+        """비동기 chat 호출 - on_token이 있으면 스트리밍으로 받아 조립"""
+        if not on_token:
+            return await client.chat(messages)
+        
+        chunks = []
+        async for chunk in client.chat_stream(messages):
+            chunks.append(chunk)
+            on_token(chunk)
+        
+        if not chunks:
+            raise Exception("Ollama에서 빈 응답을 반환했습니다")
+        return {'message': {'role': 'assistant', 'content': ''.join(chunks)}, 'model': client.model, 'done': True}
     
     def handle_default(self, message: str, context: List[Dict], user_context: Dict = None) -> Dict[str, Any]:
         """기본 처리"""
@@ -802,103 +1387,158 @@ class AIService:
         }
     
     def explain_command(self, command: str, shell_type: str = None) -> str:
-        """명령어 설명 생성 - OS별 명령어 지원"""
+        """명령어 설명 생성 - OS별 명령어 지원 (명령어/shell/모델 기준 캐시)"""
         
+        target_shell = self._target_shell(shell_type)
+        explanation_cache = get_explanation_cache()
+        
+        cached = explanation_cache.get(command, target_shell, self.code_client.model)
+        if cached is not None:
+            return cached
+        
+        try:
+            system_prompt, prompt = self._explain_command_prompt(command, target_shell)
+            # 설명은 채팅 응답보다 나중에 처리
+            with llm_priority(PRIORITY_BACKGROUND):
+                response = self.code_client.generate(prompt, system_prompt)
+            explanation = response.get('response')
+            if not explanation:
+                return f'`{command}` 명령어입니다.'
+            
+            explanation_cache.set(command, target_shell, self.code_client.model, explanation)
+            return explanation
+            
+        except Exception:
+            # 기본 설명은 캐시하지 않음 (Ollama 복구 후 다시 생성)
+            return self._default_command_explanation(command, target_shell)
+    
+    async def aexplain_command(self, command: str, shell_type: str = None,
+                               on_token: Callable[[str], None] = None) -> str:
+        """명령어 설명 생성 (비동기) - on_token이 주어지면 생성되는 대로 전달"""
+        
+        target_shell = self._target_shell(shell_type)
+        explanation_cache = get_explanation_cache()
+        
+        cached = await explanation_cache.aget(command, target_shell, self.async_code_client.model)
+        if cached is not None:
+            if on_token:
+                on_token(cached)
+            return cached
+        
+        try:
+            system_prompt, prompt = self._explain_command_prompt(command, target_shell)
+            with llm_priority(PRIORITY_BACKGROUND):
+                if on_token is None:
+                    response = await self.async_code_client.generate(prompt, system_prompt)
+                    explanation = response.get('response')
+                else:
+                    chunks = []
+                    async for chunk in self.async_code_client.generate_stream(prompt, system_prompt):
+                        chunks.append(chunk)
+                        on_token(chunk)
+                    explanation = ''.join(chunks).strip()
+            if not explanation:
+                return f'`{command}` 명령어입니다.'
+            
+            await explanation_cache.aset(command, target_shell, self.async_code_client.model, explanation)
+            return explanation
+            
+        except Exception:
+            return self._default_command_explanation(command, target_shell)
+    
+    def _target_shell(self, shell_type: Optional[str]) -> str:
         import platform
         is_windows = platform.system().lower() == 'windows'
         
         # shell_type이 지정되면 그것을 우선으로, 없으면 OS에 따라 결정
         if shell_type == 'powershell' or (not shell_type and is_windows):
-            target_shell = 'powershell'
+            return 'powershell'
         elif shell_type == 'cmd':
-            target_shell = 'cmd'
+            return 'cmd'
         else:
-            target_shell = 'unix'
+            return 'unix'
+    
+    def _explain_command_prompt(self, command: str, target_shell: str) -> tuple:
+        """명령어 설명용 (system_prompt, prompt)"""
         
-        try:
-            if target_shell == 'powershell':
-                system_prompt = """당신은 PowerShell 전문가입니다. 
-                PowerShell 명령어를 간단히 설명해주세요."""
-                
-                prompt = f"""
-                다음 PowerShell 명령어를 간단히 설명해주세요:
-                
-                명령어: {command}
-                
-                설명은 다음 형식으로 해주세요:
-                - 기능: 명령어가 수행하는 작업
-                - 매개변수: 사용된 주요 매개변수들의 의미 (있다면)
-                - 주의사항: 실행 시 주의할 점 (있다면)
-                
-                2-3줄로 간단히 설명해주세요.
-                """
-            elif target_shell == 'cmd':
-                system_prompt = """당신은 Windows Command Prompt 전문가입니다. 
-                CMD 명령어를 간단히 설명해주세요."""
-                
-                prompt = f"""
-                다음 Command Prompt 명령어를 간단히 설명해주세요:
-                
-                명령어: {command}
-                
-                설명은 다음 형식으로 해주세요:
-                - 기능: 명령어가 수행하는 작업
-                - 옵션: 사용된 주요 옵션들의 의미 (있다면)
-                - 주의사항: 실행 시 주의할 점 (있다면)
-                
-                2-3줄로 간단히 설명해주세요.
-                """
-            else:
-                system_prompt = """당신은 리눅스/유닉스 명령어 전문가입니다. 
-                명령어를 간단히 설명해주세요."""
-                
-                prompt = f"""
-                다음 리눅스/유닉스 명령어를 간단히 설명해주세요:
-                
-                명령어: {command}
-                
-                설명은 다음 형식으로 해주세요:
-                - 기능: 명령어가 수행하는 작업
-                - 옵션: 사용된 주요 옵션들의 의미 (있다면)
-                - 주의사항: 실행 시 주의할 점 (있다면)
-                
-                2-3줄로 간단히 설명해주세요.
-                """
+        if target_shell == 'powershell':
+            system_prompt = """당신은 PowerShell 전문가입니다. 
+            PowerShell 명령어를 간단히 설명해주세요."""
             
-            response = self.code_client.generate(prompt, system_prompt)
-            return response.get('response', f'`{command}` 명령어입니다.')
+            prompt = f"""
+            다음 PowerShell 명령어를 간단히 설명해주세요:
             
-        except Exception:
-            # AI가 실패하면 기본 설명 제공
-            if target_shell == 'powershell':
-                return f'`{command}` PowerShell 명령어입니다.'
-            elif target_shell == 'cmd':
-                return f'`{command}` Command Prompt 명령어입니다.'
-            else:
-                return f'`{command}` Unix/Linux 명령어입니다.'
-    
-    def format_context(self, context: List[Dict]) -> str:
-        """컨텍스트를 문자열로 포맷"""
-        if not context:
-            return "이전 대화 없음"
-        
-        formatted = []
-        for msg in context[-5:]:  # 최근 5개만
-            role = "사용자" if msg['role'] == 'user' else "AI"
-            formatted.append(f"{role}: {msg['content'][:100]}...")
+            명령어: {command}
+            
+            설명은 다음 형식으로 해주세요:
+            - 기능: 명령어가 수행하는 작업
+            - 매개변수: 사용된 주요 매개변수들의 의미 (있다면)
+            - 주의사항: 실행 시 주의할 점 (있다면)
+            
+            2-3줄로 간단히 설명해주세요.
+            """
+        elif target_shell == 'cmd':
+            system_prompt = """당신은 Windows Command Prompt 전문가입니다. 
+            CMD 명령어를 간단히 설명해주세요."""
+            
+            prompt = f"""
+            다음 Command Prompt 명령어를 간단히 설명해주세요:
+            
+            명령어: {command}
+            
+            설명은 다음 형식으로 해주세요:
+            - 기능: 명령어가 수행하는 작업
+            - 옵션: 사용된 주요 옵션들의 의미 (있다면)
+            - 주의사항: 실행 시 주의할 점 (있다면)
+            
+            2-3줄로 간단히 설명해주세요.
+            """
+        else:
+            system_prompt = """당신은 리눅스/유닉스 명령어 전문가입니다. 
+            명령어를 간단히 설명해주세요."""
+            
+            prompt = f"""
+            다음 리눅스/유닉스 명령어를 간단히 설명해주세요:
+            
+            명령어: {command}
+            
+            설명은 다음 형식으로 해주세요:
+            - 기능: 명령어가 수행하는 작업
+            - 옵션: 사용된 주요 옵션들의 의미 (있다면)
+            - 주의사항: 실행 시 주의할 점 (있다면)
+            
+            2-3줄로 간단히 설명해주세요.
+            """
         
-        return "\n".join(formatted)
+        return system_prompt, prompt
+    
+    def _default_command_explanation(self, command: str, target_shell: str) -> str:
+        # AI가 실패하면 기본 설명 제공
+        if target_shell == 'powershell':
+            return f'`{command}` PowerShell 명령어입니다.'
+        elif target_shell == 'cmd':
+            return f'`{command}` Command Prompt 명령어입니다.'
+        else:
+            return f'`{command}` Unix/Linux 명령어입니다.'
+    
+    def format_context(self, context: List[Dict], message: str = '', system_prompt: str = '',
+                       model: str = None) -> str:
+        """컨텍스트를 문자열로 포맷 - 모델 토큰 예산 안에서 최근 대화부터"""
+        builder = get_prompt_builder(model or self.ollama_client.model)
+        return builder.build_context_text(context, message, system_prompt)
+    
+    def _chat_messages(self, model: str, context: List[Dict], message: str) -> List[Dict[str, str]]:
+        """/api/chat 메시지 목록 - 모델 토큰 예산 안에서 최근 대화부터"""
+        plan = get_prompt_builder(model).build_chat_messages(context, message)
+        if plan.dropped:
+            logger.debug(f"프롬프트 예산 초과로 이전 대화 {plan.dropped}개 제외 ({plan.tokens} 토큰)")
+        return plan.messages
     
     def get_available_models(self) -> List[Dict[str, str]]:
-        """사용 가능한 AI 모델 목록"""
-        try:
-            response = requests.get(f"{self.ollama_client.base_url}/api/tags")
-            if response.status_code == 200:
-                models = response.json().get('models', [])
-                return [{'name': model['name'], 'size': model.get('size', 'Unknown')} 
-                       for model in models]
-        except:
-            pass
+        """사용 가능한 AI 모델 목록 (상태 모니터의 마지막 확인 결과)"""
+        models = self.health_monitor.snapshot()['models']
+        if models:
+            return models
         
         return [
             {'name': settings.DEFAULT_AI_MODEL, 'size': 'Unknown'},
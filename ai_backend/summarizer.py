@@ -0,0 +1,185 @@
+import threading
+import logging
+from typing import Dict, Any, List
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Count, F, Q
+
+from chatbot.models import ChatSession, ConversationSummary
+from chatbot.session_context import get_session_context_store
+from .admission import llm_priority, PRIORITY_BACKGROUND
+from .health import get_health_monitor
+from .prompt_budget import get_prompt_builder
+
+logger = logging.getLogger('xshell_chatbot')
+
+SUMMARY_SYSTEM_PROMPT = """당신은 대화 기록을 요약하는 도우미입니다.
+이전 요약과 새 대화를 합쳐 하나의 요약으로 만드세요.
+실행한 명령어, 대상 서버, 발견한 문제와 결론, 남은 작업은 빠뜨리지 말고
+불필요한 인사나 반복은 생략하세요. 한국어로 20줄 이내로 작성하세요."""
+
+MESSAGE_LABELS = {'user': '사용자', 'ai': 'AI', 'system': '시스템', 'command': '명령어', 'result': '실행 결과'}
+
+
+class ConversationSummarizer:
+    """긴 채팅 세션의 오래된 메시지를 주기적으로 요약해 저장하는 백그라운드 작업
+
+    최근 대화 창(keep_recent개)보다 앞선 메시지가 min_messages개 이상 쌓인 세션만
+    골라, 이전 요약 + 새 메시지를 다시 요약한다. 저장된 요약은 세션 컨텍스트
+    맨 앞에 붙어 원문 대화 대신 프롬프트에 들어간다.
+    """
+
+    def __init__(self, interval: float = None, min_messages: int = None, keep_recent: int = None,
+                 max_messages: int = None, sessions_per_run: int = None):
+        self.interval = interval or getattr(settings, 'SUMMARY_INTERVAL', 300)
+        self.min_messages = min_messages or getattr(settings, 'SUMMARY_MIN_MESSAGES', 20)
+        self.keep_recent = keep_recent or getattr(settings, 'SESSION_CONTEXT_WINDOW', 10)
+        self.max_messages = max_messages or getattr(settings, 'SUMMARY_MAX_MESSAGES', 100)
+        self.sessions_per_run = sessions_per_run or getattr(settings, 'SUMMARY_SESSIONS_PER_RUN', 5)
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.runs = 0
+        self.summaries = 0
+        self.summarized_messages = 0
+        self.errors = 0
+
+    def start(self):
+        """요약 스레드 시작 (이미 실행 중이면 무시)"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='conversation-summarizer', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        # 서버 시작 직후에는 요약하지 않음 - 첫 주기가 지난 뒤부터
+        while not self._stop.wait(self.interval):
+            try:
+                if get_health_monitor().snapshot()['available']:
+                    self.run_once()
+            except Exception as e:
+                logger.error(f"대화 요약 작업 중 오류: {e}")
+            finally:
+                close_old_connections()
+
+    def candidates(self) -> List[ChatSession]:
+        """요약되지 않은 메시지가 많은 활성 세션 (많은 순)"""
+        unsummarized = Q(summary__isnull=True) | Q(messages__timestamp__gt=F('summary__summarized_until'))
+        return list(
+            ChatSession.objects.filter(is_active=True)
+                               .annotate(unsummarized=Count('messages', filter=unsummarized))
+                               .filter(unsummarized__gte=self.min_messages + self.keep_recent)
+                               .order_by('-unsummarized')[:self.sessions_per_run]
+        )
+
+    def run_once(self) -> int:
+        """후보 세션들을 요약하고 요약한 세션 수 반환"""
+        self.runs += 1
+        summarized = 0
+        for session in self.candidates():
+            try:
+                if self.summarize_session(session):
+                    summarized += 1
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"세션 {session.session_id} 요약 실패: {e}")
+        return summarized
+
+    def summarize_session(self, session: ChatSession) -> bool:
+        """최근 대화 창 이전의 요약되지 않은 메시지를 기존 요약과 합쳐 저장"""
+        from .services import OllamaClient
+
+        existing = ConversationSummary.objects.filter(session=session).first()
+        messages = session.messages.order_by('timestamp')
+        if existing:
+            messages = messages.filter(timestamp__gt=existing.summarized_until)
+        messages = list(messages)
+
+        older = messages[:-self.keep_recent] if self.keep_recent else messages
+        if len(older) < self.min_messages:
+            return False
+        older = older[:self.max_messages]  # 나머지는 다음 주기에
+
+        client = OllamaClient()
+        prompt, older = self._prompt(existing.content if existing else '', older, client.model)
+        with llm_priority(PRIORITY_BACKGROUND):
+            response = client.generate(prompt, SUMMARY_SYSTEM_PROMPT)
+        content = (response.get('response') or '').strip()
+        if not content:
+            raise Exception("요약 결과가 비어 있습니다")
+
+        ConversationSummary.objects.update_or_create(
+            session=session,
+            defaults={
+                'content': content,
+                'summarized_until': older[-1].timestamp,
+                'message_count': (existing.message_count if existing else 0) + len(older),
+                'model_used': client.model,
+            }
+        )
+        get_session_context_store().set_summary(session.session_id, content)
+
+        self.summaries += 1
+        self.summarized_messages += len(older)
+        logger.info(f"세션 {session.session_id} 대화 {len(older)}개 요약")
+        return True
+
+    def _prompt(self, previous: str, messages: list, model: str) -> tuple:
+        """(프롬프트, 실제로 담은 메시지) - 모델 예산을 넘으면 뒤쪽 메시지는 다음 주기로 미룸"""
+        builder = get_prompt_builder(model)
+        available = builder.budget - builder.count_tokens(SUMMARY_SYSTEM_PROMPT + previous) - 50
+
+        lines = []
+        included = []
+        for message in messages:
+            label = MESSAGE_LABELS.get(message.message_type, message.message_type)
+            line = f"{label}: {builder.fit(message.content, builder.message_limit)}"
+            cost = builder.count_tokens(line)
+            if included and cost > available:
+                break
+            available -= cost
+            lines.append(line)
+            included.append(message)
+
+        transcript = "\n".join(lines)
+        prompt = f"""이전 요약:
+{previous or '없음'}
+
+새 대화:
+{transcript}
+
+위 내용을 합친 요약:"""
+        return prompt, included
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'running': bool(self._thread and self._thread.is_alive()),
+            'interval': self.interval,
+            'min_messages': self.min_messages,
+            'runs': self.runs,
+            'summaries': self.summaries,
+            'summarized_messages': self.summarized_messages,
+            'errors': self.errors
+        }
+
+
+_summarizer = None
+_summarizer_lock = threading.Lock()
+
+
+def get_conversation_summarizer() -> ConversationSummarizer:
+    """프로세스 전역 대화 요약기 반환 (SUMMARY_ENABLED이면 최초 호출 시 스레드 시작)"""
+    global _summarizer
+    if _summarizer is None:
+        with _summarizer_lock:
+            if _summarizer is None:
+                _summarizer = ConversationSummarizer()
+                if getattr(settings, 'SUMMARY_ENABLED', True):
+                    _summarizer.start()
+    return _summarizer
@@ -4,6 +4,14 @@ from django.views.decorators.http import require_http_methods
 import json
 
 from .services import AIService
+from .http_pool import get_http_pool
+from .explain_cache import get_explanation_cache
+from .summarizer import get_conversation_summarizer
+from .residency import get_residency_manager
+from .admission import get_admission_controller
+from .coalesce import get_single_flight
+from .circuit import get_circuit_breakers
+from chatbot.session_context import get_session_context_store
 
 
 @csrf_exempt
@@ -88,13 +96,23 @@ def health_check(request):
     """AI 서비스 상태 확인"""
     try:
         ai_service = AIService()
-        is_available = ai_service.ollama_client.is_available()
+        health = ai_service.health_monitor.snapshot()
         
         return JsonResponse({
             'success': True,
-            'ollama_available': is_available,
+            'ollama_available': health['available'],
+            'error_message': health['error_message'],
+            'last_checked': health['checked_at'],
             'base_url': ai_service.ollama_client.base_url,
-            'model': ai_service.ollama_client.model
+            'model': ai_service.ollama_client.model,
+            'http_pool': get_http_pool().stats(),
+            'explain_cache': get_explanation_cache().stats(),
+            'session_context': get_session_context_store().stats(),
+            'summarizer': get_conversation_summarizer().stats(),
+            'model_residency': get_residency_manager().stats(refresh=health['available']),
+            'admission': get_admission_controller().stats(),
+            'request_coalescing': get_single_flight().stats(),
+            'circuit_breakers': get_circuit_breakers(ai_service.ollama_client.base_url).stats()
         })
         
     except Exception as e:
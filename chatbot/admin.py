@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
-from .models import ChatSession, ChatMessage, XShellSession, CommandHistory, AIModel
+from .models import ChatSession, ChatMessage, XShellSession, CommandHistory, AIModel, CommandPhrase, ConversationSummary
 
 
 @admin.register(ChatSession)
@@ -194,6 +194,66 @@ class AIModelAdmin(admin.ModelAdmin):
     deactivate_models.short_description = '선택된 모델 비활성화'
 
 
+@admin.register(CommandPhrase)
+class CommandPhraseAdmin(admin.ModelAdmin):
+    list_display = ['phrase', 'command', 'shell_family', 'is_active', 'created_at']
+    list_filter = ['shell_family', 'is_active']
+    search_fields = ['phrase', 'command']
+    readonly_fields = ['created_at']
+    
+    def _invalidate_index(self):
+        # 다음 명령어 추출 시 인덱스를 다시 읽도록 표시
+        from ai_backend.command_index import get_command_index
+        get_command_index().invalidate()
+    
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        self._invalidate_index()
+    
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        self._invalidate_index()
+    
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        self._invalidate_index()
+    
+    actions = ['activate_phrases', 'deactivate_phrases']
+    
+    def activate_phrases(self, request, queryset):
+        updated = queryset.update(is_active=True)
+        self._invalidate_index()
+        self.message_user(request, f'{updated}개 표현이 활성화되었습니다.')
+    activate_phrases.short_description = '선택된 표현 활성화'
+    
+    def deactivate_phrases(self, request, queryset):
+        updated = queryset.update(is_active=False)
+        self._invalidate_index()
+        self.message_user(request, f'{updated}개 표현이 비활성화되었습니다.')
+    deactivate_phrases.short_description = '선택된 표현 비활성화'
+
+
+@admin.register(ConversationSummary)
+class ConversationSummaryAdmin(admin.ModelAdmin):
+    list_display = ['session', 'message_count', 'summarized_until', 'model_used', 'updated_at']
+    search_fields = ['session__session_id', 'session__title', 'content']
+    readonly_fields = ['summarized_until', 'message_count', 'model_used', 'updated_at']
+    raw_id_fields = ['session']
+    
+    def _refresh_context(self, session_id):
+        # 수정/삭제한 요약이 다음 대화부터 반영되도록 세션 창을 다시 읽게 함
+        from .session_context import get_session_context_store
+        get_session_context_store().invalidate(session_id)
+    
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        self._refresh_context(obj.session.session_id)
+    
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        self._refresh_context(obj.session.session_id)
+
+
 # Admin 사이트 커스터마이징
 admin.site.site_header = "XShell AI 챗봇 관리"
 admin.site.site_title = "XShell AI 챗봇"
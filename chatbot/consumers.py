@@ -1,12 +1,18 @@
 import json
+import uuid
 import asyncio
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 from .models import ChatSession, ChatMessage, XShellSession
+from .write_behind import get_write_behind_queue
+from .session_context import get_session_context_store
 from ai_backend.services import AIService
 from xshell_integration.services import XShellService
+from xshell_integration.speculative import get_speculative_executor
 
 
 class ChatConsumer(AsyncWebsocketConsumer):
@@ -14,10 +20,11 @@ class ChatConsumer(AsyncWebsocketConsumer):
     
     async def connect(self):
         self.session_id = self.scope['url_route']['kwargs']['session_id']
+        self.shell_type = None  # 마지막 채팅 메시지의 셸 종류 (미리 실행 결과 조회 키와 맞추기 위해 보관)
         await self.accept()
         
-        # 세션 존재 확인 및 생성
-        await self.ensure_chat_session()
+        # 세션 존재 확인 및 생성 (메시지 저장 시 재조회하지 않도록 보관)
+        self.chat_session = await self.ensure_chat_session()
     
     async def disconnect(self, close_code):
         pass
@@ -56,6 +63,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
         metadata = {}
         if shell_type:
             metadata['shell_type'] = shell_type
+        self.shell_type = shell_type
         if command_mode:
             metadata['command_mode'] = command_mode
         
@@ -69,6 +77,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
         """명령어 실행 처리"""
         command = data.get('command', '')
         session_name = data.get('session_name', 'default')
+        shell_type = data.get('shell_type') or self.shell_type
         
         if not command.strip():
             return
@@ -80,7 +89,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
         await self.send(text_data=json.dumps({
             'type': 'message',
             'message': {
-                'id': command_message.id,
+                'client_id': str(command_message.client_id),
                 'type': 'command',
                 'content': command,
                 'timestamp': command_message.timestamp.isoformat()
@@ -88,7 +97,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
         }))
         
         # 명령어 실행 (비동기)
-        asyncio.create_task(self.execute_command_async(command, session_name))
+        asyncio.create_task(self.execute_command_async(command, session_name, shell_type))
     
     async def handle_typing_indicator(self, data):
         """타이핑 인디케이터 처리"""
@@ -123,9 +132,34 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 'session_id': self.session_id
             }
             
-            ai_response = await database_sync_to_async(
-                ai_service.process_message
-            )(message_content, self.session_id, message_type, context)
+            # 스트리밍 모드: 토큰을 큐에 넣고 별도 태스크가 message_delta 프레임으로 전송
+            stream_id = str(uuid.uuid4())
+            on_token = None
+            on_ready = None
+            delta_task = None
+            
+            if getattr(settings, 'AI_STREAM_RESPONSES', True):
+                delta_queue = asyncio.Queue()
+                on_token = delta_queue.put_nowait
+                delta_task = asyncio.create_task(self.forward_message_deltas(stream_id, delta_queue))
+                
+                async def on_ready(metadata):
+                    # 명령어가 확정되면 설명 스트리밍 전에 실행 버튼부터 표시
+                    await self.send(text_data=json.dumps({
+                        'type': 'message_ready',
+                        'message_id': stream_id,
+                        'metadata': metadata
+                    }))
+            
+            # LLM 호출은 이벤트 루프에서 비동기로 처리 (스레드 점유 없음)
+            try:
+                ai_response = await ai_service.aprocess_message(
+                    message_content, self.session_id, message_type, context, on_token, on_ready
+                )
+            finally:
+                if delta_task:
+                    delta_queue.put_nowait(None)
+                    await delta_task
             
             # AI 응답 메타데이터 구성
             response_metadata = ai_response.get('metadata', {})
@@ -148,11 +182,12 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 'user': 'ai'
             }))
             
-            # AI 응답 전송
+            # AI 응답 전송 (stream_id로 스트리밍 중이던 메시지를 대체)
             await self.send(text_data=json.dumps({
                 'type': 'message',
                 'message': {
-                    'id': ai_message.id,
+                    'client_id': str(ai_message.client_id),
+                    'stream_id': stream_id,
                     'type': 'ai',
                     'content': ai_response['content'],
                     'timestamp': ai_message.timestamp.isoformat(),
@@ -171,14 +206,39 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 }
             }))
     
-    async def execute_command_async(self, command, session_name):
+    async def forward_message_deltas(self, stream_id, delta_queue):
+        """스트리밍 토큰을 message_delta 프레임으로 전송 (쌓인 청크는 한 프레임으로 병합)"""
+        finished = False
+        
+        while not finished:
+            chunk = await delta_queue.get()
+            if chunk is None:
+                break
+            
+            pieces = [chunk]
+            while not delta_queue.empty():
+                chunk = delta_queue.get_nowait()
+                if chunk is None:
+                    finished = True
+                    break
+                pieces.append(chunk)
+            
+            await self.send(text_data=json.dumps({
+                'type': 'message_delta',
+                'message_id': stream_id,
+                'delta': ''.join(pieces)
+            }))
+    
+    async def execute_command_async(self, command, session_name, shell_type=None):
         """명령어 비동기 실행"""
         try:
-            # XShell 서비스 호출
-            xshell_service = XShellService()
-            result = await database_sync_to_async(
-                xshell_service.execute_command
-            )(command, session_name)
+            # 미리 실행해 둔 결과가 있으면 사용, 없으면 XShell 서비스 호출 (미리 실행할 때와 같은 shell_type으로 조회)
+            result = await database_sync_to_async(get_speculative_executor().take)(command, session_name, shell_type)
+            if result is None:
+                xshell_service = XShellService()
+                result = await database_sync_to_async(
+                    xshell_service.execute_command
+                )(command, session_name, shell_type, chat_session_id=self.session_id)
             
             # 결과 메시지 저장
             result_message = await self.save_message(
@@ -195,7 +255,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
             await self.send(text_data=json.dumps({
                 'type': 'message',
                 'message': {
-                    'id': result_message.id,
+                    'client_id': str(result_message.client_id),
                     'type': 'result',
                     'content': result['output'],
                     'timestamp': result_message.timestamp.isoformat(),
@@ -225,14 +285,16 @@ class ChatConsumer(AsyncWebsocketConsumer):
     
     @database_sync_to_async
     def save_message(self, message_type, content, metadata=None):
-        """메시지 저장"""
-        session = ChatSession.objects.get(session_id=self.session_id)
-        return ChatMessage.objects.create(
-            session=session,
+        """메시지 저장 - 쓰기 지연 큐에 넣고 바로 반환 (id는 일괄 저장 후 채워지므로 client_id로 식별)"""
+        message = get_write_behind_queue().enqueue(ChatMessage(
+            session=self.chat_session,
             message_type=message_type,
             content=content,
+            timestamp=timezone.now(),
             metadata=metadata or {}
-        )
+        ))
+        get_session_context_store().record(message)
+        return message
 
 
 class XShellConsumer(AsyncWebsocketConsumer):
@@ -240,10 +302,11 @@ class XShellConsumer(AsyncWebsocketConsumer):
     
     async def connect(self):
         self.session_name = self.scope['url_route']['kwargs']['session_name']
+        self.command_task = None
         await self.accept()
     
     async def disconnect(self, close_code):
-        pass
+        await self.cancel_running_command()
     
     async def receive(self, text_data):
         try:
@@ -252,7 +315,16 @@ class XShellConsumer(AsyncWebsocketConsumer):
             
             if command_type == 'command':
                 command = text_data_json.get('command', '')
-                await self.execute_command(command)
+                # 실행은 별도 태스크로 돌려 실행 중에도 interrupt 메시지를 받을 수 있게 함
+                await self.cancel_running_command()
+                self.command_task = asyncio.create_task(self.execute_command(command))
+            elif command_type == 'multi_command':
+                command = text_data_json.get('command', '')
+                session_names = text_data_json.get('session_names', [])
+                await self.cancel_running_command()
+                self.command_task = asyncio.create_task(
+                    self.execute_multi_command(command, session_names, text_data_json.get('max_concurrency'))
+                )
             elif command_type == 'interrupt':
                 await self.interrupt_command()
                 
@@ -265,12 +337,9 @@ class XShellConsumer(AsyncWebsocketConsumer):
         """명령어 실행"""
         try:
             xshell_service = XShellService()
-            result = await database_sync_to_async(
-                xshell_service.execute_command_stream
-            )(command, self.session_name)
             
-            # 결과를 실시간으로 스트리밍
-            for output_chunk in result:
+            # 결과를 실시간으로 스트리밍 (출력을 기다리는 동안 이벤트 루프를 막지 않음)
+            async for output_chunk in xshell_service.aexecute_command_stream(command, self.session_name):
                 await self.send(text_data=json.dumps({
                     'type': 'output',
                     'content': output_chunk
@@ -282,9 +351,50 @@ class XShellConsumer(AsyncWebsocketConsumer):
                 'content': f'Error: {str(e)}'
             }))
     
+    async def execute_multi_command(self, command, session_names, max_concurrency=None):
+        """여러 세션에 같은 명령어 실행 - 호스트별 결과를 끝나는 순서대로 전송"""
+        succeeded = 0
+        failed = 0
+        try:
+            xshell_service = XShellService()
+            
+            async for result in xshell_service.aexecute_command_multi(command, session_names, max_concurrency):
+                if result['success']:
+                    succeeded += 1
+                else:
+                    failed += 1
+                await self.send(text_data=json.dumps({
+                    'type': 'host_result',
+                    'result': result
+                }))
+            
+            await self.send(text_data=json.dumps({
+                'type': 'multi_complete',
+                'succeeded': succeeded,
+                'failed': failed
+            }))
+            
+        except Exception as e:
+            await self.send(text_data=json.dumps({
+                'type': 'error',
+                'content': f'Error: {str(e)}'
+            }))
+    
+    async def cancel_running_command(self):
+        """실행 중인 명령어 태스크 취소 (로컬 프로세스는 함께 종료됨)"""
+        task, self.command_task = self.command_task, None
+        if task and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+    
     async def interrupt_command(self):
         """명령어 중단"""
         try:
+            await self.cancel_running_command()
+            
             xshell_service = XShellService()
             await database_sync_to_async(
                 xshell_service.interrupt_command
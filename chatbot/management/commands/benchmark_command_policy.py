@@ -0,0 +1,161 @@
+from django.core.management.base import BaseCommand
+import timeit
+
+from xshell_integration.command_policy import CommandPolicy
+
+# 실제 운영 중 자주 쓰는 명령어와 위험 명령어 변형 (True = 위험)
+COMMAND_CORPUS = [
+    ('ls -la', False),
+    ('ps aux | grep nginx', False),
+    ('df -h', False),
+    ('du -sh /var/log/* | sort -h | tail -20', False),
+    ('free -m', False),
+    ('tail -n 200 /var/log/syslog', False),
+    ('journalctl -u nginx --since "1 hour ago"', False),
+    ('systemctl status nginx', False),
+    ('systemctl restart nginx', False),
+    ('docker ps --format "{{.Names}}\t{{.Status}}"', False),
+    ('git log --format="%h %s" -n 20', False),
+    ('git status && git diff --stat', False),
+    ('find . -name "*.pyc" -exec rm {} \\;', False),
+    ('rm -rf /tmp/build-cache', False),
+    ('rm -rf ./node_modules', False),
+    ('tar czf backup.tar.gz /etc/nginx', False),
+    ('chown -R www-data:www-data /home/deploy/app', False),
+    ('chown -R www-data:www-data /var/www/html', True),
+    ('chmod 644 /etc/nginx/nginx.conf', False),
+    ('netstat -tulpn | grep LISTEN', False),
+    ('ss -s', False),
+    ('crontab -l', False),
+    ('cat /etc/os-release', False),
+    ('echo "asphalt halt-free formatting" > notes.txt', False),
+    ('python manage.py migrate > /dev/null 2>&1', False),
+    ('kill -9 $(pgrep -f celery)', False),
+    ('fdisk -l', False),
+    ('shutdown -c', False),
+    ('sudo apt-get update && sudo apt-get upgrade -y', False),
+    ('ipconfig /all', False),
+    ('dir C:\\Users\\admin\\Documents', False),
+    ('tasklist | findstr python', False),
+    ('del C:\\temp\\old.log', False),
+    ('net user', False),
+    ('Get-Process | Sort-Object CPU -Descending | Select-Object -First 10', False),
+    ('Get-ChildItem -Recurse C:\\Projects -Filter *.log', False),
+    ('for f in *.log; do gzip "$f"; done', False),
+    ('rm -rf /', True),
+    ('rm  -rf /', True),
+    ('rm -fr /*', True),
+    ('sudo rm -rf --no-preserve-root /', True),
+    ('cd /tmp && rm -rf ~', True),
+    ('echo cleanup; rm -Rf /etc/', True),
+    ('rm -rf /etc/ssh', True),
+    ('rm -rf /tmp/../var/lib', True),
+    ('bash -c "rm -rf /"', True),
+    ('echo $(rm -rf /usr)', True),
+    ('dd if=/dev/zero of=/dev/sda bs=1M', True),
+    ('mkfs.ext4 /dev/sdb1', True),
+    ('cat image.iso > /dev/sdb', True),
+    ('chmod 000 /etc/passwd', True),
+    ('chown -R nobody /', True),
+    ('sudo shutdown -h now', True),
+    ('reboot', True),
+    ('init 0', True),
+    ('systemctl poweroff', True),
+    (':(){ :|:& };:', True),
+    ('format c: /q', True),
+    ('rd /s /q C:\\', True),
+    ('del /f /s /q C:\\Windows\\*', True),
+    ('diskpart', True),
+    ('shutdown /r /f /t 0', True),
+    ('net user administrator P@ssw0rd', True),
+    ('reg delete HKLM\\Software\\Vendor /f', True),
+    ('cmd /c "rd /s /q c:\\"', True),
+    ('powershell -Command "Remove-Item -Recurse -Force C:\\"', True),
+    ('Format-Volume -DriveLetter D', True),
+    ('if true; then rm -rf /; fi', True),
+    ('for i in 1; do reboot; done', True),
+    ('! rm -rf /', True),
+]
+
+# 변경 전 방식의 패턴 목록 (비교용)
+LEGACY_PATTERNS = [
+    'format c:', 'del c:\\', 'rmdir /s c:', 'rd /s c:', 'diskpart', 'shutdown /r /f', 'shutdown /s /f',
+    'net user administrator', 'reg delete hklm', 'bcdedit', 'attrib -r -s -h c:\\', 'takeown /f c:\\',
+    'icacls c:\\ /grant',
+    'rm -rf /', 'dd if=', 'mkfs', 'fdisk', 'format', '> /dev/', 'chmod 000', 'chown -R', 'shutdown',
+    'reboot', 'halt', 'init 0', 'init 6', 'rm -rf *', ':(){ :|:& };:',
+]
+
+
+def legacy_check(command: str) -> bool:
+    """기존 방식: 호출마다 패턴 목록을 만들고 부분 문자열 검색"""
+    dangerous_patterns = list(LEGACY_PATTERNS)
+    command_lower = command.lower()
+    return any(pattern in command_lower for pattern in dangerous_patterns)
+
+
+class Command(BaseCommand):
+    help = '위험한 명령어 판정 성능과 정확도 측정 (기존 부분 문자열 검색 vs 토큰 기반 판정 엔진)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--number',
+            type=int,
+            default=2000,
+            help='명령어당 반복 횟수',
+        )
+        parser.add_argument(
+            '--file',
+            help='한 줄에 명령어 하나씩 적힌 파일 (주어지면 내장 목록 대신 사용, 정답 비교는 생략)',
+        )
+
+    def handle(self, *args, **options):
+        number = options['number']
+        corpus = COMMAND_CORPUS
+        if options.get('file'):
+            with open(options['file'], encoding='utf-8') as f:
+                corpus = [(line.strip(), None) for line in f if line.strip()]
+
+        policy = CommandPolicy()
+
+        self.stdout.write(f"{'명령어':<50} {'기존(µs)':>10} {'엔진(µs)':>10} {'캐시(µs)':>10}  판정")
+        total_legacy = 0.0
+        total_engine = 0.0
+        total_cached = 0.0
+        legacy_wrong = 0
+        engine_wrong = 0
+
+        for command, expected in corpus:
+            legacy = timeit.timeit(lambda: legacy_check(command), number=number) / number * 1e6
+            engine = timeit.timeit(lambda: policy._evaluate(command), number=number) / number * 1e6
+            cached = timeit.timeit(lambda: policy.evaluate(command), number=number) / number * 1e6
+            total_legacy += legacy
+            total_engine += engine
+            total_cached += cached
+
+            legacy_verdict = legacy_check(command)
+            verdict = policy.evaluate(command)
+            marks = ''
+            if expected is not None:
+                if legacy_verdict != expected:
+                    legacy_wrong += 1
+                    marks += ' [기존 오판]'
+                if verdict.dangerous != expected:
+                    engine_wrong += 1
+                    marks += ' [엔진 오판]'
+
+            label = command if len(command) <= 48 else command[:45] + '...'
+            self.stdout.write(
+                f"{label:<50} {legacy:>10.2f} {engine:>10.2f} {cached:>10.2f}  "
+                f"{'위험' if legacy_verdict else '안전'} -> {'위험 (' + verdict.rule + ')' if verdict.dangerous else '안전'}{marks}"
+            )
+
+        count = len(corpus)
+        self.stdout.write(self.style.SUCCESS(
+            f"평균: 기존 {total_legacy / count:.2f}µs, 엔진 {total_engine / count:.2f}µs, "
+            f"캐시 {total_cached / count:.2f}µs (명령어당)"
+        ))
+        if corpus and corpus[0][1] is not None:
+            self.stdout.write(self.style.SUCCESS(
+                f"오판: 기존 {legacy_wrong}/{count}, 엔진 {engine_wrong}/{count}"
+            ))
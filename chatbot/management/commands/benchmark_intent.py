@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand
+import timeit
+
+from ai_backend.intent import (
+    UNIX_INTENT_MATCHER, UNIX_COMMAND_KEYWORDS, CODE_KEYWORDS, SYSTEM_KEYWORDS
+)
+
+SAMPLE_MESSAGES = [
+    'ls -la 명령어를 실행해줘',
+    '디스크 사용량 확인해줘',
+    'python 코드에서 오류가 나는데 분석해줄래?',
+    '서버 로그 모니터링 설정 방법 알려줘',
+    '안녕하세요, 오늘 날씨가 좋네요',
+    'I also have a good idea for the design',
+    '메모리 사용량이 너무 높은데 어떤 프로세스가 문제인지 찾고 싶어요. top이나 ps로 볼 수 있나요?',
+    '이 스크립트를 cron으로 매일 돌리고 싶습니다',
+]
+
+
+def legacy_scan(message: str) -> str:
+    """기존 방식: 메시지마다 키워드 목록을 만들고 부분 문자열 선형 검색"""
+    import platform
+    platform.system().lower()
+    command_keywords = list(UNIX_COMMAND_KEYWORDS)
+    code_keywords = list(CODE_KEYWORDS)
+    system_keywords = list(SYSTEM_KEYWORDS)
+    
+    message_lower = message.lower()
+    if any(keyword in message_lower for keyword in command_keywords):
+        return 'command_execution'
+    elif any(keyword in message_lower for keyword in code_keywords):
+        return 'code_analysis'
+    elif any(keyword in message_lower for keyword in system_keywords):
+        return 'system_admin'
+    return 'general_chat'
+
+
+class Command(BaseCommand):
+    help = '의도 분석 키워드 매칭 성능 측정'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--number',
+            type=int,
+            default=20000,
+            help='메시지당 반복 횟수',
+        )
+
+    def handle(self, *args, **options):
+        number = options['number']
+
+        self.stdout.write(f"{'메시지':<50} {'기존(µs)':>10} {'매처(µs)':>10}  결과")
+        total_legacy = 0.0
+        total_matcher = 0.0
+
+        for message in SAMPLE_MESSAGES:
+            legacy = timeit.timeit(lambda: legacy_scan(message), number=number) / number * 1e6
+            matcher = timeit.timeit(lambda: UNIX_INTENT_MATCHER.scores(message), number=number) / number * 1e6
+            total_legacy += legacy
+            total_matcher += matcher
+
+            scores = UNIX_INTENT_MATCHER.scores(message)
+            label = message if len(message) <= 48 else message[:45] + '...'
+            self.stdout.write(
+                f"{label:<50} {legacy:>10.2f} {matcher:>10.2f}  "
+                f"{legacy_scan(message)} -> {max(scores, key=scores.get) if scores else 'general_chat'} {scores}"
+            )
+
+        count = len(SAMPLE_MESSAGES)
+        self.stdout.write(self.style.SUCCESS(
+            f"평균: 기존 {total_legacy / count:.2f}µs, 매처 {total_matcher / count:.2f}µs (메시지당)"
+        ))
@@ -1,8 +1,9 @@
 from django.core.management.base import BaseCommand
 from django.conf import settings
-import requests
 import json
 
+from ai_backend.http_pool import get_http_pool
+
 
 class Command(BaseCommand):
     help = 'Ollama AI 모델 상태 확인'
@@ -24,7 +25,7 @@ class Command(BaseCommand):
         
         # Ollama 연결 확인
         try:
-            response = requests.get(f"{settings.OLLAMA_BASE_URL}/api/tags", timeout=10)
+            response = get_http_pool().get(f"{settings.OLLAMA_BASE_URL}/api/tags", timeout=10)
             response.raise_for_status()
             data = response.json()
         except Exception as e:
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+
+from ai_backend.services import AIService
+from ai_backend.explain_cache import get_explanation_cache, COMMON_COMMANDS
+from ai_backend.admission import llm_priority, PRIORITY_BACKGROUND
+
+
+class Command(BaseCommand):
+    help = '자주 쓰는 명령어의 설명을 미리 생성해 캐시에 저장'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--shell',
+            choices=list(COMMON_COMMANDS),
+            action='append',
+            help='대상 shell (여러 번 지정 가능, 기본: 전체)',
+        )
+        parser.add_argument(
+            '--command',
+            action='append',
+            dest='commands',
+            help='기본 목록 대신 설명을 만들 명령어 (여러 번 지정 가능)',
+        )
+
+    def handle(self, *args, **options):
+        ai_service = AIService()
+        explanation_cache = get_explanation_cache()
+        model = ai_service.code_client.model
+
+        for target_shell in options['shell'] or list(COMMON_COMMANDS):
+            commands = options['commands'] or COMMON_COMMANDS[target_shell]
+            self.stdout.write(f"🔥 {target_shell}: {len(commands)}개 명령어 확인 중...")
+
+            def create(command, target_shell=target_shell):
+                try:
+                    system_prompt, prompt = ai_service._explain_command_prompt(command, target_shell)
+                    with llm_priority(PRIORITY_BACKGROUND):
+                        return ai_service.code_client.generate(prompt, system_prompt).get('response')
+                except Exception as e:
+                    self.stdout.write(self.style.WARNING(f"  ⚠️ {command}: {e}"))
+                    return None
+
+            created = explanation_cache.prewarm(commands, target_shell, model, create)
+            self.stdout.write(self.style.SUCCESS(f"  ✅ {created}개 새로 저장"))
+
+        stats = explanation_cache.stats()
+        self.stdout.write(f"캐시 상태: 저장 {stats['stores']}개, 적중률 {stats['hit_rate']:.0%}")
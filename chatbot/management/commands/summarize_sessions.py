@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from ai_backend.summarizer import ConversationSummarizer
+
+
+class Command(BaseCommand):
+    help = '오래된 대화가 많이 쌓인 채팅 세션을 지금 바로 요약'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sessions',
+            type=int,
+            default=20,
+            help='한 번에 요약할 최대 세션 수',
+        )
+
+    def handle(self, *args, **options):
+        summarizer = ConversationSummarizer(sessions_per_run=options['sessions'])
+        candidates = summarizer.candidates()
+        self.stdout.write(f"📝 요약 대상 세션 {len(candidates)}개")
+
+        for session in candidates:
+            try:
+                if summarizer.summarize_session(session):
+                    self.stdout.write(self.style.SUCCESS(f"  ✅ {session.session_id}"))
+            except Exception as e:
+                self.stdout.write(self.style.WARNING(f"  ⚠️ {session.session_id}: {e}"))
+
+        stats = summarizer.stats()
+        self.stdout.write(f"요약 {stats['summaries']}개 세션, 메시지 {stats['summarized_messages']}개")
@@ -0,0 +1,105 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AIModel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('model_id', models.CharField(max_length=200)),
+                ('description', models.TextField(blank=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('model_type', models.CharField(choices=[('general', '일반 대화'), ('code', '코드 분석'), ('system', '시스템 관리')], max_length=50)),
+                ('parameters', models.JSONField(blank=True, default=dict)),
+            ],
+            options={
+                'verbose_name': 'AI 모델',
+                'verbose_name_plural': 'AI 모델들',
+            },
+        ),
+        migrations.CreateModel(
+            name='XShellSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('host', models.CharField(max_length=255)),
+                ('port', models.IntegerField(default=22)),
+                ('username', models.CharField(max_length=100)),
+                ('password_encrypted', models.TextField(blank=True)),
+                ('private_key_path', models.CharField(blank=True, max_length=500)),
+                ('session_file_path', models.CharField(blank=True, max_length=500)),
+                ('is_connected', models.BooleanField(default=False)),
+                ('last_used', models.DateTimeField(auto_now=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'XShell 세션',
+                'verbose_name_plural': 'XShell 세션들',
+                'ordering': ['-last_used'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ChatSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('session_id', models.CharField(max_length=100, unique=True)),
+                ('title', models.CharField(default='새로운 채팅', max_length=200)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': '채팅 세션',
+                'verbose_name_plural': '채팅 세션들',
+                'ordering': ['-updated_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ChatMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('message_type', models.CharField(choices=[('user', '사용자'), ('ai', 'AI'), ('system', '시스템'), ('command', '명령어'), ('result', '실행 결과')], max_length=10)),
+                ('content', models.TextField()),
+                ('timestamp', models.DateTimeField(auto_now_add=True)),
+                ('metadata', models.JSONField(blank=True, default=dict)),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='chatbot.chatsession')),
+            ],
+            options={
+                'verbose_name': '채팅 메시지',
+                'verbose_name_plural': '채팅 메시지들',
+                'ordering': ['timestamp'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CommandHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('command', models.TextField()),
+                ('result', models.TextField(blank=True)),
+                ('exit_code', models.IntegerField(blank=True, null=True)),
+                ('execution_time', models.FloatField(blank=True, null=True)),
+                ('timestamp', models.DateTimeField(auto_now_add=True)),
+                ('chat_session', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='chatbot.chatsession')),
+                ('xshell_session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='chatbot.xshellsession')),
+            ],
+            options={
+                'verbose_name': '명령어 히스토리',
+                'verbose_name_plural': '명령어 히스토리들',
+                'ordering': ['-timestamp'],
+            },
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:04
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+def fill_client_ids(apps, schema_editor):
+    """기존 메시지마다 서로 다른 client_id 지정 (AddField의 기본값은 모든 행에 같은 값이 들어감)"""
+    ChatMessage = apps.get_model('chatbot', 'ChatMessage')
+    for message in ChatMessage.objects.only('pk').iterator():
+        ChatMessage.objects.filter(pk=message.pk).update(client_id=uuid.uuid4())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbot', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommandPhrase',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('phrase', models.CharField(max_length=200)),
+                ('command', models.CharField(max_length=500)),
+                ('shell_family', models.CharField(choices=[('unix', 'Linux/Unix'), ('windows', 'Windows')], default='unix', max_length=10)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': '명령어 표현',
+                'verbose_name_plural': '명령어 표현들',
+                'ordering': ['phrase'],
+            },
+        ),
+        migrations.AddField(
+            model_name='chatmessage',
+            name='client_id',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, null=True),
+        ),
+        migrations.RunPython(fill_client_ids, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='chatmessage',
+            name='client_id',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='chatmessage',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.CreateModel(
+            name='ConversationSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content', models.TextField()),
+                ('summarized_until', models.DateTimeField()),
+                ('message_count', models.IntegerField(default=0)),
+                ('model_used', models.CharField(blank=True, max_length=100)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('session', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='summary', to='chatbot.chatsession')),
+            ],
+            options={
+                'verbose_name': '대화 요약',
+                'verbose_name_plural': '대화 요약들',
+            },
+        ),
+    ]
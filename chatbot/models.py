@@ -1,3 +1,5 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
@@ -34,7 +36,10 @@ class ChatMessage(models.Model):
     session = models.ForeignKey(ChatSession, on_delete=models.CASCADE, related_name='messages')
     message_type = models.CharField(max_length=10, choices=MESSAGE_TYPES)
     content = models.TextField()
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # auto_now_add는 bulk_create 시 큐에 넣은 시각을 덮어쓰므로 생성 시각을 직접 기본값으로 지정
+    timestamp = models.DateTimeField(default=timezone.now)
+    # 쓰기 지연 저장으로 id가 아직 없을 때도 클라이언트에 보낼 수 있는 고정 식별자
+    client_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
     metadata = models.JSONField(default=dict, blank=True)  # 추가 데이터 저장용
     
     class Meta:
@@ -106,3 +111,42 @@ class AIModel(models.Model):
     
     def __str__(self):
         return f"{self.name} ({self.model_id})"
+
+
+class CommandPhrase(models.Model):
+    """자연어 표현 → 명령어 매핑 (LLM 없이 명령어를 찾는 로컬 인덱스용)"""
+    SHELL_FAMILIES = [
+        ('unix', 'Linux/Unix'),
+        ('windows', 'Windows'),
+    ]
+    
+    phrase = models.CharField(max_length=200)  # 예: "디스크 사용량 확인해줘"
+    command = models.CharField(max_length=500)  # 예: "df -h"
+    shell_family = models.CharField(max_length=10, choices=SHELL_FAMILIES, default='unix')
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['phrase']
+        verbose_name = '명령어 표현'
+        verbose_name_plural = '명령어 표현들'
+    
+    def __str__(self):
+        return f"{self.phrase} → {self.command}"
+
+
+class ConversationSummary(models.Model):
+    """긴 채팅 세션의 이전 대화 요약 (최근 대화 창 이전 메시지를 압축)"""
+    session = models.OneToOneField(ChatSession, on_delete=models.CASCADE, related_name='summary')
+    content = models.TextField()
+    summarized_until = models.DateTimeField()  # 이 시각까지의 메시지가 요약에 포함됨
+    message_count = models.IntegerField(default=0)  # 요약에 포함된 메시지 수
+    model_used = models.CharField(max_length=100, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = '대화 요약'
+        verbose_name_plural = '대화 요약들'
+    
+    def __str__(self):
+        return f"{self.session.title} 요약 ({self.message_count}개 메시지)"
@@ -0,0 +1,175 @@
+import threading
+import logging
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger('xshell_chatbot')
+
+
+def message_role(message_type: str) -> str:
+    """메시지 종류 → LLM 대화 role (사용자 외에는 모두 assistant)"""
+    return 'user' if message_type == 'user' else 'assistant'
+
+
+def _same_message(a, b) -> bool:
+    return a is b or a.client_id == b.client_id
+
+
+class _ContextWindow:
+    """세션 하나의 최근 ChatMessage 창 (로드 중에 저장된 메시지는 buffer에 모아 둠)"""
+
+    __slots__ = ('messages', 'loading', 'buffer', 'summary')
+
+    def __init__(self, size: int):
+        self.messages = deque(maxlen=size)
+        self.loading = True
+        self.buffer = []
+        self.summary = ''
+
+    def append(self, message) -> bool:
+        # 로드 직후 같은 메시지가 다시 기록되는 경우 무시
+        if any(_same_message(existing, message) for existing in self.messages):
+            return False
+        self.messages.append(message)
+        return True
+
+
+class SessionContextStore:
+    """세션별 최근 대화 창을 메모리에 유지하는 저장소
+
+    처음 조회할 때만 DB(와 쓰기 지연 큐에 남은 메시지)에서 최근 메시지를 읽고,
+    이후에는 메시지 저장 경로에서 record()로 덧붙여 조회가 항상 최신이고
+    DB를 다시 읽지 않는다. 세션 수는 LRU로 제한한다.
+    창 이전의 대화는 저장된 요약(ConversationSummary)이 있으면 맨 앞에 system 항목으로 붙는다.
+    """
+
+    def __init__(self, window_size: int = None, max_sessions: int = None):
+        self.window_size = window_size or getattr(settings, 'SESSION_CONTEXT_WINDOW', 10)
+        self.max_sessions = max_sessions or getattr(settings, 'SESSION_CONTEXT_MAX_SESSIONS', 1000)
+        self._windows: 'OrderedDict[str, _ContextWindow]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.loads = 0
+        self.appends = 0
+
+    def get(self, session_id: str, limit: int = None) -> List[Dict[str, str]]:
+        """최근 limit개 메시지를 [{'role', 'content'}] 형태로 반환"""
+        limit = limit or self.window_size
+        with self._lock:
+            window = self._windows.get(session_id)
+            loaded = window is not None and not window.loading
+            if loaded:
+                self._windows.move_to_end(session_id)
+                self.hits += 1
+            elif window is None:
+                window = self._install(session_id)
+
+        if not loaded:
+            self._load(session_id, window)
+        return self._entries(window, limit)
+
+    def record(self, message) -> None:
+        """저장된(또는 쓰기 지연 큐에 넣은) ChatMessage를 세션 창에 반영"""
+        session_id = message.session.session_id
+        with self._lock:
+            window = self._windows.get(session_id)
+            if window is None:
+                # 아직 조회된 적 없는 세션: 다음 조회 때 DB/큐에서 함께 읽힘
+                return
+            if window.loading:
+                window.buffer.append(message)
+                return
+            if window.append(message):
+                self.appends += 1
+
+    def set_summary(self, session_id: str, summary: str):
+        """요약이 갱신되면 이미 로드된 세션 창에 반영"""
+        with self._lock:
+            window = self._windows.get(session_id)
+            if window is not None:
+                window.summary = summary
+
+    def invalidate(self, session_id: str = None):
+        """세션 창 삭제 (session_id가 없으면 전체) - 다음 조회 시 DB에서 다시 읽음"""
+        with self._lock:
+            if session_id is None:
+                self._windows.clear()
+            else:
+                self._windows.pop(session_id, None)
+
+    def _install(self, session_id: str) -> _ContextWindow:
+        window = _ContextWindow(self.window_size)
+        self._windows[session_id] = window
+        while len(self._windows) > self.max_sessions:
+            self._windows.popitem(last=False)
+        return window
+
+    def _entries(self, window: _ContextWindow, limit: int) -> List[Dict[str, str]]:
+        with self._lock:
+            messages = list(window.messages)[-limit:]
+            summary = window.summary
+        entries = [{'role': 'system', 'content': f"이전 대화 요약:\n{summary}"}] if summary else []
+        entries += [
+            {'role': message_role(message.message_type), 'content': message.content}
+            for message in messages
+        ]
+        return entries
+
+    def _load(self, session_id: str, window: _ContextWindow):
+        """DB 최근 메시지 + 쓰기 지연 큐의 미저장 메시지(+ 저장된 요약)로 창을 채움"""
+        from .models import ChatMessage, ConversationSummary
+        from .write_behind import get_write_behind_queue
+
+        # 큐를 먼저 읽어야 그 사이 flush된 메시지가 DB 조회에 포함됨 (client_id로 중복 제거)
+        pending = [
+            instance for instance in get_write_behind_queue().pending(ChatMessage)
+            if instance.session.session_id == session_id
+        ]
+        try:
+            rows = list(
+                ChatMessage.objects.filter(session__session_id=session_id)
+                                   .order_by('-timestamp')[:self.window_size]
+            )
+            summary = ConversationSummary.objects.filter(session__session_id=session_id) \
+                                                 .values_list('content', flat=True).first() or ''
+        except Exception as e:
+            logger.warning(f"세션 컨텍스트 로드 실패: {e}")
+            rows = []
+            summary = ''
+
+        merged = sorted(rows + pending, key=lambda instance: instance.timestamp)
+        with self._lock:
+            for instance in merged + window.buffer:
+                window.append(instance)
+            if not window.summary:
+                window.summary = summary
+            window.loading = False
+            window.buffer = []
+            self.loads += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'sessions': len(self._windows),
+                'max_sessions': self.max_sessions,
+                'window_size': self.window_size,
+                'hits': self.hits,
+                'loads': self.loads,
+                'appends': self.appends
+            }
+
+
+_session_context_store: Optional[SessionContextStore] = None
+_session_context_lock = threading.Lock()
+
+
+def get_session_context_store() -> SessionContextStore:
+    """프로세스 전역 세션 컨텍스트 저장소 반환"""
+    global _session_context_store
+    if _session_context_store is None:
+        with _session_context_lock:
+            if _session_context_store is None:
+                _session_context_store = SessionContextStore()
+    return _session_context_store
@@ -1,15 +1,41 @@
 from django.test import TestCase, TransactionTestCase
+from unittest import mock, skipIf
 from django.urls import reverse
 from django.contrib.auth.models import User
+from django.utils import timezone
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from channels.testing import WebsocketCommunicator
 from channels.db import database_sync_to_async
 import json
+import time
 import uuid
+import os
+import asyncio
+import platform
+import select
+import subprocess
 
-from .models import ChatSession, ChatMessage, XShellSession, CommandHistory, AIModel
+from .models import ChatSession, ChatMessage, XShellSession, CommandHistory, AIModel, CommandPhrase, ConversationSummary
 from .consumers import ChatConsumer
-from ai_backend.services import AIService
-from xshell_integration.services import XShellService
+from .write_behind import WriteBehindQueue
+from .session_context import SessionContextStore
+from ai_backend.services import AIService, OllamaClient
+from ai_backend.http_pool import OllamaHTTPPool
+from ai_backend.health import OllamaHealthMonitor
+from ai_backend.command_index import CommandIndex
+from ai_backend.explain_cache import ExplanationCache
+from ai_backend.prompt_budget import PromptBuilder, approximate_tokens
+from ai_backend.summarizer import ConversationSummarizer
+from ai_backend.residency import ModelResidencyManager
+from ai_backend.admission import AdmissionController, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
+from ai_backend.coalesce import SingleFlight, flight_key
+from ai_backend.circuit import CircuitBreaker, CircuitOpenError, get_circuit_breakers
+from xshell_integration.services import XShellService, _drain_channel, _stream_channel, _iterate_in_thread
+from xshell_integration.ssh_pool import SSHConnectionPool
+from xshell_integration.shell_channels import ShellChannelManager
+from xshell_integration.speculative import SpeculativeExecutor, is_read_only_command
+from xshell_integration.command_policy import CommandPolicy
 
 
 class ChatSessionModelTest(TestCase):
@@ -142,6 +168,41 @@ class AIServiceTest(TestCase):
         
         self.assertEqual(intent['type'], 'general_chat')
     
+    def test_analyze_intent_token_boundaries(self):
+        """영문 키워드는 단어 단위로만 매칭 ('ls' in "also", 'go' in "good" 오탐 방지)"""
+        ai_service = AIService()
+        
+        intent = ai_service.analyze_intent('I also have a good idea', extract=False)
+        self.assertEqual(intent['type'], 'general_chat')
+        
+        intent = ai_service.analyze_intent('df를 보여줘', extract=False)
+        self.assertEqual(intent['type'], 'command_execution')
+    
+    def test_analyze_intent_inflected_keywords(self):
+        """복수형/-ing/-ed 형 영문 키워드도 원형으로 매칭 (짧은 키워드는 제외)"""
+        ai_service = AIService()
+        
+        intent = ai_service.analyze_intent('fix these bugs', extract=False)
+        self.assertEqual(intent['type'], 'code_analysis')
+        
+        intent = ai_service.analyze_intent('check the errors in my scripts', extract=False)
+        self.assertEqual(intent['type'], 'code_analysis')
+        
+        intent = ai_service.analyze_intent('why are my commands failing', extract=False)
+        self.assertEqual(intent['type'], 'command_execution')
+        
+        intent = ai_service.analyze_intent('it goes well, thanks', extract=False)
+        self.assertEqual(intent['type'], 'general_chat')
+    
+    def test_intent_scores_every_category(self):
+        """매칭된 모든 카테고리의 점수를 함께 반환"""
+        ai_service = AIService()
+        intent = ai_service.analyze_intent('서버 로그에서 python 오류 grep', extract=False)
+        
+        self.assertEqual(intent['type'], 'command_execution')
+        self.assertEqual(set(intent['scores']), {'command_execution', 'code_analysis', 'system_admin'})
+        self.assertGreater(intent['scores']['system_admin'], intent['scores']['command_execution'])
+    
     def test_extract_command(self):
         """명령어 추출 테스트"""
         ai_service = AIService()
@@ -155,6 +216,708 @@ class AIServiceTest(TestCase):
         self.assertEqual(command, 'ls -la')
 
 
+class CommandIndexTest(TestCase):
+    """자연어 → 명령어 로컬 인덱스 테스트"""
+    
+    def test_seed_phrase_without_llm(self):
+        """기본 표현은 표현이 조금 달라도 LLM 없이 추출"""
+        ai_service = AIService()
+        with mock.patch.object(ai_service.code_client, 'generate') as generate:
+            command = ai_service.extract_command('디스크 사용량 좀 보여줘')
+        
+        self.assertEqual(command, 'df -h')
+        generate.assert_not_called()
+    
+    def test_ambiguous_request_low_confidence(self):
+        """여러 명령어에 걸치는 요청은 신뢰도를 낮춰 LLM에 맡김"""
+        index = CommandIndex()
+        match = index.lookup('사용량 확인해줘', 'unix')
+        self.assertLess(match.confidence, 0.75)
+        self.assertIsNone(index.lookup('오늘 날씨 확인해줘', 'unix'))
+    
+    def test_different_action_or_arguments_not_matched(self):
+        """표현에 없는 동작 동사나 경로/옵션/이름이 붙은 요청은 비슷해도 매칭하지 않음"""
+        index = CommandIndex()
+        for message in ['nginx 프로세스 kill 해줘', '파일 목록 삭제해줘', '열린 포트 닫아줘',
+                        '현재 경로에서 파일 실행해줘', '/var 디렉토리 용량 du로 확인해줘', '디스크 사용량 확인해줘 -h']:
+            match = index.lookup(message, 'unix')
+            self.assertTrue(match is None or match.confidence < 0.75, (message, match))
+        self.assertEqual(index.lookup('열린 포트 보여줘', 'unix').confidence, 1.0)
+    
+    def test_admin_and_history_phrases(self):
+        """관리자 등록 표현과 실행에 성공한 제안 명령어를 인덱스에 반영"""
+        CommandPhrase.objects.create(phrase='도커 컨테이너 목록', command='docker ps', shell_family='unix')
+        
+        session = ChatSession.objects.create(session_id='index-history')
+        ChatMessage.objects.create(session=session, message_type='user', content='nginx 에러 로그 마지막 부분 보여줘')
+        ChatMessage.objects.create(session=session, message_type='ai', content='...', metadata={
+            'type': 'command_ready', 'command': 'tail -n 50 /var/log/nginx/error.log'
+        })
+        xshell_session = XShellSession.objects.create(name='web', host='10.0.0.5', username='ops')
+        CommandHistory.objects.create(xshell_session=xshell_session, command='tail -n 50 /var/log/nginx/error.log', exit_code=0)
+        
+        ChatMessage.objects.create(session=session, message_type='user', content='실패한 요청')
+        ChatMessage.objects.create(session=session, message_type='ai', content='...', metadata={
+            'type': 'command_ready', 'command': 'false'
+        })
+        CommandHistory.objects.create(xshell_session=xshell_session, command='false', exit_code=1)
+        
+        index = CommandIndex()
+        with self.assertNumQueries(1):
+            rows = index._load_accepted_history()
+        self.assertEqual([row[2] for row in rows], ['tail -n 50 /var/log/nginx/error.log'])
+        index.refresh_if_stale(force=True)
+        
+        self.assertEqual(index.lookup('도커 컨테이너 목록 보여줘', 'unix').command, 'docker ps')
+        match = index.lookup('nginx 에러 로그 마지막 부분 확인', 'unix')
+        self.assertEqual(match.command, 'tail -n 50 /var/log/nginx/error.log')
+        self.assertEqual(match.source, 'history')
+
+
+class ExplanationCacheTest(TestCase):
+    """명령어 설명 캐시 테스트"""
+    
+    def test_explain_command_generated_once(self):
+        """같은 명령어(공백 차이 포함)는 한 번만 LLM으로 설명 생성"""
+        ai_service = AIService()
+        explanation_cache = ExplanationCache(local_size=10, ttl=60)
+        
+        with mock.patch('ai_backend.services.get_explanation_cache', return_value=explanation_cache), \
+             mock.patch.object(ai_service.code_client, 'generate', return_value={'response': '파일 목록 표시'}) as generate:
+            first = ai_service.explain_command('ls -la', 'bash')
+            second = ai_service.explain_command('  ls   -la ', 'bash')
+        
+        self.assertEqual(first, '파일 목록 표시')
+        self.assertEqual(second, first)
+        self.assertEqual(generate.call_count, 1)
+        self.assertEqual(explanation_cache.stats()['hit_rate'], 0.5)
+    
+    def test_fallback_not_cached_and_shared_tier(self):
+        """LLM 실패 시 기본 설명은 저장하지 않고, 로컬에서 밀려난 항목은 DB 캐시에서 복구"""
+        ai_service = AIService()
+        explanation_cache = ExplanationCache(local_size=1, ttl=60)
+        
+        with mock.patch('ai_backend.services.get_explanation_cache', return_value=explanation_cache):
+            with mock.patch.object(ai_service.code_client, 'generate', side_effect=Exception('down')):
+                ai_service.explain_command('df -h', 'bash')
+            self.assertEqual(explanation_cache.stats()['stores'], 0)
+            
+            with mock.patch.object(ai_service.code_client, 'generate', side_effect=[
+                {'response': '디스크 사용량'}, {'response': '메모리 사용량'}
+            ]):
+                ai_service.explain_command('df -h', 'bash')
+                ai_service.explain_command('free -h', 'bash')
+        
+        model = ai_service.code_client.model
+        self.assertEqual(explanation_cache.stats()['local_size'], 1)
+        self.assertEqual(explanation_cache.get('df -h', 'unix', model), '디스크 사용량')
+        self.assertEqual(explanation_cache.stats()['shared_hits'], 1)
+    
+    def test_shared_tier_disabled_only_for_missing_table(self):
+        """일시적인 DB 오류로는 영구 캐시를 끄지 않고, 캐시 테이블이 없을 때만 잠시 건너뜀"""
+        from django.db import OperationalError
+        explanation_cache = ExplanationCache(local_size=10, ttl=60)
+        backend = mock.Mock()
+        
+        with mock.patch.object(explanation_cache, '_backend', return_value=backend):
+            backend.get.side_effect = OperationalError('database is locked')
+            self.assertIsNone(explanation_cache.get('ls', 'unix', 'm'))
+            self.assertTrue(explanation_cache.stats()['shared_backend_available'])
+            
+            backend.get.side_effect = None
+            backend.get.return_value = '파일 목록'
+            self.assertEqual(explanation_cache.get('ls', 'unix', 'm'), '파일 목록')
+            
+            backend.get.side_effect = OperationalError('no such table: command_explanation_cache')
+            self.assertIsNone(explanation_cache.get('pwd', 'unix', 'm'))
+            self.assertFalse(explanation_cache.stats()['shared_backend_available'])
+            calls = backend.get.call_count
+            self.assertIsNone(explanation_cache.get('whoami', 'unix', 'm'))
+            self.assertEqual(backend.get.call_count, calls)
+            
+            explanation_cache._backend_disabled_until = 0.0  # 재시도 간격 경과
+            backend.get.side_effect = None
+            self.assertEqual(explanation_cache.get('whoami', 'unix', 'm'), '파일 목록')
+
+
+class PromptBuilderTest(TestCase):
+    """토큰 예산 기반 프롬프트 구성 테스트"""
+    
+    def test_approximate_tokens(self):
+        self.assertEqual(approximate_tokens(''), 0)
+        self.assertEqual(approximate_tokens('abcdefgh'), 2)
+        self.assertEqual(approximate_tokens('안녕 ls'), 3)
+    
+    def test_long_history_fits_budget_newest_first(self):
+        """대화가 길어져도 예산을 넘지 않고, 최신 대화와 현재 메시지를 유지"""
+        builder = PromptBuilder('test-model', context_tokens=600, reserve_tokens=100)
+        history = [
+            {'role': 'user' if i % 2 == 0 else 'assistant', 'content': f'turn {i} ' + 'x' * 80}
+            for i in range(200)
+        ]
+        history.append({'role': 'user', 'content': '현재 질문'})
+        
+        plan = builder.build_chat_messages(history, '현재 질문', system_prompt='system')
+        
+        self.assertLessEqual(plan.tokens, builder.budget)
+        self.assertGreater(plan.dropped, 150)
+        self.assertEqual(plan.messages[0]['role'], 'system')
+        self.assertEqual(plan.messages[-1], {'role': 'user', 'content': '현재 질문'})
+        self.assertTrue(plan.messages[-2]['content'].startswith('turn 199'))
+        self.assertEqual(sum(m['content'] == '현재 질문' for m in plan.messages), 1)
+    
+    def test_large_output_keeps_head_and_tail(self):
+        """긴 명령어 출력은 앞/뒤만 남겨 한 턴이 예산을 독차지하지 않음"""
+        builder = PromptBuilder('test-model', context_tokens=1000, reserve_tokens=200)
+        output = 'HEAD\n' + 'line of output\n' * 2000 + 'TAIL'
+        
+        text = builder.build_context_text([{'role': 'assistant', 'content': output}], '요약해줘')
+        
+        self.assertIn('HEAD', text)
+        self.assertTrue(text.endswith('TAIL'))
+        self.assertLessEqual(approximate_tokens(text), builder.message_limit + 10)
+
+
+class OllamaHTTPPoolTest(TestCase):
+    """Ollama HTTP 세션 풀 테스트"""
+    
+    def test_session_reused_per_host(self):
+        """같은 호스트는 같은 세션을 재사용"""
+        pool = OllamaHTTPPool(pool_size=4, idle_timeout=300)
+        
+        first = pool.session_for('http://localhost:11434/api/generate')
+        second = pool.session_for('http://localhost:11434/api/tags')
+        other = pool.session_for('http://10.0.0.5:11434/api/tags')
+        
+        self.assertIs(first, second)
+        self.assertIsNot(first, other)
+        self.assertEqual(pool.hits, 1)
+        self.assertEqual(pool.misses, 2)
+        self.assertEqual(len(pool.stats()['hosts']), 2)
+    
+    def test_idle_session_evicted(self):
+        """유휴 세션 정리 테스트"""
+        pool = OllamaHTTPPool(pool_size=4, idle_timeout=0.01)
+        pool.session_for('http://localhost:11434/')
+        time.sleep(0.02)
+        pool.evict_idle()
+        
+        self.assertEqual(pool.evictions, 1)
+        self.assertEqual(pool.stats()['hosts'], {})
+
+
+class OllamaHealthMonitorTest(TestCase):
+    """Ollama 상태 모니터 테스트"""
+    
+    def test_refresh_unreachable_backend(self):
+        """연결 불가 시 상태가 사용 불가로 기록됨"""
+        monitor = OllamaHealthMonitor(base_url='http://127.0.0.1:9', interval=60)
+        state = monitor.refresh()
+        
+        self.assertFalse(state['available'])
+        self.assertIn('연결 실패', state['error_message'])
+        self.assertEqual(monitor.snapshot()['checked_at'], state['checked_at'])
+    
+    def test_ai_service_reads_snapshot(self):
+        """AIService 생성 시 클라이언트가 항상 준비됨"""
+        ai_service = AIService()
+        
+        self.assertIsNotNone(ai_service.ollama_client)
+        self.assertIsNotNone(ai_service.code_client)
+        self.assertIn('models', ai_service.health_monitor.snapshot())
+
+
+class ModelResidencyTest(TestCase):
+    """Ollama 모델 상주 정책 테스트"""
+    
+    def test_pin_policy_keeps_pinned_models_forever(self):
+        manager = ModelResidencyManager(policy='pin', pinned=['llama3.1:8b', 'codellama:13b'])
+        self.assertEqual(manager.keep_alive_for('codellama:13b'), -1)
+        self.assertEqual(manager.keep_alive_for('other:7b'), manager.idle_keep_alive)
+        
+        payload = OllamaClient(model='llama3.1:8b')._generate_payload('hi', '', False)
+        self.assertIn('keep_alive', payload)
+    
+    def test_lru_policy_unloads_model_leaving_hot_set(self):
+        """최근 사용 모델만 상주, 밀려난 모델은 즉시 내림"""
+        manager = ModelResidencyManager(policy='lru', max_hot=1)
+        with mock.patch.object(manager, 'unload') as unload:
+            self.assertEqual(manager.keep_alive_for('a'), -1)
+            self.assertEqual(manager.keep_alive_for('b'), -1)
+            for _ in range(50):
+                if unload.called:
+                    break
+                time.sleep(0.01)
+        unload.assert_called_once_with('a')
+        self.assertEqual(manager.stats()['hot_models'], ['b'])
+    
+    def test_memory_policy_respects_budget(self):
+        manager = ModelResidencyManager(policy='memory', memory_budget_gb=20)
+        manager.update_sizes([{'name': name, 'size': 9 * 1024 ** 3} for name in ('a', 'b', 'c')])
+        with mock.patch.object(manager, 'unload'):
+            for name in ('a', 'b', 'c'):
+                manager.note_used(name)
+        self.assertEqual(manager.stats()['hot_models'], ['c', 'b'])
+
+
+class AdmissionControllerTest(TestCase):
+    """Ollama 호출 수 제한 테스트"""
+    
+    def wait_queued(self, controller, count):
+        for _ in range(200):
+            if controller.stats()['models']['m']['queued'] == count:
+                return
+            time.sleep(0.005)
+        self.fail('대기열에 들어가지 않음')
+    
+    def test_interactive_requests_jump_background_queue(self):
+        """슬롯이 비면 먼저 온 background보다 interactive를 먼저 처리"""
+        import threading
+        controller = AdmissionController(default_limit=1, limits={}, max_queue=10, queue_timeout=5)
+        order = []
+        
+        def worker(name, priority):
+            with controller.slot('m', priority):
+                order.append(name)
+        
+        with controller.slot('m'):
+            background = threading.Thread(target=worker, args=('background', PRIORITY_BACKGROUND))
+            background.start()
+            self.wait_queued(controller, 1)
+            interactive = threading.Thread(target=worker, args=('interactive', PRIORITY_INTERACTIVE))
+            interactive.start()
+            self.wait_queued(controller, 2)
+        
+        background.join(2)
+        interactive.join(2)
+        self.assertEqual(order, ['interactive', 'background'])
+        self.assertEqual(controller.stats()['models']['m']['active'], 0)
+    
+    def test_fail_fast_on_deadline_and_full_queue(self):
+        """대기 시간을 넘기거나 대기열이 가득 차면 Ollama 호출 없이 바로 실패"""
+        import threading
+        controller = AdmissionController(default_limit=1, limits={}, max_queue=1, queue_timeout=0.05)
+        errors = []
+        
+        def attempt(timeout=None):
+            try:
+                with controller.slot('m', timeout=timeout):
+                    pass
+            except Exception as e:
+                errors.append(str(e))
+        
+        with controller.slot('m'):
+            timed_out = threading.Thread(target=attempt)
+            timed_out.start()
+            timed_out.join(2)
+            
+            queued = threading.Thread(target=attempt, args=(2,))
+            queued.start()
+            self.wait_queued(controller, 1)
+            rejected = threading.Thread(target=attempt)
+            rejected.start()
+            rejected.join(2)
+        queued.join(2)
+        
+        self.assertEqual(len(errors), 2)
+        self.assertIn('처리를 시작하지 못했습니다', errors[0])
+        self.assertIn('대기열이 가득', errors[1])
+        stats = controller.stats()['models']['m']
+        self.assertEqual((stats['timed_out'], stats['rejected'], stats['active']), (1, 1, 0))
+    
+    def test_async_waiter_shares_slots_with_threads(self):
+        """비동기 대기자는 이벤트 루프를 막지 않고, 스레드가 반납한 슬롯을 받음"""
+        import threading
+        controller = AdmissionController(default_limit=1, limits={}, max_queue=10, queue_timeout=5)
+        
+        async def scenario():
+            held = threading.Event()
+            done = threading.Event()
+            
+            def hold():
+                with controller.slot('m'):
+                    held.set()
+                    done.wait(2)
+            
+            thread = threading.Thread(target=hold)
+            thread.start()
+            held.wait(2)
+            
+            async def acquire():
+                async with controller.aslot('m'):
+                    return 'granted'
+            
+            task = asyncio.ensure_future(acquire())
+            await asyncio.sleep(0.05)
+            self.assertFalse(task.done())
+            done.set()
+            result = await asyncio.wait_for(task, 2)
+            thread.join(2)
+            return result
+        
+        self.assertEqual(asyncio.run(scenario()), 'granted')
+        self.assertEqual(controller.stats()['models']['m']['active'], 0)
+
+
+class SingleFlightTest(TestCase):
+    """진행 중인 동일 Ollama 요청 합치기 테스트"""
+    
+    def test_flight_key_ignores_stream_and_keep_alive(self):
+        """stream/keep_alive만 다른 요청은 같은 키, 옵션이 다르면 다른 키"""
+        payload = {'model': 'm', 'prompt': 'ps aux 설명', 'system': '', 'options': {'temperature': 0.7}}
+        self.assertEqual(
+            flight_key('generate', dict(payload, stream=False, keep_alive=-1)),
+            flight_key('generate', dict(payload, stream=True, keep_alive='5m'))
+        )
+        self.assertNotEqual(
+            flight_key('generate', payload),
+            flight_key('generate', dict(payload, options={'temperature': 0.1}))
+        )
+        self.assertNotEqual(flight_key('generate', payload), flight_key('chat', payload))
+    
+    def test_concurrent_identical_calls_share_one_request(self):
+        """동시에 들어온 동일 요청은 한 번만 실행되고 결과/오류를 함께 받음"""
+        import threading
+        flight = SingleFlight(enabled=True)
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+        results = []
+        
+        def upstream():
+            calls.append(1)
+            started.set()
+            release.wait(2)
+            return {'response': '프로세스 목록'}
+        
+        def worker():
+            results.append(flight.do('k', upstream))
+        
+        leader = threading.Thread(target=worker)
+        leader.start()
+        started.wait(2)
+        followers = [threading.Thread(target=worker) for _ in range(3)]
+        for thread in followers:
+            thread.start()
+        for _ in range(200):
+            if flight.coalesced == 3:
+                break
+            time.sleep(0.005)
+        release.set()
+        for thread in [leader] + followers:
+            thread.join(2)
+        
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([result['response'] for result in results], ['프로세스 목록'] * 4)
+        self.assertEqual(flight.stats()['in_flight'], 0)
+        
+        def failing():
+            raise Exception("Ollama 서비스에 연결할 수 없습니다")
+        
+        with self.assertRaises(Exception):
+            flight.do('k', failing)
+        self.assertEqual(flight.do('k', lambda: {'response': '다시'})['response'], '다시')
+    
+    def test_stream_fan_out_replays_for_late_subscriber(self):
+        """스트림은 한 번만 생성하고, 늦게 구독해도 처음 청크부터 받음"""
+        import threading
+        flight = SingleFlight(enabled=True)
+        gate = threading.Event()
+        opened = []
+        
+        def upstream():
+            opened.append(1)
+            yield '안녕'
+            gate.wait(2)
+            yield '하세요'
+        
+        first = flight.stream('k', upstream)
+        self.assertEqual(next(first), '안녕')
+        second = flight.stream('k', upstream)
+        gate.set()
+        self.assertEqual(list(first), ['하세요'])
+        self.assertEqual(list(second), ['안녕', '하세요'])
+        self.assertEqual(len(opened), 1)
+        self.assertEqual(flight.stats()['streams_in_flight'], 0)
+    
+    def test_abandoned_stream_is_not_joined(self):
+        """구독자가 모두 떠난 스트림은 바로 목록에서 빠져, 이후 요청은 잘린 응답 대신 새로 생성"""
+        import threading
+        flight = SingleFlight(enabled=True)
+        gate = threading.Event()
+        opened = []
+        
+        def upstream():
+            opened.append(1)
+            yield '안녕'
+            gate.wait(2)
+            yield '하세요'
+        
+        first = flight.stream('k', upstream)
+        self.assertEqual(next(first), '안녕')
+        first.close()
+        second = flight.stream('k', upstream)
+        gate.set()
+        self.assertEqual(list(second), ['안녕', '하세요'])
+        self.assertEqual(len(opened), 2)
+        
+        async def aupstream():
+            opened.append(1)
+            yield '안녕'
+            await asyncio.sleep(0.05)
+            yield '하세요'
+        
+        async def scenario():
+            first = flight.astream('k', aupstream)
+            self.assertEqual(await first.__anext__(), '안녕')
+            await first.aclose()
+            second = flight.astream('k', aupstream)
+            return [chunk async for chunk in second]
+        
+        self.assertEqual(asyncio.run(scenario()), ['안녕', '하세요'])
+        self.assertEqual(len(opened), 4)
+    
+    def test_async_calls_and_streams_are_coalesced(self):
+        """비동기 요청/스트림도 한 번만 실행하고, 한 대기자가 취소돼도 나머지는 결과를 받음"""
+        flight = SingleFlight(enabled=True)
+        calls = []
+        
+        async def upstream():
+            calls.append('call')
+            await asyncio.sleep(0.05)
+            return {'response': '결과'}
+        
+        async def stream_upstream():
+            calls.append('stream')
+            for chunk in ('a', 'b', 'c'):
+                await asyncio.sleep(0.01)
+                yield chunk
+        
+        async def collect(stream):
+            return [chunk async for chunk in stream]
+        
+        async def scenario():
+            cancelled = asyncio.ensure_future(flight.ado('k', upstream))
+            waiting = asyncio.ensure_future(flight.ado('k', upstream))
+            await asyncio.sleep(0.01)
+            cancelled.cancel()
+            result = await waiting
+            streams = await asyncio.gather(
+                collect(flight.astream('s', stream_upstream)),
+                collect(flight.astream('s', stream_upstream))
+            )
+            return result, streams
+        
+        result, streams = asyncio.run(scenario())
+        self.assertEqual(result['response'], '결과')
+        self.assertEqual(streams, [['a', 'b', 'c'], ['a', 'b', 'c']])
+        self.assertEqual(calls, ['call', 'stream'])
+
+
+class CircuitBreakerTest(TestCase):
+    """Ollama 회로 차단기 테스트"""
+    
+    class FakeResponse:
+        def __init__(self, status_code, body=None):
+            self.status_code = status_code
+            self.body = body or {}
+            self.text = json.dumps(self.body)
+        
+        def json(self):
+            return self.body
+    
+    def test_open_half_open_closed(self):
+        """실패 비율이 넘으면 열리고, 대기 후 시험 요청 한 건만 허용, 성공하면 닫힘"""
+        breaker = CircuitBreaker('generate', window=60, failure_rate=0.5, min_requests=3, open_seconds=0.05)
+        breaker.record_success()
+        breaker.record_failure('연결할 수 없음')
+        self.assertTrue(breaker.allow())
+        breaker.record_failure('연결할 수 없음')
+        
+        self.assertEqual(breaker.state, 'open')
+        with self.assertRaises(CircuitOpenError):
+            breaker.check()
+        
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.record_failure('연결할 수 없음')
+        self.assertEqual(breaker.state, 'open')
+        
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, 'closed')
+        self.assertEqual(breaker.stats()['opened'], 2)
+    
+    def test_down_backend_fails_fast(self):
+        """연결 실패가 반복되면 Ollama에 요청하지 않고 바로 실패"""
+        import requests
+        base_url = f'http://127.0.0.1:9/{uuid.uuid4().hex}'
+        client = OllamaClient(base_url=base_url, model='test')
+        client.http = mock.Mock()
+        client.http.post.side_effect = requests.ConnectionError('refused')
+        
+        for _ in range(5):
+            with self.assertRaises(Exception):
+                client.generate('hello')
+        self.assertEqual(client.http.post.call_count, 5)
+        
+        started = time.time()
+        with self.assertRaises(CircuitOpenError):
+            client.generate('hello')
+        with self.assertRaises(CircuitOpenError):
+            client.chat([{'role': 'user', 'content': 'hello'}])
+        self.assertLess(time.time() - started, 0.1)
+        self.assertEqual(client.http.post.call_count, 5)
+    
+    def test_missing_chat_endpoint_switches_to_generate_once(self):
+        """/api/chat이 404면 이후 호출은 바로 /api/generate 사용"""
+        base_url = f'http://127.0.0.1:9/{uuid.uuid4().hex}'
+        client = OllamaClient(base_url=base_url, model='test')
+        client.http = mock.Mock()
+        
+        def post(url, **kwargs):
+            if url.endswith('/api/chat'):
+                return self.FakeResponse(404)
+            return self.FakeResponse(200, {'response': '응답', 'done': True})
+        
+        client.http.post.side_effect = post
+        for _ in range(3):
+            result = client.chat([{'role': 'user', 'content': 'hello'}])
+            self.assertEqual(result['message']['content'], '응답')
+        
+        urls = [call.args[0] for call in client.http.post.call_args_list]
+        self.assertEqual(sum(url.endswith('/api/chat') for url in urls), 1)
+        self.assertEqual(sum(url.endswith('/api/generate') for url in urls), 3)
+        self.assertEqual(get_circuit_breakers(base_url).stats()['chat']['state'], 'open')
+    
+    def test_chat_fallback_releases_slot_before_generate(self):
+        """chat 폴백은 슬롯을 놓고 generate를 호출 - 같은 generate를 먼저 시작해 슬롯을 기다리는 요청과 순환 대기하지 않음"""
+        import threading
+        base_url = f'http://127.0.0.1:9/{uuid.uuid4().hex}'
+        client = OllamaClient(base_url=base_url, model='test')
+        client.http = mock.Mock()
+        controller = AdmissionController(default_limit=1, limits={}, max_queue=10, queue_timeout=1)
+        results = []
+        
+        def generate_in_other_thread():
+            results.append(client.generate('hello', '')['response'])
+        
+        other = threading.Thread(target=generate_in_other_thread)
+        
+        def post(url, **kwargs):
+            if url.endswith('/api/chat'):
+                # 슬롯을 쥔 동안 같은 generate 요청이 먼저 시작되어 슬롯을 기다림
+                other.start()
+                for _ in range(200):
+                    if controller.stats()['models']['test']['queued'] == 1:
+                        break
+                    time.sleep(0.005)
+                return self.FakeResponse(404)
+            return self.FakeResponse(200, {'response': '응답', 'done': True})
+        
+        client.http.post.side_effect = post
+        with mock.patch('ai_backend.services.get_admission_controller', return_value=controller), \
+             mock.patch('ai_backend.services.get_single_flight', return_value=SingleFlight(enabled=True)):
+            result = client.chat([{'role': 'user', 'content': 'hello'}])
+            other.join(2)
+        
+        self.assertEqual(result['message']['content'], '응답')
+        self.assertEqual(results, ['응답'])
+        self.assertEqual(controller.stats()['models']['test']['timed_out'], 0)
+
+
+class OllamaStreamingTest(TestCase):
+    """Ollama NDJSON 스트리밍 파싱 테스트"""
+    
+    class FakeResponse:
+        def __init__(self, lines):
+            self.lines = lines
+        
+        def iter_lines(self):
+            return (line.encode('utf-8') for line in self.lines)
+    
+    def test_generate_chunks_parsed_incrementally(self):
+        """generate 스트림 청크 파싱"""
+        client = OllamaClient(base_url='http://127.0.0.1:9', model='test')
+        response = self.FakeResponse([
+            '{"response": "안녕", "done": false}',
+            '',
+            '{"response": "하세요", "done": false}',
+            '{"response": "", "done": true}',
+            '{"response": "무시됨", "done": false}',
+        ])
+        
+        chunks = list(client._iter_ndjson(response, lambda chunk: chunk.get('response', '')))
+        self.assertEqual(chunks, ['안녕', '하세요'])
+    
+    def test_chat_stream_error_chunk(self):
+        """스트림 중 오류 청크는 예외로 전달"""
+        client = OllamaClient(base_url='http://127.0.0.1:9', model='test')
+        response = self.FakeResponse([
+            '{"message": {"content": "부분"}, "done": false}',
+            '{"error": "model not found"}',
+        ])
+        
+        stream = client._iter_ndjson(response, lambda chunk: chunk.get('message', {}).get('content', ''))
+        self.assertEqual(next(stream), '부분')
+        with self.assertRaises(Exception):
+            next(stream)
+
+
+class AsyncAIServiceTest(TestCase):
+    """비동기 AI 처리 경로 테스트"""
+    
+    async def test_aextract_command_local_first(self):
+        """백틱 명령어는 LLM 없이 추출"""
+        ai_service = AIService()
+        command = await ai_service.aextract_command('`df -h` 실행해줘')
+        self.assertEqual(command, 'df -h')
+    
+    async def test_aprocess_message_backend_down(self):
+        """Ollama 연결 불가 시에도 예외 대신 안내 응답 반환"""
+        ai_service = AIService()
+        ai_service.async_ollama_client.base_url = 'http://127.0.0.1:9'
+        
+        response = await ai_service.aprocess_message('안녕하세요', str(uuid.uuid4()))
+        
+        self.assertIn('content', response)
+        self.assertIn(response['metadata']['type'], ['ai_error', 'ai_service_error'])
+    
+    async def test_command_ready_sent_before_explanation_stream(self):
+        """명령어가 확정되면 실행 버튼을 먼저 보내고 설명은 스트리밍"""
+        ai_service = AIService()
+        command = f'echo {uuid.uuid4().hex}'
+        events = []
+        
+        async def explanation_stream(prompt, system_prompt=''):
+            for chunk in ('출력', '합니다'):
+                events.append(('generate', chunk))
+                yield chunk
+        
+        async def on_ready(metadata):
+            events.append(('ready', metadata['command']))
+        
+        ai_service.async_code_client.generate_stream = explanation_stream
+        intent = {'type': 'command_execution', 'details': {'command': command, 'shell_type': 'bash'}}
+        response = await ai_service.ahandle_command_request(
+            '실행해줘', [], intent, {}, lambda chunk: events.append(('token', chunk)), on_ready
+        )
+        
+        self.assertEqual(events[0], ('ready', command))
+        self.assertEqual(events[1][0], 'token')
+        self.assertIn(command, events[1][1])
+        self.assertEqual(response['metadata']['explanation'], '출력합니다')
+        self.assertTrue(response['metadata']['execute_button'])
+        
+        events.clear()
+        intent['details']['command'] = 'rm -rf /'
+        response = await ai_service.ahandle_command_request('실행해줘', [], intent, {}, events.append, on_ready)
+        self.assertEqual(response['metadata']['type'], 'dangerous_command')
+        self.assertEqual(events, [])
+
+
 class XShellServiceTest(TestCase):
     """XShell 서비스 테스트"""
     
@@ -180,6 +943,613 @@ class XShellServiceTest(TestCase):
         
         self.assertNotEqual(original_password, encrypted)
         self.assertEqual(original_password, decrypted)
+    
+    @skipIf(platform.system().lower() == 'windows', 'POSIX shell 필요')
+    async def test_async_stream_does_not_block_loop(self):
+        """느린 명령어 스트리밍 중에도 이벤트 루프가 다른 작업을 처리"""
+        xshell_service = XShellService()
+        ticks = []
+        
+        async def ticker():
+            while True:
+                ticks.append(time.monotonic())
+                await asyncio.sleep(0.05)
+        
+        ticker_task = asyncio.create_task(ticker())
+        lines = [line async for line in xshell_service.aexecute_local_command_stream('echo first; sleep 0.5; echo second')]
+        ticker_task.cancel()
+        
+        self.assertEqual(lines, ['first', 'second'])
+        self.assertGreater(len(ticks), 5)
+
+
+class CommandPolicyTest(TestCase):
+    """토큰 기반 위험한 명령어 판정 테스트"""
+    
+    def setUp(self):
+        self.policy = CommandPolicy(cache_size=16)
+    
+    def test_no_substring_false_positives(self):
+        """옵션/단어 일부에 위험 패턴이 들어 있어도 안전"""
+        for command in ['git log --format=%H', 'echo asphalt', 'ls > /dev/null 2>&1', 'fdisk -l',
+                        'rm -rf /tmp/build', 'chown -R deploy /home/deploy/app', 'rm -rf /var/tmp/build', 'del c:\\temp\\a.txt', 'shutdown -c']:
+            self.assertFalse(self.policy.is_dangerous(command), command)
+    
+    def test_tokenized_detection(self):
+        """공백 변형, 파이프/연결/서브셸, 래퍼, 중첩 셸 안의 위험 명령어도 감지"""
+        for command in ['rm  -rf /', 'sudo rm -fr /*', 'ls && rm -rf ~', 'echo $(rm -rf /etc)', 'echo `reboot`',
+                        'LANG=C timeout 10 /bin/rm -Rf /usr/', 'bash -c "rm -rf /"', 'cat x > /dev/sda',
+                        'mkfs.ext4 /dev/sdb1', 'cmd /c "rd /s /q c:\\"', 'systemctl poweroff', ':(){ :|:& };:',
+                        # 셸 예약어/반복문 안의 명령
+                        'if true; then rm -rf /; fi', 'while true; do rm -rf /; done', 'for i in 1; do reboot; done',
+                        '! rm -rf /', 'select x in a; do reboot; done', 'case $x in a) rm -rf /;; esac',
+                        # 시스템 디렉토리 하위 경로 (.. 및 끝의 / 정규화)
+                        'rm -rf /etc/ssh', 'rm -rf /var/lib/', 'rm -rf /tmp/../etc', 'chown -R nobody /etc/ssh',
+                        'chmod 0 /etc/shadow']:
+            self.assertTrue(self.policy.is_dangerous(command), command)
+        self.assertFalse(self.policy.is_dangerous('for f in *.log; do gzip "$f"; done'))
+        verdict = self.policy.evaluate('ps aux | sudo shutdown -h now')
+        self.assertEqual(verdict.rule, '시스템 종료/재시작')
+        self.assertEqual(verdict.segment, 'shutdown -h now')
+    
+    def test_verdicts_cached(self):
+        """같은 명령어는 다시 토큰화하지 않음"""
+        for _ in range(3):
+            self.policy.evaluate('rm -rf /')
+        stats = self.policy.stats()
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['hits'], 2)
+
+
+class SpeculativeExecutorTest(TestCase):
+    """읽기 전용 명령어 미리 실행 테스트"""
+    
+    def test_read_only_classification(self):
+        """화이트리스트 프로그램만, 파이프/리다이렉션/쓰기 인자가 있으면 제외"""
+        for command in ['ls -la /var/log', 'df -h', 'ps aux', 'uptime', 'Get-Process', 'date', 'ipconfig /all',
+                        'ss -tulpn', 'netstat -ano']:
+            self.assertTrue(is_read_only_command(command), command)
+        for command in ['rm -rf /tmp/x', 'ls > out.txt', 'ps aux | grep x', 'ls; reboot', 'echo $(id)',
+                        'date -s 2020-01-01', 'hostname newhost', 'ipconfig /release', 'ls "unterminated', '',
+                        'ss -K dst 10.0.0.1', 'ss -tK', 'ss --kill', 'netstat -c', 'printenv',
+                        # 디스크 전체를 훑는 재귀 탐색
+                        'du -sh /', 'ls -laR /', 'dir /s/b', 'Get-ChildItem -Recurse C:\\', 'Get-ChildItem -r']:
+            self.assertFalse(is_read_only_command(command), command)
+    
+    def test_result_reused_once_within_ttl(self):
+        """미리 실행한 결과는 ttl 안에 한 번만 사용, 만료되면 다시 실행"""
+        executor = SpeculativeExecutor(enabled=True, ttl=0.2, max_workers=1)
+        runs = []
+        
+        def run(command, session_name, shell_type):
+            runs.append(command)
+            return {'success': True, 'output': 'up 3 days', 'exit_code': 0, 'execution_time': 0.01}
+        
+        executor._run = run
+        self.assertTrue(executor.start('uptime'))
+        self.assertTrue(executor.start('uptime'))  # 이미 실행 중/완료 - 다시 실행하지 않음
+        self.assertFalse(executor.start('rm -rf /tmp/x'))
+        
+        result = executor.take('uptime')
+        self.assertTrue(result['speculative'])
+        self.assertEqual(result['output'], 'up 3 days')
+        self.assertIsNone(executor.take('uptime'))
+        self.assertIsNone(executor.take('uptime', shell_type='powershell'))
+        
+        executor.start('df -h')
+        time.sleep(0.35)
+        self.assertIsNone(executor.take('df -h'))
+        self.assertEqual(runs, ['uptime', 'df -h'])
+        self.assertEqual(executor.stats()['hits'], 1)
+        self.assertEqual(executor.stats()['expired'], 1)
+    
+    def test_disabled_by_default(self):
+        """설정하지 않으면 미리 실행하지 않음"""
+        executor = SpeculativeExecutor()
+        self.assertFalse(executor.start('uptime'))
+        self.assertIsNone(executor.take('uptime'))
+    
+    def test_execute_api_takes_with_same_shell_type(self):
+        """실행 API는 미리 실행할 때와 같은 shell_type으로 결과를 찾음"""
+        executor = SpeculativeExecutor(enabled=True, ttl=5, max_workers=1)
+        executor._run = lambda command, session_name, shell_type: {
+            'success': True, 'output': shell_type, 'exit_code': 0, 'execution_time': 0.01}
+        executor.start('Get-Process', 'default', 'powershell')
+        
+        with mock.patch('xshell_integration.views.get_speculative_executor', return_value=executor):
+            response = self.client.post(
+                reverse('xshell_integration:execute_command'),
+                data=json.dumps({'command': 'Get-Process', 'shell_type': 'powershell'}),
+                content_type='application/json'
+            )
+        
+        self.assertEqual(response.json()['result']['output'], 'powershell')
+        self.assertEqual(executor.stats()['hits'], 1)
+
+
+class WriteBehindQueueTest(TestCase):
+    """쓰기 지연 저장 큐 테스트"""
+    
+    def setUp(self):
+        self.session = ChatSession.objects.create(session_id='write-behind-session')
+    
+    def make_message(self, i):
+        return ChatMessage(session=self.session, message_type='user', content=f'message {i}')
+    
+    def test_rows_written_in_one_batch(self):
+        """flush 전에는 저장되지 않고, flush 시 순서대로 일괄 저장"""
+        queue = WriteBehindQueue(batch_size=100, flush_interval=1, max_queue=100, enabled=True)
+        for i in range(20):
+            queue.enqueue(self.make_message(i))
+        
+        self.assertEqual(self.session.messages.count(), 0)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(queue.flush(), 20)
+        inserts = [query for query in queries.captured_queries if query['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 1)
+        
+        contents = list(self.session.messages.order_by('id').values_list('content', flat=True))
+        self.assertEqual(contents, [f'message {i}' for i in range(20)])
+        self.assertEqual(queue.stats()['batches'], 1)
+    
+    def test_timestamp_and_client_id_kept_on_flush(self):
+        """큐에 넣은 시각과 client_id가 일괄 저장 후에도 그대로 유지"""
+        queue = WriteBehindQueue(batch_size=100, flush_interval=1, max_queue=100, enabled=True)
+        queued_at = timezone.now() - timezone.timedelta(minutes=5)
+        message = queue.enqueue(ChatMessage(session=self.session, message_type='user', content='hi', timestamp=queued_at))
+        client_id = message.client_id
+        
+        queue.flush()
+        
+        saved = ChatMessage.objects.get(client_id=client_id)
+        self.assertEqual(saved.timestamp, queued_at)
+        self.assertEqual(saved.content, 'hi')
+    
+    def test_in_flight_visible_and_requeued_on_failure(self):
+        """저장 중인 배치는 커밋 전까지 pending()에 보이고, 커밋 실패 시 순서대로 큐에 되돌림"""
+        queue = WriteBehindQueue(batch_size=100, flush_interval=1, max_queue=100, enabled=True)
+        for i in range(3):
+            queue.enqueue(self.make_message(i))
+        seen_during_insert = []
+        
+        def failing_bulk_create(instances, batch_size=None):
+            seen_during_insert.append(len(queue.pending(ChatMessage)))
+            raise Exception('database is locked')
+        
+        with mock.patch.object(ChatMessage.objects, 'bulk_create', side_effect=failing_bulk_create):
+            self.assertEqual(queue.flush(), 0)
+        
+        self.assertEqual(seen_during_insert, [3])
+        self.assertEqual([m.content for m in queue.pending()], [f'message {i}' for i in range(3)])
+        self.assertEqual(queue.stats()['retries'], 1)
+        
+        self.assertEqual(queue.flush(), 3)
+        self.assertEqual(queue.pending(), [])
+        self.assertEqual(self.session.messages.count(), 3)
+    
+    def test_full_queue_falls_back_to_sync_save(self):
+        """큐가 가득 차면 호출한 쪽에서 바로 저장"""
+        queue = WriteBehindQueue(batch_size=100, flush_interval=1, max_queue=2, enabled=True)
+        for i in range(3):
+            queue.enqueue(self.make_message(i))
+        
+        self.assertEqual(self.session.messages.count(), 1)
+        self.assertEqual(queue.stats()['sync_writes'], 1)
+        self.assertEqual(queue.stats()['pending'], 2)
+
+
+class SessionContextStoreTest(TestCase):
+    """세션별 최근 대화 창 테스트"""
+
+    def setUp(self):
+        self.session = ChatSession.objects.create(session_id='context-session')
+        self.queue = WriteBehindQueue(batch_size=100, flush_interval=1, max_queue=100, enabled=True)
+        patcher = mock.patch('chatbot.write_behind.get_write_behind_queue', return_value=self.queue)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_cold_load_merges_db_and_pending_then_appends_without_queries(self):
+        """처음에만 DB + 미저장 큐를 읽고, 이후 저장된 메시지는 쿼리 없이 반영"""
+        store = SessionContextStore(window_size=4)
+        ChatMessage.objects.create(session=self.session, message_type='user', content='saved')
+        self.queue.enqueue(ChatMessage(session=self.session, message_type='ai', content='queued',
+                                       timestamp=timezone.now()))
+
+        self.assertEqual(store.get('context-session'), [
+            {'role': 'user', 'content': 'saved'},
+            {'role': 'assistant', 'content': 'queued'},
+        ])
+
+        with self.assertNumQueries(0):
+            for i in range(5):
+                message = self.queue.enqueue(ChatMessage(session=self.session, message_type='user',
+                                                         content=f'turn {i}', timestamp=timezone.now()))
+                store.record(message)
+            context = store.get('context-session')
+
+        self.assertEqual([m['content'] for m in context], ['turn 1', 'turn 2', 'turn 3', 'turn 4'])
+        self.assertEqual(store.stats()['loads'], 1)
+
+    def test_record_is_idempotent_and_invalidate_reloads(self):
+        """이미 로드된 메시지는 중복 반영되지 않고, invalidate 후에는 다시 읽음"""
+        store = SessionContextStore(window_size=10)
+        message = ChatMessage.objects.create(session=self.session, message_type='user', content='hello')
+        store.record(message)  # 아직 조회 전이라 무시
+
+        store.get('context-session')
+        store.record(message)
+        self.assertEqual(len(store.get('context-session')), 1)
+
+        store.invalidate('context-session')
+        ChatMessage.objects.create(session=self.session, message_type='ai', content='hi')
+        self.assertEqual(len(store.get('context-session')), 2)
+        self.assertEqual(store.stats()['loads'], 2)
+
+
+class ConversationSummarizerTest(TestCase):
+    """긴 세션 대화 요약 테스트"""
+    
+    def setUp(self):
+        self.session = ChatSession.objects.create(session_id='long-session')
+        base = timezone.now() - timezone.timedelta(hours=1)
+        for i in range(40):
+            message = ChatMessage.objects.create(session=self.session, message_type='user' if i % 2 == 0 else 'ai',
+                                                 content=f'message {i}')
+            ChatMessage.objects.filter(pk=message.pk).update(timestamp=base + timezone.timedelta(seconds=i))
+        patcher = mock.patch('chatbot.write_behind.get_write_behind_queue',
+                             return_value=WriteBehindQueue(enabled=False))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    @mock.patch('ai_backend.services.OllamaClient.generate', return_value={'response': '디스크 점검 중'})
+    def test_summarizes_messages_before_recent_window(self, generate):
+        """최근 창 이전 메시지만 요약하고, 요약은 세션 컨텍스트 맨 앞에 붙음"""
+        summarizer = ConversationSummarizer(min_messages=20, keep_recent=10)
+        self.assertEqual(summarizer.run_once(), 1)
+        
+        summary = ConversationSummary.objects.get(session=self.session)
+        self.assertEqual(summary.message_count, 30)
+        self.assertEqual(summary.summarized_until, self.session.messages.get(content='message 29').timestamp)
+        prompt = generate.call_args[0][0]
+        self.assertIn('message 0', prompt)
+        self.assertNotIn('message 30', prompt)
+        
+        # 새로 쌓인 메시지가 부족하면 다시 요약하지 않음
+        self.assertEqual(summarizer.run_once(), 0)
+        
+        context = SessionContextStore(window_size=10).get('long-session')
+        self.assertEqual(context[0], {'role': 'system', 'content': '이전 대화 요약:\n디스크 점검 중'})
+        self.assertEqual(context[1]['content'], 'message 30')
+
+
+class XShellFanOutTest(TransactionTestCase):
+    """여러 세션 동시 실행 테스트"""
+    
+    def setUp(self):
+        for i in range(6):
+            XShellSession.objects.create(name=f'web{i}', host=f'10.0.1.{i}', username='ops')
+    
+    def test_fan_out_bounded_and_bulk_saved(self):
+        """동시 실행 수 제한, 없는 세션 보고, 히스토리는 한 번에 저장"""
+        xshell_service = XShellService()
+        running = []
+        peak = []
+        
+        def fake_remote(command, xshell_session, save_history=True):
+            running.append(xshell_session.name)
+            peak.append(len(running))
+            time.sleep(0.1)
+            running.remove(xshell_session.name)
+            return {'success': True, 'output': f'up {xshell_session.host}', 'error': '', 'exit_code': 0, 'execution_time': 0.1}
+        
+        session_names = [f'web{i}' for i in range(6)] + ['missing']
+        with mock.patch.object(xshell_service, 'execute_remote_command', side_effect=fake_remote):
+            with mock.patch.object(CommandHistory.objects, 'bulk_create', wraps=CommandHistory.objects.bulk_create) as bulk_create:
+                results = list(xshell_service.execute_command_multi('uptime', session_names, max_concurrency=2))
+        
+        self.assertEqual(len(results), 7)
+        self.assertEqual(results[0]['session_name'], 'missing')
+        self.assertEqual(sum(1 for r in results if r['success']), 6)
+        self.assertLessEqual(max(peak), 2)
+        self.assertEqual(bulk_create.call_count, 1)
+        self.assertEqual(CommandHistory.objects.filter(command='uptime').count(), 6)
+    
+    def test_fan_out_dangerous_command_blocked(self):
+        """위험한 명령어는 어느 호스트에도 실행하지 않음"""
+        xshell_service = XShellService()
+        with mock.patch.object(xshell_service, 'execute_remote_command') as remote:
+            results = list(xshell_service.execute_command_multi('rm -rf /', ['web0', 'web1']))
+        
+        remote.assert_not_called()
+        self.assertTrue(all(r['error'] == 'Dangerous command blocked' for r in results))
+
+
+class SSHChannelDrainTest(TestCase):
+    """원격 명령어 출력 수신 테스트"""
+    
+    class FakeChannel:
+        def __init__(self, stdout_chunks, stderr_chunks, exit_code=0):
+            self.stdout_chunks = list(stdout_chunks)
+            self.stderr_chunks = list(stderr_chunks)
+            self.exit_code = exit_code
+            self.eof_received = False
+            self.closed = False
+        
+        def recv_ready(self):
+            return bool(self.stdout_chunks)
+        
+        def recv_stderr_ready(self):
+            return bool(self.stderr_chunks)
+        
+        def recv(self, size):
+            return self.stdout_chunks.pop(0)
+        
+        def recv_stderr(self, size):
+            return self.stderr_chunks.pop(0)
+        
+        def exit_status_ready(self):
+            return not self.stdout_chunks and not self.stderr_chunks
+        
+        def recv_exit_status(self):
+            return self.exit_code
+        
+        def close(self):
+            self.closed = True
+    
+    def test_drains_both_streams(self):
+        """stdout과 stderr를 모두 수집"""
+        channel = self.FakeChannel([b'out1\n', b'out2\n'], [b'err\n'] * 3, exit_code=2)
+        result = _drain_channel(channel, max_output=1024, timeout=5)
+        
+        self.assertEqual(result['stdout'], b'out1\nout2\n')
+        self.assertEqual(result['stderr'], b'err\n' * 3)
+        self.assertEqual(result['exit_code'], 2)
+        self.assertFalse(result['truncated'])
+    
+    def test_output_cap(self):
+        """최대 크기를 넘는 출력은 잘라내되 끝까지 읽음"""
+        channel = self.FakeChannel([b'x' * 100] * 10, [b'e' * 100] * 10)
+        result = _drain_channel(channel, max_output=250, timeout=5)
+        
+        self.assertEqual(len(result['stdout']) + len(result['stderr']), 250)
+        self.assertTrue(result['truncated'])
+        self.assertFalse(channel.stdout_chunks or channel.stderr_chunks)
+    
+    def test_stream_lines_across_chunks(self):
+        """청크 경계에 걸친 줄과 UTF-8 문자를 이어 붙여 줄 단위로 전달하고 종료 코드 표시"""
+        text = '첫 줄\n둘째 줄\n마지막'.encode('utf-8')
+        channel = self.FakeChannel([text[:5], text[5:14], text[14:]], [], exit_code=3)
+        lines = list(_stream_channel(channel))
+        
+        self.assertEqual(lines[:3], ['첫 줄', '둘째 줄', '마지막'])
+        self.assertIn('오류 코드 3', lines[3])
+        self.assertTrue(channel.closed)
+    
+    def test_stream_closed_by_consumer(self):
+        """소비자가 중단하면 채널을 닫음"""
+        channel = self.FakeChannel([b'a\nb\n', b'c\n'], [])
+        stream = _stream_channel(channel)
+        self.assertEqual(next(stream), 'a')
+        stream.close()
+        self.assertTrue(channel.closed)
+    
+    def test_quiet_stream_closed_when_consumer_cancelled(self):
+        """출력이 없는 명령(tail -f, sleep)도 소비자가 취소되면 채널을 닫고 스레드가 끝남"""
+        import threading
+        channel = self.FakeChannel([], [])
+        channel.exit_status_ready = lambda: False
+        finished = threading.Event()
+        
+        def stream():
+            try:
+                yield from _stream_channel(channel, stop=stop)
+            finally:
+                finished.set()
+        
+        async def consume():
+            async for _ in _iterate_in_thread(stream(), stop):
+                pass
+        
+        async def scenario():
+            task = asyncio.ensure_future(consume())
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+        
+        stop = threading.Event()
+        with mock.patch('xshell_integration.services.select.select', side_effect=lambda *args: time.sleep(0.01)):
+            asyncio.run(scenario())
+            self.assertTrue(finished.wait(2))
+        self.assertTrue(channel.closed)
+
+
+@skipIf(platform.system().lower() == 'windows', 'bash 필요')
+class ShellChannelTest(TestCase):
+    """채팅 세션별 지속 원격 셸 테스트 (로컬 bash를 셸 채널처럼 사용)"""
+    
+    class FakeShellChannel:
+        def __init__(self):
+            self.process = subprocess.Popen(['bash', '--norc', '--noprofile'], stdin=subprocess.PIPE,
+                                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+            self.closed = False
+        
+        def send(self, data):
+            self.process.stdin.write(data)
+            self.process.stdin.flush()
+        
+        def recv_ready(self):
+            return bool(select.select([self.process.stdout], [], [], 0)[0])
+        
+        def recv(self, size):
+            return os.read(self.process.stdout.fileno(), size)
+        
+        def fileno(self):
+            return self.process.stdout.fileno()
+        
+        def exit_status_ready(self):
+            return self.process.poll() is not None
+        
+        def close(self):
+            self.closed = True
+            if self.process.poll() is None:
+                self.process.kill()
+            self.process.wait()
+            self.process.stdin.close()
+            self.process.stdout.close()
+    
+    KEY = ('chat-1', 'web', 'example.com', 22, 'admin')
+    
+    def setUp(self):
+        self.manager = ShellChannelManager(idle_timeout=60, max_channels=4, init_timeout=5)
+        self.channels = []
+    
+    def tearDown(self):
+        self.manager.close()
+    
+    def open_channel(self):
+        channel = self.FakeShellChannel()
+        self.channels.append(channel)
+        return channel
+    
+    def run_command(self, command, key=KEY, timeout=5):
+        return self.manager.run(key, self.open_channel, command, timeout=timeout, max_output=4096)
+    
+    def test_state_preserved_between_commands(self):
+        """cd, export가 다음 명령어에도 이어지고 종료 코드를 구분"""
+        self.run_command('cd /tmp')
+        self.run_command('export GREETING=hello')
+        result = self.run_command('echo "$GREETING from $(pwd)"')
+        self.assertEqual(result['output'].strip(), b'hello from /tmp')
+        self.assertEqual(result['exit_code'], 0)
+        self.assertEqual(result['cwd'], '/tmp')
+        
+        self.assertEqual(self.run_command('ls /no/such/dir')['exit_code'], 2)
+        self.assertEqual(self.run_command('cat')['exit_code'], 0)  # 표준 입력은 /dev/null
+        self.assertEqual(len(self.channels), 1)
+        self.assertEqual(self.manager.stats()['reused'], 4)
+        
+        other = self.run_command('pwd', key=('chat-2',) + self.KEY[1:])
+        self.assertNotEqual(other['cwd'], '/tmp')
+        self.assertEqual(len(self.channels), 2)
+    
+    def test_timeout_discards_shell_and_idle_reaped(self):
+        """시간 초과된 셸은 버리고 새로 열며, 쉬고 있는 셸은 정리"""
+        self.run_command('cd /tmp')
+        with self.assertRaises(Exception):
+            self.run_command('sleep 5', timeout=0.3)
+        self.assertTrue(self.channels[0].closed)
+        
+        self.assertNotEqual(self.run_command('pwd')['cwd'], '/tmp')
+        self.assertEqual(len(self.channels), 2)
+        
+        self.manager.idle_timeout = 0.1
+        time.sleep(0.2)
+        self.assertEqual(self.manager.reap_idle(), 1)
+        self.assertTrue(self.channels[1].closed)
+        self.assertEqual(self.manager.stats()['size'], 0)
+
+
+class SSHConnectionPoolTest(TestCase):
+    """SSH 연결 풀 테스트"""
+    
+    class FakeTransport:
+        def __init__(self):
+            self.active = True
+            self.keepalive = None
+            self.sessions_opened = 0
+        
+        def is_active(self):
+            return self.active
+        
+        def set_keepalive(self, interval):
+            self.keepalive = interval
+        
+        def open_session(self, timeout=None):
+            if not self.active:
+                raise EOFError()
+            self.sessions_opened += 1
+            return mock.Mock()
+    
+    class FakeClient:
+        def __init__(self):
+            self.transport = SSHConnectionPoolTest.FakeTransport()
+            self.closed = False
+        
+        def get_transport(self):
+            return self.transport
+        
+        def exec_command(self, command, timeout=None):
+            raise AssertionError('연결 확인에 원격 명령어를 실행하면 안 됨')
+        
+        def close(self):
+            self.closed = True
+    
+    def test_connection_reused_across_services(self):
+        """같은 host/port/user는 한 번만 핸드셰이크"""
+        pool = SSHConnectionPool(max_size=5, idle_timeout=60, keepalive_interval=15)
+        key = ('10.0.0.1', 22, 'admin')
+        
+        first = pool.get(key, self.FakeClient)
+        second = pool.get(key, self.FakeClient)
+        
+        self.assertIs(first, second)
+        self.assertEqual(first.transport.keepalive, 15)
+        self.assertEqual(pool.stats()['handshakes'], 1)
+        self.assertEqual(pool.stats()['handshakes_avoided'], 1)
+    
+    def test_liveness_probe_only_when_stale(self):
+        """최근 확인된 연결은 transport 상태만 보고, 오래된 연결만 채널로 확인"""
+        key = ('10.0.0.2', 22, 'admin')
+        
+        fresh_pool = SSHConnectionPool(max_size=5, idle_timeout=60, keepalive_interval=15, stale_after=60)
+        client = fresh_pool.get(key, self.FakeClient)
+        fresh_pool.get(key, self.FakeClient)
+        self.assertEqual(client.transport.sessions_opened, 0)
+        
+        stale_pool = SSHConnectionPool(max_size=5, idle_timeout=60, keepalive_interval=15, stale_after=0)
+        client = stale_pool.get(key, self.FakeClient)
+        self.assertIs(stale_pool.get(key, self.FakeClient), client)
+        self.assertEqual(client.transport.sessions_opened, 1)
+        self.assertEqual(stale_pool.stats()['liveness_probes'], 1)
+    
+    def test_dead_connection_replaced_and_lru_evicted(self):
+        """끊어진 연결은 재생성, 최대 크기 초과 시 가장 오래된 연결 정리"""
+        pool = SSHConnectionPool(max_size=2, idle_timeout=60, keepalive_interval=15)
+        
+        with pool.connection(('host-a', 22, 'root'), self.FakeClient) as first:
+            first.transport.active = False
+        with pool.connection(('host-a', 22, 'root'), self.FakeClient) as replaced:
+            self.assertIsNot(first, replaced)
+            self.assertTrue(first.closed)
+        
+        with pool.connection(('host-b', 22, 'root'), self.FakeClient):
+            pass
+        with pool.connection(('host-c', 22, 'root'), self.FakeClient):
+            pass
+        
+        self.assertTrue(replaced.closed)
+        self.assertEqual(pool.stats()['size'], 2)
+        self.assertEqual(pool.stats()['evictions'], 1)
+    
+    def test_connection_in_use_not_evicted(self):
+        """명령 실행/스트리밍 중인 연결은 LRU/유휴 정리 대상에서 제외"""
+        pool = SSHConnectionPool(max_size=1, idle_timeout=60, keepalive_interval=15)
+        
+        with pool.connection(('host-a', 22, 'root'), self.FakeClient) as busy:
+            with pool.connection(('host-b', 22, 'root'), self.FakeClient):
+                pass
+            self.assertFalse(busy.closed)
+            self.assertEqual(pool.stats()['connections']['root@host-a:22']['active'], 1)
+            
+            pool._connections[('host-a', 22, 'root')].last_used -= 120
+            pool.evict_idle()
+            self.assertFalse(busy.closed)
+        
+        self.assertEqual(pool.stats()['connections']['root@host-a:22']['active'], 0)
+        with pool.connection(('host-c', 22, 'root'), self.FakeClient):
+            pass
+        self.assertTrue(busy.closed)
 
 
 class ChatConsumerTest(TransactionTestCase):
@@ -11,8 +11,11 @@ import json
 import uuid
 
 from .models import ChatSession, ChatMessage, XShellSession
+from .session_context import get_session_context_store
 from ai_backend.services import AIService
 from xshell_integration.services import XShellService
+from xshell_integration.shell_channels import get_shell_channels
+from xshell_integration.speculative import get_speculative_executor
 
 
 class ChatbotHomeView(TemplateView):
@@ -93,6 +96,7 @@ def send_message(request):
             message_type=message_type,
             content=message_content
         )
+        get_session_context_store().record(user_message)
         
         # AI 서비스 호출
         ai_service = AIService()
@@ -109,17 +113,20 @@ def send_message(request):
             content=ai_response['content'],
             metadata=ai_response.get('metadata', {})
         )
+        get_session_context_store().record(ai_message)
         
         return JsonResponse({
             'success': True,
             'user_message': {
                 'id': user_message.id,
+                'client_id': str(user_message.client_id),
                 'content': user_message.content,
                 'type': user_message.message_type,
                 'timestamp': user_message.timestamp.isoformat()
             },
             'ai_message': {
                 'id': ai_message.id,
+                'client_id': str(ai_message.client_id),
                 'content': ai_message.content,
                 'type': ai_message.message_type,
                 'timestamp': ai_message.timestamp.isoformat(),
@@ -144,6 +151,7 @@ def get_chat_history(request, session_id):
         for msg in messages:
             message_list.append({
                 'id': msg.id,
+                'client_id': str(msg.client_id),
                 'type': msg.message_type,
                 'content': msg.content,
                 'timestamp': msg.timestamp.isoformat(),
@@ -184,9 +192,11 @@ def execute_command(request):
                 'error': '명령어가 필요합니다.'
             }, status=400)
         
-        # XShell 서비스 호출
-        xshell_service = XShellService()
-        result = xshell_service.execute_command(command, session_name, shell_type)
+        # 미리 실행해 둔 읽기 전용 명령어 결과가 있으면 사용, 없으면 XShell 서비스 호출
+        result = get_speculative_executor().take(command, session_name, shell_type)
+        if result is None:
+            xshell_service = XShellService()
+            result = xshell_service.execute_command(command, session_name, shell_type, chat_session_id=chat_session_id)
         
         # 결과를 채팅 세션에 저장 (선택적)
         if chat_session_id:
@@ -194,7 +204,7 @@ def execute_command(request):
                 session = ChatSession.objects.get(session_id=chat_session_id)
                 
                 # 명령어 메시지 저장
-                ChatMessage.objects.create(
+                command_message = ChatMessage.objects.create(
                     session=session,
                     message_type='command',
                     content=command,
@@ -202,7 +212,7 @@ def execute_command(request):
                 )
                 
                 # 결과 메시지 저장
-                ChatMessage.objects.create(
+                result_message = ChatMessage.objects.create(
                     session=session,
                     message_type='result',
                     content=result['output'],
@@ -212,6 +222,10 @@ def execute_command(request):
                         'shell_type': result.get('shell_type', 'unknown')
                     }
                 )
+                
+                context_store = get_session_context_store()
+                context_store.record(command_message)
+                context_store.record(result_message)
             except ChatSession.DoesNotExist:
                 pass
         
@@ -271,6 +285,8 @@ def delete_chat_session(request, session_id):
         
         session.is_active = False
         session.save()
+        get_session_context_store().invalidate(session_id)
+        get_shell_channels().close(session_id)
         
         return JsonResponse({'success': True})
         
@@ -0,0 +1,200 @@
+import atexit
+import threading
+import time
+import logging
+from collections import deque
+from typing import Dict, Any, List
+
+from django.conf import settings
+from django.db import close_old_connections, models, transaction
+
+logger = logging.getLogger('xshell_chatbot')
+
+
+class WriteBehindQueue:
+    """모델 인스턴스를 모아 두었다가 bulk_create로 한 번에 저장하는 쓰기 지연 큐
+
+    명령어 실행/메시지 전송 경로가 SQLite 쓰기 락을 기다리지 않도록
+    백그라운드 스레드가 batch_size 또는 flush_interval 기준으로 저장한다.
+    큐가 가득 찼거나 비활성화된 경우에는 호출한 스레드에서 바로 저장한다.
+    저장 중인 배치는 커밋될 때까지 pending()에 계속 보이고, 커밋에 실패하면 큐 앞에 되돌린다.
+    """
+
+    def __init__(self, batch_size: int = None, flush_interval: float = None, max_queue: int = None,
+                 enabled: bool = None):
+        self.batch_size = batch_size or getattr(settings, 'PERSISTENCE_BATCH_SIZE', 100)
+        self.flush_interval = flush_interval or getattr(settings, 'PERSISTENCE_FLUSH_INTERVAL', 0.5)
+        self.max_queue = max_queue or getattr(settings, 'PERSISTENCE_MAX_QUEUE', 5000)
+        self.max_retries = getattr(settings, 'PERSISTENCE_MAX_RETRIES', 3)
+        self.enabled = enabled if enabled is not None else getattr(settings, 'PERSISTENCE_WRITE_BEHIND', True)
+        self._pending = deque()
+        self._in_flight: List[models.Model] = []  # 저장 중이라 큐에서는 빠졌지만 아직 커밋되지 않은 항목
+        self._failed_flushes = 0  # 연속으로 커밋에 실패한 횟수
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()  # 백그라운드/수동 flush 동시 실행 방지
+        self._stop = False
+        self._thread = None
+        self.enqueued = 0
+        self.written = 0
+        self.batches = 0
+        self.sync_writes = 0
+        self.errors = 0
+        self.retries = 0
+
+    def start(self):
+        with self._cond:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop = False
+            self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """스레드 종료 후 남은 항목 저장"""
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout=5)
+        self.flush()
+
+    def enqueue(self, instance: models.Model) -> models.Model:
+        """저장할 인스턴스를 큐에 추가 (동기 저장으로 대체될 수 있음)"""
+        if self.enabled:
+            with self._cond:
+                if len(self._pending) < self.max_queue:
+                    self._pending.append(instance)
+                    self.enqueued += 1
+                    if len(self._pending) >= self.batch_size:
+                        self._cond.notify()
+                    return instance
+
+            logger.warning("쓰기 지연 큐가 가득 차 동기 저장으로 대체합니다")
+
+        instance.save()
+        self.sync_writes += 1
+        return instance
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._pending and not self._stop:
+                    self._cond.wait()
+                if self._stop:
+                    return
+                # 첫 항목이 들어온 뒤 flush_interval 동안 더 모으되, 배치가 차면 즉시 저장
+                deadline = time.monotonic() + self.flush_interval
+                while len(self._pending) < self.batch_size and not self._stop:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"쓰기 지연 큐 저장 중 오류: {e}")
+            finally:
+                close_old_connections()
+
+    def flush(self) -> int:
+        """대기 중인 항목을 모델별 bulk_create로 한 트랜잭션에 저장
+
+        커밋될 때까지는 in-flight 목록으로 pending()에 보이게 두고, 커밋에 실패하면
+        배치를 큐 앞에 되돌려 다음 flush에서 다시 시도한다. max_retries번 연속 실패하면
+        문제가 되는 행만 버리도록 개별 저장으로 대체한다.
+        """
+        with self._flush_lock:
+            with self._cond:
+                batch = list(self._pending)
+                self._pending.clear()
+                self._in_flight = batch
+
+            if not batch:
+                return 0
+
+            # 같은 모델끼리 순서를 유지하며 묶음
+            grouped: Dict[type, List[models.Model]] = {}
+            for instance in batch:
+                grouped.setdefault(type(instance), []).append(instance)
+            unsaved = [instance for instance in batch if instance.pk is None]
+
+            try:
+                with transaction.atomic():
+                    for model, instances in grouped.items():
+                        model.objects.bulk_create(instances, batch_size=self.batch_size)
+            except Exception as e:
+                self._failed_flushes += 1
+                if self._failed_flushes <= self.max_retries:
+                    logger.warning(f"쓰기 지연 큐 일괄 저장 실패, 다음 flush에서 재시도 "
+                                   f"({self._failed_flushes}/{self.max_retries}): {e}")
+                    # 롤백된 INSERT에서 받은 pk를 지워 다시 저장할 때 충돌하지 않게 함
+                    for instance in unsaved:
+                        instance.pk = None
+                    with self._cond:
+                        self._pending.extendleft(reversed(batch))
+                        self._in_flight = []
+                        self.retries += 1
+                    return 0
+
+                # 일괄 저장이 계속 실패하면 개별 저장으로 최대한 보존
+                logger.error(f"쓰기 지연 큐 일괄 저장 {self._failed_flushes}회 실패, 개별 저장으로 대체: {e}")
+                for instance in unsaved:
+                    instance.pk = None
+                for instance in batch:
+                    try:
+                        instance.save()
+                    except Exception as save_error:
+                        self.errors += 1
+                        logger.error(f"{type(instance).__name__} 저장 실패: {save_error}")
+
+            self._failed_flushes = 0
+            with self._cond:
+                self._in_flight = []
+            self.written += len(batch)
+            self.batches += 1
+            return len(batch)
+
+    def pending(self, model: type = None) -> List[models.Model]:
+        """아직 커밋되지 않은 인스턴스 스냅샷 - 저장 중인 배치 포함 (model이 주어지면 해당 모델만)"""
+        with self._cond:
+            items = self._in_flight + list(self._pending)
+        if model is None:
+            return items
+        return [instance for instance in items if isinstance(instance, model)]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            pending = len(self._pending)
+            in_flight = len(self._in_flight)
+        return {
+            'enabled': self.enabled,
+            'pending': pending,
+            'in_flight': in_flight,
+            'enqueued': self.enqueued,
+            'written': self.written,
+            'batches': self.batches,
+            'sync_writes': self.sync_writes,
+            'errors': self.errors,
+            'retries': self.retries,
+            'batch_size': self.batch_size,
+            'flush_interval': self.flush_interval,
+            'max_queue': self.max_queue
+        }
+
+
+_write_behind = None
+_write_behind_lock = threading.Lock()
+
+
+def get_write_behind_queue() -> WriteBehindQueue:
+    """프로세스 전역 쓰기 지연 큐 반환 (최초 호출 시 스레드 시작, 종료 시 flush)"""
+    global _write_behind
+    if _write_behind is None:
+        with _write_behind_lock:
+            if _write_behind is None:
+                _write_behind = WriteBehindQueue()
+                if _write_behind.enabled:
+                    _write_behind.start()
+                    atexit.register(_write_behind.stop)
+    return _write_behind
@@ -32,6 +32,7 @@ fi
 echo "🗄️ 데이터베이스 마이그레이션 중..."
 python manage.py makemigrations --noinput
 python manage.py migrate --noinput
+python manage.py createcachetable
 
 # 슈퍼유저 자동 생성 (환경 변수가 설정된 경우)
 if [ -n "$DJANGO_SUPERUSER_USERNAME" ] && [ -n "$DJANGO_SUPERUSER_EMAIL" ] && [ -n "$DJANGO_SUPERUSER_PASSWORD" ]; then
@@ -72,6 +72,7 @@ def setup_database():
     # 마이그레이션 적용
     print("마이그레이션 적용 중...")
     subprocess.run([sys.executable, 'manage.py', 'migrate'], check=True)
+    subprocess.run([sys.executable, 'manage.py', 'createcachetable'], check=True)
     
     # 슈퍼유저 생성 (선택적)
     if input("관리자 계정을 생성하시겠습니까? (y/N): ").lower() == 'y':
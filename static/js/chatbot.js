@@ -227,6 +227,12 @@ class XShellChatbot {
             case 'message':
                 this.displayMessage(data.message);
                 break;
+            case 'message_delta':
+                this.appendMessageDelta(data.message_id, data.delta);
+                break;
+            case 'message_ready':
+                this.showMessageActions(data.message_id, data.metadata);
+                break;
             case 'typing':
                 this.handleTypingIndicator(data);
                 break;
@@ -303,7 +309,10 @@ class XShellChatbot {
         
         const messageDiv = document.createElement('div');
         messageDiv.className = `message ${message.type}`;
-        messageDiv.dataset.messageId = message.id;
+        messageDiv.dataset.messageId = message.client_id || message.id;
+        if (message.stream_id) {
+            messageDiv.dataset.streamId = message.stream_id;
+        }
         
         const content = this.formatMessageContent(message.content, message.type);
         const timestamp = message.timestamp ? new Date(message.timestamp).toLocaleTimeString() : '';
@@ -318,7 +327,16 @@ class XShellChatbot {
             </div>
         `;
         
-        chatMessages.appendChild(messageDiv);
+        // 스트리밍 중이던 메시지가 있으면 최종 메시지로 교체
+        const streamingDiv = message.stream_id
+            ? chatMessages.querySelector(`[data-stream-id="${message.stream_id}"]`)
+            : null;
+        
+        if (streamingDiv) {
+            streamingDiv.replaceWith(messageDiv);
+        } else {
+            chatMessages.appendChild(messageDiv);
+        }
         this.scrollToBottom();
         
         // 타이핑 인디케이터 숨기기
@@ -327,6 +345,49 @@ class XShellChatbot {
         }
     }
     
+    getStreamingMessage(streamId) {
+        const chatMessages = document.getElementById('chatMessages');
+        let messageDiv = chatMessages.querySelector(`[data-stream-id="${streamId}"]`);
+        
+        if (!messageDiv) {
+            const welcomeMessage = chatMessages.querySelector('.welcome-message');
+            if (welcomeMessage) {
+                welcomeMessage.style.display = 'none';
+            }
+            
+            messageDiv = document.createElement('div');
+            messageDiv.className = 'message ai streaming';
+            messageDiv.dataset.streamId = streamId;
+            messageDiv.dataset.rawContent = '';
+            messageDiv.innerHTML = `
+                <div class="message-content"></div>
+                <div class="message-meta"></div>
+            `;
+            chatMessages.appendChild(messageDiv);
+            
+            // 첫 프레임이 도착하면 타이핑 인디케이터 숨기기
+            this.hideTypingIndicator();
+        }
+        
+        return messageDiv;
+    }
+    
+    appendMessageDelta(streamId, delta) {
+        const messageDiv = this.getStreamingMessage(streamId);
+        messageDiv.dataset.rawContent += delta;
+        messageDiv.querySelector('.message-content').innerHTML =
+            this.formatMessageContent(messageDiv.dataset.rawContent, 'ai');
+        this.scrollToBottom();
+    }
+    
+    showMessageActions(streamId, metadata) {
+        // 설명이 스트리밍되는 동안에도 실행/복사 버튼 사용 가능
+        const messageDiv = this.getStreamingMessage(streamId);
+        messageDiv.querySelector('.message-meta').innerHTML =
+            this.getMessageActions({ type: 'ai', metadata: metadata });
+        this.scrollToBottom();
+    }
+    
     formatMessageContent(content, type) {
         if (type === 'command' || type === 'result') {
             return `<pre><code>${this.escapeHtml(content)}</code></pre>`;
@@ -132,22 +132,140 @@ CHANNEL_LAYERS = {
     },
 }
 
-# Redis 관련 설정 완전 비활성화
-# CACHES = {
-#     'default': {
-#         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-#     }
-# }
+# Redis 관련 설정 완전 비활성화 - 기본 캐시는 메모리, 명령어 설명은 DB 캐시 테이블
+# (DB 캐시 테이블 생성: python manage.py createcachetable)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'command_explanations': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'command_explanation_cache',
+        'TIMEOUT': int(os.getenv('EXPLAIN_CACHE_TTL', str(7 * 24 * 3600))),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('EXPLAIN_CACHE_MAX_ENTRIES', '5000')),
+            'CULL_FREQUENCY': 4,  # 가득 차면 1/4 정리
+        },
+    },
+}
+
+# 명령어 히스토리/채팅 메시지 쓰기 지연 저장 (bulk_create 일괄 저장)
+PERSISTENCE_WRITE_BEHIND = os.getenv('PERSISTENCE_WRITE_BEHIND', 'True').lower() == 'true'
+PERSISTENCE_BATCH_SIZE = int(os.getenv('PERSISTENCE_BATCH_SIZE', '100'))
+PERSISTENCE_FLUSH_INTERVAL = float(os.getenv('PERSISTENCE_FLUSH_INTERVAL', '0.5'))  # 초
+PERSISTENCE_MAX_QUEUE = int(os.getenv('PERSISTENCE_MAX_QUEUE', '5000'))  # 초과 시 동기 저장
+PERSISTENCE_MAX_RETRIES = int(os.getenv('PERSISTENCE_MAX_RETRIES', '3'))  # 일괄 저장 연속 실패 시 재시도 횟수 (초과 시 개별 저장)
+
+# 세션별 최근 대화 창 (메시지 저장 시 갱신, LLM 컨텍스트용)
+SESSION_CONTEXT_WINDOW = int(os.getenv('SESSION_CONTEXT_WINDOW', '10'))
+SESSION_CONTEXT_MAX_SESSIONS = int(os.getenv('SESSION_CONTEXT_MAX_SESSIONS', '1000'))
+
+# 긴 세션의 이전 대화 요약 (최근 대화 창 이전 메시지를 주기적으로 압축)
+SUMMARY_ENABLED = os.getenv('SUMMARY_ENABLED', 'True').lower() == 'true'
+SUMMARY_INTERVAL = int(os.getenv('SUMMARY_INTERVAL', '300'))  # 초
+SUMMARY_MIN_MESSAGES = int(os.getenv('SUMMARY_MIN_MESSAGES', '20'))  # 요약되지 않은 메시지가 이만큼 쌓이면 요약
+SUMMARY_MAX_MESSAGES = int(os.getenv('SUMMARY_MAX_MESSAGES', '100'))  # 한 번에 요약할 최대 메시지 수
+SUMMARY_SESSIONS_PER_RUN = int(os.getenv('SUMMARY_SESSIONS_PER_RUN', '5'))
 
 # XShell Integration Settings
 XSHELL_PATH = os.getenv('XSHELL_PATH', r'C:\Program Files\NetSarang\Xshell 8\Xshell.exe')
 XSHELL_SESSIONS_PATH = os.getenv('XSHELL_SESSIONS_PATH', r'C:\Users\{username}\Documents\NetSarang Computer\8\Xshell\Sessions')
 
+# SSH 연결 풀 (host/port/user 별 연결 재사용)
+SSH_POOL_MAX_SIZE = int(os.getenv('SSH_POOL_MAX_SIZE', '20'))
+SSH_POOL_IDLE_TIMEOUT = int(os.getenv('SSH_POOL_IDLE_TIMEOUT', '600'))  # 초
+SSH_KEEPALIVE_INTERVAL = int(os.getenv('SSH_KEEPALIVE_INTERVAL', '30'))  # 초, 0이면 비활성화
+SSH_LIVENESS_STALE_AFTER = int(os.getenv('SSH_LIVENESS_STALE_AFTER', '60'))  # 이 시간 이상 쉰 연결만 채널을 열어 확인
+SSH_LIVENESS_PROBE_TIMEOUT = int(os.getenv('SSH_LIVENESS_PROBE_TIMEOUT', '5'))
+
+# 원격 명령어 출력 처리
+SSH_COMBINE_STDERR = os.getenv('SSH_COMBINE_STDERR', 'False').lower() == 'true'  # stderr를 stdout에 합쳐서 수신
+SSH_MAX_OUTPUT_BYTES = int(os.getenv('SSH_MAX_OUTPUT_BYTES', str(1024 * 1024)))  # 이보다 큰 출력은 잘라냄
+
+# 채팅 세션별 원격 셸 유지 - 같은 채팅의 명령어는 하나의 PTY 셸에서 실행 (cd, export 유지)
+SSH_PERSISTENT_SHELL = os.getenv('SSH_PERSISTENT_SHELL', 'True').lower() == 'true'
+SSH_SHELL_IDLE_TIMEOUT = int(os.getenv('SSH_SHELL_IDLE_TIMEOUT', '300'))  # 이 시간 동안 쓰지 않은 셸은 닫음 (초)
+SSH_SHELL_MAX_CHANNELS = int(os.getenv('SSH_SHELL_MAX_CHANNELS', '50'))
+SSH_SHELL_INIT_TIMEOUT = int(os.getenv('SSH_SHELL_INIT_TIMEOUT', '10'))  # 셸 시작(로그인 메시지 포함) 대기 시간
+
+# 여러 세션 동시 실행 시 최대 병렬 호스트 수
+XSHELL_FANOUT_CONCURRENCY = int(os.getenv('XSHELL_FANOUT_CONCURRENCY', '10'))
+
+# 읽기 전용 명령어(ls, df -h, ps aux 등) 미리 실행 - AI가 명령어를 제안하는 동안 실행해 두고 결과를 잠시 보관
+SPECULATIVE_EXECUTION = os.getenv('SPECULATIVE_EXECUTION', 'False').lower() == 'true'
+SPECULATIVE_TTL = float(os.getenv('SPECULATIVE_TTL', '10'))  # 실행이 끝난 뒤 결과를 쓸 수 있는 시간 (초)
+SPECULATIVE_MAX_WORKERS = int(os.getenv('SPECULATIVE_MAX_WORKERS', '2'))
+
+# 위험한 명령어 판정 결과 캐시 크기 (명령어 문자열 기준 LRU)
+COMMAND_POLICY_CACHE_SIZE = int(os.getenv('COMMAND_POLICY_CACHE_SIZE', '2048'))
+
 # AI Backend Settings - 32GB RAM 고성능 설정
 OLLAMA_BASE_URL = os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434')
 DEFAULT_AI_MODEL = os.getenv('DEFAULT_AI_MODEL', 'llama3.1:8b')  # 고성능: 4.7GB (32GB RAM용)
 CODE_AI_MODEL = os.getenv('CODE_AI_MODEL', 'codellama:13b')      # 코드 전문: 7GB
 
+# 모델 상주 관리 (모든 요청에 keep_alive 명시, 시작 시 예열)
+OLLAMA_RESIDENCY_POLICY = os.getenv('OLLAMA_RESIDENCY_POLICY', 'pin')  # pin, lru, memory
+OLLAMA_PINNED_MODELS = [
+    name.strip() for name in os.getenv('OLLAMA_PINNED_MODELS', f'{DEFAULT_AI_MODEL},{CODE_AI_MODEL}').split(',')
+    if name.strip()
+]
+OLLAMA_MAX_HOT_MODELS = int(os.getenv('OLLAMA_MAX_HOT_MODELS', '2'))  # lru 정책: 상주시킬 최근 모델 수
+OLLAMA_MEMORY_BUDGET_GB = float(os.getenv('OLLAMA_MEMORY_BUDGET_GB', '24'))  # memory 정책: 상주 모델 크기 합 상한
+OLLAMA_KEEP_ALIVE = os.getenv('OLLAMA_KEEP_ALIVE', '5m')  # 상주 대상이 아닌 모델의 keep_alive
+OLLAMA_WARMUP = os.getenv('OLLAMA_WARMUP', 'True').lower() == 'true'
+OLLAMA_WARMUP_MODELS = [name.strip() for name in os.getenv('OLLAMA_WARMUP_MODELS', '').split(',') if name.strip()]
+
+# Ollama 호출 수 제한 (모델별 동시 실행 수, 우선순위 대기열)
+OLLAMA_MAX_CONCURRENCY = int(os.getenv('OLLAMA_MAX_CONCURRENCY', '4'))  # 모델당 동시 생성 수 (OLLAMA_NUM_PARALLEL과 맞출 것)
+OLLAMA_MODEL_CONCURRENCY = {  # 모델별 동시 실행 수 (예: codellama:13b=1)
+    name.strip(): int(limit)
+    for name, _, limit in (
+        item.rpartition('=') for item in os.getenv('OLLAMA_MODEL_CONCURRENCY', '').split(',') if '=' in item
+    )
+}
+OLLAMA_MAX_QUEUE = int(os.getenv('OLLAMA_MAX_QUEUE', '50'))  # 모델당 최대 대기 요청 수 (초과 시 즉시 실패)
+OLLAMA_QUEUE_TIMEOUT = float(os.getenv('OLLAMA_QUEUE_TIMEOUT', '15'))  # 대기 시간 상한 (초)
+# 진행 중인 동일 요청(모델+시스템 프롬프트+프롬프트+옵션)은 한 번만 보내고 결과/스트림을 나눠 받음
+OLLAMA_COALESCE_REQUESTS = os.getenv('OLLAMA_COALESCE_REQUESTS', 'True').lower() == 'true'
+
+# Ollama 회로 차단기 (엔드포인트별 실패 비율이 높으면 일정 시간 요청 없이 바로 실패)
+OLLAMA_BREAKER_WINDOW = float(os.getenv('OLLAMA_BREAKER_WINDOW', '60'))  # 실패 비율을 계산할 구간 (초)
+OLLAMA_BREAKER_FAILURE_RATE = float(os.getenv('OLLAMA_BREAKER_FAILURE_RATE', '0.5'))
+OLLAMA_BREAKER_MIN_REQUESTS = int(os.getenv('OLLAMA_BREAKER_MIN_REQUESTS', '5'))  # 이보다 적으면 열지 않음
+OLLAMA_BREAKER_OPEN_SECONDS = float(os.getenv('OLLAMA_BREAKER_OPEN_SECONDS', '30'))  # 열린 뒤 시험 요청까지 대기
+
+# 프롬프트 토큰 예산 (모델 컨텍스트 길이에 맞춰 이전 대화를 채움)
+OLLAMA_CONTEXT_LENGTH = int(os.getenv('OLLAMA_CONTEXT_LENGTH', '4096'))  # Ollama 서버 설정과 맞출 것
+MODEL_CONTEXT_TOKENS = {  # 모델별 컨텍스트 길이 (예: llama3.1:8b=8192,codellama:13b=16384)
+    name.strip(): int(tokens)
+    for name, _, tokens in (
+        item.rpartition('=') for item in os.getenv('MODEL_CONTEXT_TOKENS', '').split(',') if '=' in item
+    )
+}
+PROMPT_RESPONSE_RESERVE = int(os.getenv('PROMPT_RESPONSE_RESERVE', '512'))  # 응답용으로 남길 토큰 수
+PROMPT_TOKENIZER = os.getenv('PROMPT_TOKENIZER', '')  # text -> 토큰 수 함수의 점 경로 (비우면 근사치)
+
+# 자연어 → 명령어 로컬 인덱스 (LLM 명령어 추출 전에 조회)
+COMMAND_INDEX_MIN_CONFIDENCE = float(os.getenv('COMMAND_INDEX_MIN_CONFIDENCE', '0.75'))  # 미만이면 LLM 사용
+COMMAND_INDEX_REFRESH_INTERVAL = int(os.getenv('COMMAND_INDEX_REFRESH_INTERVAL', '300'))  # 관리자 표현/이력 재로드 주기 (초)
+
+# 명령어 설명 캐시 (프로세스 내 LRU + DB 캐시)
+EXPLAIN_CACHE_TTL = int(os.getenv('EXPLAIN_CACHE_TTL', str(7 * 24 * 3600)))  # 초
+EXPLAIN_CACHE_LOCAL_SIZE = int(os.getenv('EXPLAIN_CACHE_LOCAL_SIZE', '512'))
+EXPLAIN_CACHE_RETRY_AFTER = int(os.getenv('EXPLAIN_CACHE_RETRY_AFTER', '300'))  # 캐시 테이블이 없을 때 DB 캐시 재시도 간격(초)
+
+# Ollama HTTP 커넥션 풀 (호스트별 keep-alive 세션)
+OLLAMA_HTTP_POOL_SIZE = int(os.getenv('OLLAMA_HTTP_POOL_SIZE', '10'))
+OLLAMA_HTTP_POOL_IDLE_TIMEOUT = int(os.getenv('OLLAMA_HTTP_POOL_IDLE_TIMEOUT', '300'))  # 초
+OLLAMA_ASYNC_MAX_CONNECTIONS = int(os.getenv('OLLAMA_ASYNC_MAX_CONNECTIONS', '256'))  # 비동기 클라이언트 동시 연결 수
+
+# Ollama 상태 모니터 갱신 주기 (초)
+OLLAMA_HEALTH_CHECK_INTERVAL = int(os.getenv('OLLAMA_HEALTH_CHECK_INTERVAL', '30'))
+
+# AI 응답 토큰 스트리밍 (WebSocket message_delta 프레임)
+AI_STREAM_RESPONSES = os.getenv('AI_STREAM_RESPONSES', 'True').lower() == 'true'
+
 # Logging
 LOGGING = {
     'version': 1,
@@ -0,0 +1,374 @@
+import re
+import shlex
+import posixpath
+import threading
+import logging
+from functools import lru_cache
+from typing import Callable, Dict, Any, FrozenSet, List, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+
+logger = logging.getLogger('xshell_chatbot')
+
+# 명령을 나누는 셸 연산자 (파이프, 명령 연결, 백그라운드, 서브셸)
+SEPARATORS = frozenset({';', ';;', '&&', '||', '|', '|&', '&', '(', ')', '{', '}', '$', '`'})
+# 출력 리다이렉션 - 바로 다음 토큰이 대상 파일
+OUTPUT_REDIRECTS = frozenset({'>', '>>', '>|', '&>', '&>>', '<>'})
+INPUT_REDIRECTS = frozenset({'<', '<<', '<<<', '>&', '<&'})
+
+# 다른 명령을 실행하는 래퍼 - 래퍼와 그 옵션을 걷어 내고 실제 프로그램을 본다
+# 값: 값을 받는 옵션, 옵션 뒤에 오는 위치 인자 수 (timeout 10s CMD 등)
+WRAPPERS: Dict[str, Tuple[FrozenSet[str], int]] = {
+    'sudo': (frozenset({'-u', '-g', '-h', '-p', '-C', '-D', '-r', '-t', '-U'}), 0),
+    'doas': (frozenset({'-u', '-C'}), 0),
+    'nohup': (frozenset(), 0),
+    'time': (frozenset({'-f', '-o'}), 0),
+    'nice': (frozenset({'-n'}), 0),
+    'ionice': (frozenset({'-c', '-n', '-p'}), 0),
+    'command': (frozenset(), 0),
+    'builtin': (frozenset(), 0),
+    'exec': (frozenset({'-a'}), 0),
+    'env': (frozenset({'-u', '-C', '-S'}), 0),
+    'xargs': (frozenset({'-a', '-d', '-E', '-I', '-L', '-n', '-P', '-s'}), 0),
+    'timeout': (frozenset({'-s', '-k'}), 1),
+    'stdbuf': (frozenset(), 0),
+    'busybox': (frozenset(), 0),
+    'watch': (frozenset({'-n', '-d'}), 0),
+}
+# 명령 앞에 오는 셸 예약어 - 걷어 내고 뒤의 명령을 본다 (if rm ...; then reboot; fi 등)
+SHELL_KEYWORDS = frozenset({'if', 'then', 'elif', 'else', 'fi', 'while', 'until', 'do', 'done', 'esac', '!', '{', '}'})
+# 반복/분기 머리(for i in ...; select x in ...; case $x in) - 명령이 아니므로 세그먼트 전체를 건너뜀
+LOOP_HEADERS = frozenset({'for', 'select', 'case'})
+# 인자 문자열을 다시 명령으로 실행하는 프로그램
+SHELLS = frozenset({'sh', 'bash', 'zsh', 'dash', 'ksh', 'ash', 'fish'})
+POWERSHELLS = frozenset({'powershell', 'pwsh'})
+
+# 통째로 지우거나 권한을 바꾸면 시스템이 망가지는 경로 (뒤의 / 와 /* 는 떼고 비교)
+CRITICAL_UNIX_PATHS = frozenset({'/', '*', '.', '..', '~', '$home', '${home}', '/home'})
+# 시스템 디렉터리 - 그 아래 경로(/etc/ssh, /var/lib 등)도 모두 위험
+CRITICAL_UNIX_ROOTS = (
+    '/bin', '/boot', '/dev', '/etc', '/lib', '/lib32', '/lib64', '/opt',
+    '/proc', '/root', '/sbin', '/srv', '/sys', '/usr', '/var',
+)
+# 시스템 디렉터리 아래지만 임시 파일용인 경로
+SCRATCH_UNIX_PATHS = ('/var/tmp',)
+CRITICAL_WINDOWS_DIRS = frozenset({
+    'windows', 'windows\\system32', 'program files', 'program files (x86)', 'programdata', 'users',
+})
+WINDOWS_DRIVE = re.compile(r'^[a-z]:(\\(.*))?$')
+# /dev 아래에서 써도 되는 장치
+HARMLESS_DEVICES = frozenset({'/dev/null', '/dev/zero', '/dev/stdout', '/dev/stderr', '/dev/tty'})
+FORK_BOMB = re.compile(r'(\S+)\s*\(\)\s*\{[^}]*\1\s*\|\s*\1\s*&')
+
+
+class Verdict(NamedTuple):
+    dangerous: bool
+    rule: str = ''
+    segment: str = ''
+
+
+SAFE = Verdict(False)
+
+
+class Segment(NamedTuple):
+    """연산자로 나눈 단순 명령 하나"""
+    program: str
+    args: Tuple[str, ...]
+    redirects: Tuple[str, ...]
+
+    def text(self) -> str:
+        return ' '.join((self.program,) + self.args)
+
+
+def normalize_program(token: str) -> str:
+    """경로와 .exe를 떼고 소문자로 (/usr/bin/rm -> rm, SHUTDOWN.EXE -> shutdown)"""
+    name = re.split(r'[\\/]', token)[-1].lower()
+    return name[:-4] if name.endswith('.exe') else name
+
+
+def short_flags(args) -> set:
+    """-rf, -Rv 같은 짧은 옵션 문자 모음"""
+    flags = set()
+    for arg in args:
+        if len(arg) > 1 and arg[0] == '-' and arg[1] != '-':
+            flags.update(arg[1:])
+    return flags
+
+
+def is_recursive(args) -> bool:
+    lowered = {arg.lower() for arg in args}
+    return bool(short_flags(args) & {'r', 'R'}) or bool(lowered & {'--recursive', '-recurse', '/s'})
+
+
+def _under(path: str, roots) -> bool:
+    return any(path == root or path.startswith(root + '/') for root in roots)
+
+
+def is_critical_unix_path(arg: str) -> bool:
+    path = arg.lower()
+    if path.endswith('/*'):
+        path = path[:-2] or '/'
+    if path.startswith('/'):
+        path = posixpath.normpath(path)  # /tmp/../etc -> /etc, //etc/ -> /etc
+        if path.startswith('//'):
+            path = path[1:]
+    path = path.rstrip('/') or '/'
+    if path in CRITICAL_UNIX_PATHS:
+        return True
+    return _under(path, CRITICAL_UNIX_ROOTS) and not _under(path, SCRATCH_UNIX_PATHS)
+
+
+def is_critical_windows_path(arg: str) -> bool:
+    """드라이브 루트(c:, c:\\, c:\\*)나 Windows/Program Files 등 시스템 폴더"""
+    match = WINDOWS_DRIVE.match(arg.lower().replace('/', '\\'))
+    if not match:
+        return False
+    rest = (match.group(2) or '').rstrip('\\')
+    if rest.endswith('\\*.*') or rest.endswith('\\*'):
+        rest = rest.rsplit('\\', 1)[0]
+    return rest in ('', '*', '*.*') or rest in CRITICAL_WINDOWS_DIRS
+
+
+def is_critical_path(arg: str) -> bool:
+    return is_critical_unix_path(arg) or is_critical_windows_path(arg)
+
+
+def is_device(arg: str) -> bool:
+    path = arg.lower()
+    return path.startswith('/dev/') and path not in HARMLESS_DEVICES and not path.startswith('/dev/fd/')
+
+
+def _lower(args) -> List[str]:
+    return [arg.lower() for arg in args]
+
+
+class Rule(NamedTuple):
+    """programs 중 하나를 실행하고 matches(args)가 참이면 위험"""
+    name: str
+    programs: FrozenSet[str]
+    matches: Callable[[Tuple[str, ...]], bool]
+
+
+def _always(args) -> bool:
+    return True
+
+
+RULES: Tuple[Rule, ...] = (
+    # Linux/Unix
+    Rule('재귀 삭제 (시스템 경로)', frozenset({'rm'}),
+         lambda args: '--no-preserve-root' in args or (is_recursive(args) and any(map(is_critical_path, args)))),
+    Rule('디스크 직접 쓰기 (dd)', frozenset({'dd'}),
+         lambda args: any(arg.startswith(('if=', 'of=')) for arg in args)),
+    Rule('디스크 포맷/파티션', frozenset({'mkfs', 'mke2fs', 'mkswap', 'fdisk', 'sfdisk', 'cfdisk', 'parted', 'wipefs'}),
+         lambda args: not set(_lower(args)) & {'-l', '--list', '--version', '-v', '--help', '-h'}),
+    Rule('장치 파일 덮어쓰기', frozenset({'tee', 'shred'}), lambda args: any(map(is_device, args))),
+    Rule('권한 제거 (chmod 000)', frozenset({'chmod'}), lambda args: any(arg in ('0', '00', '000', '0000') for arg in args)),
+    Rule('재귀 권한/소유자 변경 (시스템 경로)', frozenset({'chmod', 'chown', 'chgrp'}),
+         lambda args: is_recursive(args) and any(map(is_critical_path, args))),
+    Rule('시스템 종료/재시작', frozenset({'shutdown', 'reboot', 'halt', 'poweroff'}),
+         # 예약 취소(shutdown -c, shutdown /a)는 허용
+         lambda args: not set(_lower(args)) & {'-c', '/a', '--help', '/?'}),
+    Rule('시스템 종료/재시작', frozenset({'init', 'telinit'}), lambda args: bool(set(args) & {'0', '6'})),
+    Rule('시스템 종료/재시작', frozenset({'systemctl'}),
+         lambda args: bool(set(_lower(args)) & {'poweroff', 'reboot', 'halt', 'kexec'})),
+    # Windows cmd
+    Rule('디스크 포맷/파티션', frozenset({'format', 'diskpart'}), _always),
+    Rule('부팅 설정 변경', frozenset({'bcdedit'}), _always),
+    Rule('드라이브/시스템 폴더 삭제', frozenset({'del', 'erase', 'rd', 'rmdir'}), lambda args: any(map(is_critical_path, args))),
+    Rule('관리자 계정 변경', frozenset({'net'}),
+         lambda args: _lower(args[:2]) == ['user', 'administrator'] and len(args) > 2),
+    Rule('레지스트리 삭제 (HKLM)', frozenset({'reg'}),
+         lambda args: len(args) > 1 and args[0].lower() == 'delete'
+         and args[1].lower().startswith(('hklm', 'hkey_local_machine'))),
+    Rule('드라이브/시스템 폴더 권한 변경', frozenset({'attrib', 'takeown', 'icacls', 'cacls'}),
+         lambda args: any(map(is_critical_windows_path, args))),
+    # PowerShell
+    Rule('디스크 포맷/파티션', frozenset({'format-volume', 'clear-disk', 'remove-partition', 'initialize-disk'}), _always),
+    Rule('시스템 종료/재시작', frozenset({'stop-computer', 'restart-computer'}), _always),
+    Rule('드라이브/시스템 폴더 삭제', frozenset({'remove-item', 'ri'}),
+         lambda args: is_recursive(args) and any(map(is_critical_path, args))),
+)
+
+
+class CommandPolicy:
+    """위험한 명령어 판정 엔진
+
+    명령어를 shlex로 토큰화해 파이프, ;, &&, 서브셸, 명령 치환 단위로 나누고
+    (sudo/env 같은 래퍼와 sh -c, cmd /c, powershell -Command 안쪽까지 풀어서)
+    각 단순 명령의 프로그램과 인자(argv)에 규칙을 적용한다. 같은 명령어가 반복해서
+    들어오므로 판정 결과는 LRU로 캐시한다.
+    """
+
+    # 중첩 셸(sh -c "sh -c ...") 최대 깊이
+    MAX_DEPTH = 4
+
+    def __init__(self, rules: Tuple[Rule, ...] = RULES, cache_size: int = None):
+        self.rules = rules
+        self._rules_by_program: Dict[str, List[Rule]] = {}
+        for rule in rules:
+            for program in rule.programs:
+                self._rules_by_program.setdefault(program, []).append(rule)
+        # 규칙 대상 프로그램 이름이나 /dev/ 가 아예 없으면 토큰화할 필요 없음 (대부분의 일상 명령어)
+        programs = sorted({program for rule in rules for program in rule.programs}, key=len, reverse=True)
+        self._trigger = re.compile(r'(?<![\w-])(?:' + '|'.join(map(re.escape, programs)) + r')(?![\w-])|/dev/', re.I)
+        self.cache_size = cache_size or getattr(settings, 'COMMAND_POLICY_CACHE_SIZE', 2048)
+        self._cached_evaluate = lru_cache(maxsize=self.cache_size)(self._evaluate)
+
+    def evaluate(self, command: str) -> Verdict:
+        """명령어 판정 (캐시 사용)"""
+        return self._cached_evaluate(command or '')
+
+    def is_dangerous(self, command: str) -> bool:
+        return self.evaluate(command).dangerous
+
+    def _evaluate(self, command: str, depth: int = 0) -> Verdict:
+        if not command.strip():
+            return SAFE
+        if FORK_BOMB.search(command):
+            return Verdict(True, '포크 폭탄', command.strip())
+        # 따옴표로 끊어 쓴 이름(r''m)도 걸리도록 따옴표를 뗀 문자열로 확인
+        if not self._trigger.search(command.replace('"', '').replace("'", '')):
+            return SAFE
+
+        for segment in self.segments(command):
+            verdict = self._check_segment(segment, depth)
+            if verdict.dangerous:
+                return verdict
+        return SAFE
+
+    def _check_segment(self, segment: Segment, depth: int) -> Verdict:
+        for target in segment.redirects:
+            if is_device(target):
+                return Verdict(True, '장치 파일 덮어쓰기', f"{segment.text()} > {target}")
+
+        nested = self._nested_command(segment)
+        if nested is not None:
+            if depth >= self.MAX_DEPTH:
+                return Verdict(True, '과도한 셸 중첩', segment.text())
+            verdict = self._evaluate(nested, depth + 1)
+            if verdict.dangerous:
+                return verdict
+
+        # mkfs.ext4 처럼 점 뒤에 변형 이름이 붙는 프로그램은 앞부분 규칙도 적용
+        rules = self._rules_by_program.get(segment.program) or self._rules_by_program.get(segment.program.split('.')[0], ())
+        for rule in rules:
+            if rule.matches(segment.args):
+                return Verdict(True, rule.name, segment.text())
+        return SAFE
+
+    def _nested_command(self, segment: Segment) -> Optional[str]:
+        """sh -c "...", cmd /c ..., powershell -Command ..., eval ... 의 안쪽 명령"""
+        program, args = segment.program, segment.args
+        lowered = _lower(args)
+        if program in SHELLS and '-c' in args:
+            index = args.index('-c') + 1
+            return args[index] if index < len(args) else ''
+        if program == 'cmd':
+            for flag in ('/c', '/k'):
+                if flag in lowered:
+                    return ' '.join(args[lowered.index(flag) + 1:])
+        if program in POWERSHELLS:
+            for flag in ('-command', '-c'):
+                if flag in lowered:
+                    return ' '.join(args[lowered.index(flag) + 1:])
+        if program in ('eval', 'invoke-expression', 'iex'):
+            return ' '.join(args)
+        return None
+
+    def segments(self, command: str) -> List[Segment]:
+        """셸 연산자 기준으로 나눈 단순 명령 목록 (래퍼, 환경 변수 지정, 리다이렉션 제거)"""
+        segments = []
+        argv: List[str] = []
+        redirects: List[str] = []
+        pending_redirect = None
+        for token in self._tokens(command):
+            if pending_redirect is not None:
+                if pending_redirect in OUTPUT_REDIRECTS:
+                    redirects.append(token)
+                pending_redirect = None
+                continue
+            if token in SEPARATORS:
+                self._flush(argv, redirects, segments)
+                argv, redirects = [], []
+            elif token in OUTPUT_REDIRECTS or token in INPUT_REDIRECTS:
+                if argv and argv[-1].isdigit():
+                    argv.pop()  # 2> 의 파일 디스크립터 번호
+                pending_redirect = token
+            else:
+                argv.append(token)
+        self._flush(argv, redirects, segments)
+        return segments
+
+    @staticmethod
+    def _tokens(command: str) -> List[str]:
+        # 줄바꿈은 ;, 명령 치환(`...`)은 구분자로 취급
+        source = command.replace('\r', '').replace('\n', ' ; ').replace('`', ' ` ')
+        lexer = shlex.shlex(source, posix=True, punctuation_chars=True)
+        lexer.whitespace_split = True
+        lexer.escape = ''  # Windows 경로의 \ 를 그대로 둠
+        try:
+            return list(lexer)
+        except ValueError:
+            # 따옴표가 닫히지 않은 경우 - 공백/연산자 기준으로 보수적으로 나눔
+            return re.findall(r'&&|\|\||[;&|()<>`$]|[^\s;&|()<>`$]+', source)
+
+    def _flush(self, argv: List[str], redirects: List[str], segments: List[Segment]):
+        argv = self._unwrap(argv)
+        if argv or redirects:
+            program = normalize_program(argv[0]) if argv else ''
+            segments.append(Segment(program, tuple(argv[1:]), tuple(redirects)))
+
+    @staticmethod
+    def _unwrap(argv: List[str]) -> List[str]:
+        """셸 예약어, VAR=값, sudo -u root, timeout 10 같은 앞부분을 걷어 내고 실제 명령부터"""
+        index = 0
+        while index < len(argv):
+            token = argv[index]
+            if token in SHELL_KEYWORDS:
+                index += 1
+                continue
+            if token in LOOP_HEADERS:
+                return []
+            if '=' in token and not token.startswith(('-', '=')) and re.match(r'^[A-Za-z_]\w*=', token):
+                index += 1
+                continue
+            wrapper = WRAPPERS.get(normalize_program(token))
+            if wrapper is None:
+                break
+            options_with_value, positional = wrapper
+            index += 1
+            while index < len(argv) and argv[index].startswith('-'):
+                index += 2 if argv[index] in options_with_value else 1
+            index += positional
+        return argv[index:]
+
+    def stats(self) -> Dict[str, Any]:
+        info = self._cached_evaluate.cache_info()
+        total = info.hits + info.misses
+        return {
+            'rules': len(self.rules),
+            'cached': info.currsize,
+            'cache_size': self.cache_size,
+            'hits': info.hits,
+            'misses': info.misses,
+            'hit_rate': round(info.hits / total, 3) if total else 0.0
+        }
+
+
+_command_policy = None
+_command_policy_lock = threading.Lock()
+
+
+def get_command_policy() -> CommandPolicy:
+    """프로세스 전역 명령어 판정 엔진 반환"""
+    global _command_policy
+    if _command_policy is None:
+        with _command_policy_lock:
+            if _command_policy is None:
+                _command_policy = CommandPolicy()
+    return _command_policy
+
+
+def is_dangerous_command(command: str) -> bool:
+    """위험한 명령어 체크 - 서비스 인스턴스 없이 호출 가능 (AI 응답 단계에서 사용)"""
+    return get_command_policy().is_dangerous(command)
@@ -1,29 +1,195 @@
 import os
+import select
 import subprocess
 import time
 import json
+import codecs
+import asyncio
 import logging
 import threading
 import platform
-from typing import Dict, List, Optional, Generator
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import ContextManager, Dict, List, Optional, Generator, AsyncGenerator
 from django.conf import settings
+from django.db import close_old_connections
+from asgiref.sync import sync_to_async
 import paramiko
 
-# Windows 호환성을 위한 조건부 import
-try:
-    import pexpect
-    from pexpect import pxssh
-    PEXPECT_AVAILABLE = True
-except ImportError:
-    # Windows 환경에서는 pexpect 사용 불가
-    PEXPECT_AVAILABLE = False
-    pexpect = None
-    pxssh = None
+from .command_policy import is_dangerous_command
+from .shell_channels import ShellUnavailable, get_shell_channels, open_shell_channel
+from .ssh_pool import get_ssh_pool
 
 from chatbot.models import XShellSession, CommandHistory
+from chatbot.write_behind import get_write_behind_queue
 
 logger = logging.getLogger('xshell_chatbot')
 
+STREAM_READ_SIZE = 4096
+CHANNEL_READ_SIZE = 32768
+
+
+def _drain_channel(channel: paramiko.Channel, max_output: int, timeout: float) -> Dict[str, any]:
+    """SSH 채널의 stdout/stderr를 동시에 큰 청크로 읽음
+
+    한쪽 스트림만 읽다가 다른 쪽 창이 가득 차 멈추는 일이 없도록 둘 다 비우고,
+    max_output 바이트를 넘는 출력은 계속 읽어 버리되 메모리에는 쌓지 않는다.
+    """
+    buffers = {'stdout': bytearray(), 'stderr': bytearray()}
+    truncated = False
+    deadline = time.monotonic() + timeout
+    
+    def keep(name: str, data: bytes):
+        nonlocal truncated
+        room = max_output - len(buffers['stdout']) - len(buffers['stderr'])
+        if len(data) > room:
+            truncated = True
+            data = data[:max(room, 0)]
+        buffers[name] += data
+    
+    while True:
+        received = False
+        if channel.recv_ready():
+            keep('stdout', channel.recv(CHANNEL_READ_SIZE))
+            received = True
+        if channel.recv_stderr_ready():
+            keep('stderr', channel.recv_stderr(CHANNEL_READ_SIZE))
+            received = True
+        
+        if received:
+            continue
+        if channel.exit_status_ready() and not channel.recv_ready() and not channel.recv_stderr_ready():
+            break
+        if channel.eof_received and channel.closed:
+            break
+        if time.monotonic() > deadline:
+            channel.close()
+            raise Exception(f"명령어 실행 시간이 초과되었습니다 ({timeout}초)")
+        
+        # 새 데이터나 종료 이벤트가 올 때까지 대기
+        select.select([channel], [], [], 0.1)
+    
+    return {
+        'stdout': bytes(buffers['stdout']),
+        'stderr': bytes(buffers['stderr']),
+        'exit_code': channel.recv_exit_status(),
+        'truncated': truncated
+    }
+
+
+def _stream_channel(channel: paramiko.Channel, encoding: str = 'utf-8',
+                    stop: threading.Event = None) -> Generator[str, None, None]:
+    """SSH 채널 출력을 받는 즉시 줄 단위로 반환 - 명령어 종료(exit status)까지
+
+    받을 데이터가 없으면 select로 새 데이터나 종료 이벤트를 기다리므로 출력 사이의
+    지연이 없다. 소비자가 중단하거나 stop이 설정되면 (출력이 없는 명령이라도 select
+    주기 안에) 채널을 닫아 원격 명령도 끝낸다.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    pending = ''
+    
+    try:
+        while True:
+            if channel.recv_ready():
+                data = channel.recv(CHANNEL_READ_SIZE)
+                if data:
+                    pending += decoder.decode(data)
+                    *lines, pending = pending.split('\n')
+                    for line in lines:
+                        yield line.rstrip('\r')
+                    continue
+            if channel.exit_status_ready() and not channel.recv_ready():
+                break
+            if channel.eof_received and channel.closed:
+                break
+            if stop is not None and stop.is_set():
+                return
+            select.select([channel], [], [], 0.1)
+        
+        pending += decoder.decode(b'', final=True)
+        if pending:
+            yield pending.rstrip('\r')
+        
+        exit_code = channel.recv_exit_status()
+        if exit_code != 0:
+            yield f"\n명령어가 오류 코드 {exit_code}로 종료되었습니다."
+            
+    finally:
+        channel.close()
+
+
+async def _stream_process_output(process: asyncio.subprocess.Process, encoding: str) -> AsyncGenerator[str, None]:
+    """asyncio 서브프로세스 출력을 줄 단위로 반환 - 이벤트 루프를 막지 않음
+
+    취소되거나 소비자가 중단하면 프로세스를 종료한다.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    pending = ''
+    
+    try:
+        while True:
+            data = await process.stdout.read(STREAM_READ_SIZE)
+            if not data:
+                break
+            
+            pending += decoder.decode(data)
+            *lines, pending = pending.split('\n')
+            for line in lines:
+                yield line.rstrip('\r')
+        
+        pending += decoder.decode(b'', final=True)
+        if pending:
+            yield pending.rstrip('\r')
+        
+        await process.wait()
+        if process.returncode != 0:
+            yield f"\n명령어가 오류 코드 {process.returncode}로 종료되었습니다."
+            
+    finally:
+        if process.returncode is None:
+            try:
+                process.kill()
+            except ProcessLookupError:
+                pass
+            await process.wait()
+
+
+async def _iterate_in_thread(generator: Generator, stop: threading.Event = None) -> AsyncGenerator:
+    """블로킹 동기 제너레이터를 스레드에서 돌리고 결과를 비동기로 전달 (예외는 그대로 전파)
+
+    소비자가 중단하면 stop을 설정한다 - 출력 없이 대기하는 제너레이터는 같은 stop을
+    받아 직접 확인해야 스레드가 바로 끝난다.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    done = object()
+    stop = stop or threading.Event()
+    
+    def pump():
+        try:
+            for item in generator:
+                if stop.is_set():
+                    break
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, e)
+        finally:
+            generator.close()
+            close_old_connections()
+            loop.call_soon_threadsafe(queue.put_nowait, done)
+    
+    loop.run_in_executor(None, pump)
+    try:
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # 스레드는 다음 출력을 읽거나 stop을 확인한 뒤 스스로 종료
+        stop.set()
+
 
 class WindowsShellService:
     """Windows 기본 Shell 서비스"""
@@ -191,26 +357,41 @@ class WindowsShellService:
         except Exception as e:
             yield f"Error: {str(e)}"
     
+    async def aexecute_command_stream(self, command: str, shell_type: str = None) -> AsyncGenerator[str, None]:
+        """비동기 스트리밍 방식으로 Windows 명령어 실행"""
+        if not self.is_windows:
+            yield "Windows가 아닌 환경에서는 Windows Shell을 사용할 수 없습니다."
+            return
+        
+        shell_type = shell_type or self.shell_type
+        
+        if self.is_dangerous_command(command):
+            yield f"보안상 위험한 명령어는 실행할 수 없습니다: {command}"
+            return
+        
+        try:
+            if shell_type.lower() == 'powershell':
+                cmd = ['powershell', '-Command', command]
+                encoding = 'utf-8'
+            else:
+                cmd = ['cmd', '/c', command]
+                encoding = 'cp949'
+            
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT
+            )
+        except Exception as e:
+            yield f"Error: {str(e)}"
+            return
+        
+        async for line in _stream_process_output(process, encoding):
+            yield line
+    
     def is_dangerous_command(self, command: str) -> bool:
         """Windows 위험한 명령어 체크"""
-        dangerous_patterns = [
-            'format c:',
-            'del c:\\',
-            'rmdir /s c:',
-            'rd /s c:',
-            'diskpart',
-            'shutdown /r /f',
-            'shutdown /s /f',
-            'net user administrator',
-            'reg delete hklm',
-            'bcdedit',
-            'attrib -r -s -h c:\\',
-            'takeown /f c:\\',
-            'icacls c:\\ /grant',
-        ]
-        
-        command_lower = command.lower()
-        return any(pattern in command_lower for pattern in dangerous_patterns)
+        return is_dangerous_command(command)
 
 
 class XShellService:
@@ -219,12 +400,13 @@ class XShellService:
     def __init__(self):
         self.xshell_path = getattr(settings, 'XSHELL_PATH', '')
         self.sessions_path = getattr(settings, 'XSHELL_SESSIONS_PATH', '')
-        self.active_connections = {}  # 활성 SSH 연결 저장
+        self.ssh_pool = get_ssh_pool()  # 프로세스 전역 SSH 연결 풀
         self.is_windows = platform.system().lower() == 'windows'
         self.windows_shell = WindowsShellService() if self.is_windows else None
         
-    def execute_command(self, command: str, session_name: str = 'default', shell_type: str = None) -> Dict[str, any]:
-        """명령어 실행 - 자동으로 적절한 shell 선택"""
+    def execute_command(self, command: str, session_name: str = 'default', shell_type: str = None,
+                        chat_session_id: str = None) -> Dict[str, any]:
+        """명령어 실행 - 자동으로 적절한 shell 선택 (chat_session_id가 있으면 원격 셸 상태 유지)"""
         
         try:
             # Windows 로컬 실행인지 확인
@@ -247,7 +429,7 @@ class XShellService:
                     return self.execute_local_command(command)
             
             # SSH 연결을 통한 원격 실행
-            return self.execute_remote_command(command, xshell_session)
+            return self.execute_remote_command(command, xshell_session, chat_session_id=chat_session_id)
             
         except Exception as e:
             logger.error(f"명령어 실행 실패: {e}")
@@ -316,58 +498,88 @@ class XShellService:
                 'execution_time': time.time() - start_time
             }
     
-    def execute_remote_command(self, command: str, xshell_session: XShellSession) -> Dict[str, any]:
-        """원격 SSH 명령어 실행"""
+    def execute_remote_command(self, command: str, xshell_session: XShellSession, combine_stderr: bool = None,
+                               save_history: bool = True, chat_session_id: str = None) -> Dict[str, any]:
+        """원격 SSH 명령어 실행
+
+        chat_session_id가 주어지면 (채팅 세션, XShell 세션)별로 계속 열어 둔 셸에서 실행해
+        cd, export 등이 다음 명령어에도 이어진다. 없으면 명령어마다 exec 채널을 연다.
+        """
         
         start_time = time.time()
+        if combine_stderr is None:
+            combine_stderr = getattr(settings, 'SSH_COMBINE_STDERR', False)
+        max_output = getattr(settings, 'SSH_MAX_OUTPUT_BYTES', 1024 * 1024)
         
         try:
-            # SSH 연결 가져오기 또는 생성
-            ssh_client = self.get_ssh_connection(xshell_session)
-            
-            if not ssh_client:
-                return {
-                    'success': False,
-                    'output': f'SSH 연결에 실패했습니다: {xshell_session.host}',
-                    'error': 'SSH connection failed',
-                    'exit_code': -1,
-                    'execution_time': 0
+            # SSH 연결 가져오기 또는 생성 (블록이 끝날 때까지 풀에서 정리되지 않음)
+            with self.get_ssh_connection(xshell_session) as ssh_client:
+                if not ssh_client:
+                    return {
+                        'success': False,
+                        'output': f'SSH 연결에 실패했습니다: {xshell_session.host}',
+                        'error': 'SSH connection failed',
+                        'exit_code': -1,
+                        'execution_time': 0
+                    }
+                
+                connection_key = (xshell_session.host, xshell_session.port, xshell_session.username)
+                result = None
+                if chat_session_id and getattr(settings, 'SSH_PERSISTENT_SHELL', True):
+                    try:
+                        result = get_shell_channels().run(
+                            (str(chat_session_id), xshell_session.name) + connection_key,
+                            lambda: open_shell_channel(ssh_client), command, timeout=30, max_output=max_output
+                        )
+                        # PTY는 stdout/stderr를 구분하지 않음
+                        result['stdout'], result['stderr'] = result.pop('output'), b''
+                    except ShellUnavailable as e:
+                        logger.info(f"원격 셸을 사용할 수 없어 exec 채널로 실행: {e}")
+                
+                if result is None:
+                    # 명령어 실행
+                    channel = ssh_client.get_transport().open_session(timeout=10)
+                    try:
+                        if combine_stderr:
+                            channel.set_combine_stderr(True)
+                        channel.exec_command(command)
+                        
+                        # 결과 읽기 (stdout/stderr 동시)
+                        result = _drain_channel(channel, max_output, timeout=30)
+                    finally:
+                        channel.close()
+                
+                exit_code = result['exit_code']
+                execution_time = time.time() - start_time
+                
+                # 정상적으로 왕복했으므로 다음 요청은 별도 확인 없이 재사용
+                self.ssh_pool.mark_alive(connection_key)
+                
+                output = result['stdout'].decode('utf-8', errors='replace').rstrip('\n')
+                error = result['stderr'].decode('utf-8', errors='replace').rstrip('\n')
+                if result['truncated']:
+                    output += f"\n... (출력이 {max_output}바이트를 넘어 잘렸습니다)"
+                
+                # 히스토리 저장
+                if save_history:
+                    self.save_command_history(xshell_session, command, output, exit_code, execution_time)
+                
+                response = {
+                    'success': exit_code == 0,
+                    'output': output + ('\n' + error if error else ''),
+                    'error': error if exit_code != 0 else '',
+                    'exit_code': exit_code,
+                    'execution_time': execution_time
                 }
-            
-            # 명령어 실행
-            stdin, stdout, stderr = ssh_client.exec_command(command, timeout=30)
-            
-            # 결과 읽기
-            output_lines = []
-            error_lines = []
-            
-            # stdout 읽기
-            for line in stdout:
-                output_lines.append(line.rstrip('\n'))
-            
-            # stderr 읽기
-            for line in stderr:
-                error_lines.append(line.rstrip('\n'))
-            
-            exit_code = stdout.channel.recv_exit_status()
-            execution_time = time.time() - start_time
-            
-            output = '\n'.join(output_lines)
-            error = '\n'.join(error_lines)
-            
-            # 히스토리 저장
-            self.save_command_history(xshell_session, command, output, exit_code, execution_time)
-            
-            return {
-                'success': exit_code == 0,
-                'output': output + ('\n' + error if error else ''),
-                'error': error if exit_code != 0 else '',
-                'exit_code': exit_code,
-                'execution_time': execution_time
-            }
+                if result.get('cwd'):
+                    response['cwd'] = result['cwd']
+                return response
             
         except Exception as e:
             logger.error(f"원격 명령어 실행 실패: {e}")
+            if isinstance(e, (paramiko.SSHException, OSError)):
+                # 끊어진 연결을 다음 요청에서 재사용하지 않도록 제거
+                self.ssh_pool.discard((xshell_session.host, xshell_session.port, xshell_session.username))
             return {
                 'success': False,
                 'output': f'원격 명령어 실행 중 오류가 발생했습니다: {str(e)}',
@@ -376,6 +588,97 @@ class XShellService:
                 'execution_time': time.time() - start_time
             }
     
+    def execute_command_multi(self, command: str, session_names: List[str],
+                              max_concurrency: int = None) -> Generator[Dict[str, any], None, None]:
+        """여러 XShell 세션에 같은 명령어를 병렬 실행 - 끝나는 순서대로 호스트별 결과 반환
+
+        동시 실행 수는 max_concurrency(기본 XSHELL_FANOUT_CONCURRENCY)로 제한하고,
+        히스토리는 모든 호스트가 끝난 뒤 한 번의 bulk_create로 저장한다.
+        """
+        max_concurrency = max_concurrency or getattr(settings, 'XSHELL_FANOUT_CONCURRENCY', 10)
+        
+        sessions = {}
+        for xshell_session in XShellSession.objects.filter(name__in=session_names):
+            sessions.setdefault(xshell_session.name, xshell_session)
+        
+        for name in session_names:
+            if name not in sessions:
+                yield {
+                    'session_name': name,
+                    'host': None,
+                    'success': False,
+                    'output': f'세션을 찾을 수 없습니다: {name}',
+                    'error': 'Session not found',
+                    'exit_code': -1,
+                    'execution_time': 0
+                }
+        
+        if not sessions:
+            return
+        
+        if self.is_dangerous_command(command):
+            for name, xshell_session in sessions.items():
+                yield {
+                    'session_name': name,
+                    'host': xshell_session.host,
+                    'success': False,
+                    'output': f'보안상 위험한 명령어는 실행할 수 없습니다: {command}',
+                    'error': 'Dangerous command blocked',
+                    'exit_code': -1,
+                    'execution_time': 0
+                }
+            return
+        
+        def run(xshell_session: XShellSession) -> Dict[str, any]:
+            try:
+                return self.execute_remote_command(command, xshell_session, save_history=False)
+            finally:
+                # 워커 스레드에서 연 DB 연결 정리
+                close_old_connections()
+        
+        history = []
+        executor = ThreadPoolExecutor(max_workers=min(max_concurrency, len(sessions)), thread_name_prefix='xshell-fanout')
+        try:
+            futures = {executor.submit(run, xshell_session): xshell_session for xshell_session in sessions.values()}
+            
+            for future in as_completed(futures):
+                xshell_session = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {
+                        'success': False,
+                        'output': f'원격 명령어 실행 중 오류가 발생했습니다: {str(e)}',
+                        'error': str(e),
+                        'exit_code': -1,
+                        'execution_time': 0
+                    }
+                
+                if result.get('error') != 'SSH connection failed':
+                    history.append(CommandHistory(
+                        xshell_session=xshell_session,
+                        command=command,
+                        result=result['output'],
+                        exit_code=result['exit_code'],
+                        execution_time=result['execution_time']
+                    ))
+                
+                yield {'session_name': xshell_session.name, 'host': xshell_session.host, **result}
+        finally:
+            # 중간에 소비가 중단되어도 이미 끝난 결과는 저장
+            executor.shutdown(wait=False, cancel_futures=True)
+            if history:
+                try:
+                    CommandHistory.objects.bulk_create(history)
+                except Exception as e:
+                    logger.error(f"명령어 히스토리 일괄 저장 실패: {e}")
+    
+    async def aexecute_command_multi(self, command: str, session_names: List[str],
+                                     max_concurrency: int = None) -> AsyncGenerator[Dict[str, any], None]:
+        """execute_command_multi의 비동기 버전 (워커 스레드에서 실행)"""
+        async for result in _iterate_in_thread(self.execute_command_multi(command, session_names, max_concurrency)):
+            yield result
+    
     def execute_command_stream(self, command: str, session_name: str = 'default', shell_type: str = None) -> Generator[str, None, None]:
         """스트리밍 방식으로 명령어 실행 (실시간 출력)"""
         
@@ -443,83 +746,95 @@ class XShellService:
         except Exception as e:
             yield f"Error: {str(e)}"
     
-    def execute_remote_command_stream(self, command: str, xshell_session: XShellSession) -> Generator[str, None, None]:
-        """원격 SSH 명령어 스트리밍 실행"""
+    async def aexecute_command_stream(self, command: str, session_name: str = 'default', shell_type: str = None) -> AsyncGenerator[str, None]:
+        """비동기 스트리밍 명령어 실행 - 이벤트 루프를 막지 않음
+
+        로컬 명령은 asyncio 서브프로세스로, 원격 명령은 기존 동기 스트림을
+        워커 스레드에서 실행해 출력만 루프로 넘긴다.
+        """
+        xshell_session = None
+        if session_name not in ('default', 'local'):
+            try:
+                xshell_session = await sync_to_async(self.get_xshell_session)(session_name)
+            except Exception as e:
+                yield f"Error: {str(e)}"
+                return
+        
+        if xshell_session:
+            # 취소되면 출력이 없는 명령이라도 채널을 닫도록 stop을 스트림까지 전달
+            stop = threading.Event()
+            async for line in _iterate_in_thread(self.execute_remote_command_stream(command, xshell_session, stop), stop):
+                yield line
+        elif self.is_windows:
+            async for line in self.windows_shell.aexecute_command_stream(command, shell_type):
+                yield line
+        else:
+            async for line in self.aexecute_local_command_stream(command):
+                yield line
+    
+    async def aexecute_local_command_stream(self, command: str) -> AsyncGenerator[str, None]:
+        """로컬 명령어 비동기 스트리밍 실행 (Linux/macOS)"""
+        if self.is_dangerous_command(command):
+            yield f"보안상 위험한 명령어는 실행할 수 없습니다: {command}"
+            return
+        
+        if self.is_windows:
+            async for line in self.windows_shell.aexecute_command_stream(command):
+                yield line
+            return
         
         try:
-            # Windows에서는 pexpect가 없으므로 기본 SSH 클라이언트 사용
-            if not PEXPECT_AVAILABLE:
-                yield "Windows 환경에서는 실시간 스트리밍이 제한됩니다."
-                yield "기본 명령어 실행을 사용합니다..."
-                
-                # 기본 execute_remote_command 사용
-                result = self.execute_remote_command(command, xshell_session)
-                
-                if result['success']:
-                    # 출력을 줄 단위로 나누어 스트리밍 효과 연출
-                    lines = result['output'].split('\n')
-                    for line in lines:
-                        if line.strip():
-                            yield line
-                        time.sleep(0.1)  # 약간의 지연으로 스트리밍 느낌
-                else:
-                    yield f"Error: {result['error']}"
+            process = await asyncio.create_subprocess_shell(
+                command,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT
+            )
+        except Exception as e:
+            yield f"Error: {str(e)}"
+            return
+        
+        async for line in _stream_process_output(process, 'utf-8'):
+            yield line
+    
+    def execute_remote_command_stream(self, command: str, xshell_session: XShellSession,
+                                      stop: threading.Event = None) -> Generator[str, None, None]:
+        """원격 SSH 명령어 스트리밍 실행 - 풀의 SSH 연결에 exec 채널을 열어 출력을 바로 전달"""
+        
+        connection_key = (xshell_session.host, xshell_session.port, xshell_session.username)
+        try:
+            if self.is_dangerous_command(command):
+                yield f"보안상 위험한 명령어는 실행할 수 없습니다: {command}"
                 return
             
-            # pexpect를 사용한 실시간 SSH 실행 (Linux/macOS에서만)
-            ssh_command = f"ssh {xshell_session.username}@{xshell_session.host}"
-            
-            child = pexpect.spawn(ssh_command)
-            child.logfile = None  # 로그 비활성화
-            
-            # 패스워드 프롬프트 처리 (필요시)
-            index = child.expect(['password:', 'Password:', pexpect.TIMEOUT], timeout=10)
-            
-            if index in [0, 1]:
-                # 패스워드 입력 (실제로는 암호화된 패스워드 복호화 필요)
-                if xshell_session.password_encrypted:
-                    decrypted_password = self.decrypt_password(xshell_session.password_encrypted)
-                    child.sendline(decrypted_password)
-                    child.expect(['$', '#', '>', pexpect.TIMEOUT], timeout=10)
-            
-            # 명령어 실행
-            child.sendline(command)
-            
-            # 실시간 출력 읽기
-            while True:
-                try:
-                    index = child.expect(['\n', pexpect.TIMEOUT], timeout=1)
-                    if index == 0:
-                        output = child.before.decode('utf-8', errors='ignore')
-                        if output.strip():
-                            yield output.strip()
-                    else:
-                        break
-                except pexpect.EOF:
-                    break
-            
-            child.close()
+            # 스트리밍이 끝날 때까지 풀에서 정리되지 않도록 사용 중으로 표시
+            with self.get_ssh_connection(xshell_session) as ssh_client:
+                if not ssh_client:
+                    yield f"Error: SSH 연결에 실패했습니다: {xshell_session.host}"
+                    return
+                
+                channel = ssh_client.get_transport().open_session(timeout=10)
+                # 터미널처럼 stderr도 출력 순서대로 함께 전달
+                channel.set_combine_stderr(True)
+                channel.exec_command(command)
+                
+                yield from _stream_channel(channel, stop=stop)
+                self.ssh_pool.mark_alive(connection_key)
             
         except Exception as e:
+            logger.error(f"원격 명령어 스트리밍 실패: {e}")
+            if isinstance(e, (paramiko.SSHException, OSError)):
+                self.ssh_pool.discard(connection_key)
             yield f"Error: {str(e)}"
     
-    def get_ssh_connection(self, xshell_session: XShellSession) -> Optional[paramiko.SSHClient]:
-        """SSH 연결 가져오기 또는 생성"""
+    def get_ssh_connection(self, xshell_session: XShellSession) -> ContextManager[Optional[paramiko.SSHClient]]:
+        """SSH 연결 가져오기 또는 생성 - with 블록 동안 사용 중으로 표시 (연결 실패 시 None)"""
         
-        connection_key = f"{xshell_session.host}_{xshell_session.username}"
+        connection_key = (xshell_session.host, xshell_session.port, xshell_session.username)
+        return self.ssh_pool.connection(connection_key, lambda: self._connect_ssh(xshell_session))
+    
+    def _connect_ssh(self, xshell_session: XShellSession) -> Optional[paramiko.SSHClient]:
+        """새 SSH 연결 생성 (핸드셰이크 및 인증)"""
         
-        # 기존 연결 확인
-        if connection_key in self.active_connections:
-            ssh_client = self.active_connections[connection_key]
-            try:
-                # 연결 상태 확인
-                ssh_client.exec_command('echo test', timeout=5)
-                return ssh_client
-            except:
-                # 연결이 끊어진 경우 제거
-                del self.active_connections[connection_key]
-        
-        # 새로운 연결 생성
         try:
             ssh_client = paramiko.SSHClient()
             ssh_client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
@@ -548,9 +863,6 @@ class XShellService:
                 logger.error(f"SSH 인증 정보가 없습니다: {xshell_session.name}")
                 return None
             
-            # 연결 저장
-            self.active_connections[connection_key] = ssh_client
-            
             # 세션 상태 업데이트
             xshell_session.is_connected = True
             xshell_session.save()
@@ -600,28 +912,27 @@ class XShellService:
                 'message': f'세션을 찾을 수 없습니다: {session_name}'
             }
         
-        ssh_client = self.get_ssh_connection(xshell_session)
-        
-        if ssh_client:
-            try:
-                # 간단한 테스트 명령어 실행
-                stdin, stdout, stderr = ssh_client.exec_command('whoami', timeout=5)
-                result = stdout.read().decode('utf-8').strip()
-                
-                return {
-                    'success': True,
-                    'message': f'연결 성공: {result}@{xshell_session.host}'
-                }
-            except Exception as e:
+        with self.get_ssh_connection(xshell_session) as ssh_client:
+            if ssh_client:
+                try:
+                    # 간단한 테스트 명령어 실행
+                    stdin, stdout, stderr = ssh_client.exec_command('whoami', timeout=5)
+                    result = stdout.read().decode('utf-8').strip()
+                    
+                    return {
+                        'success': True,
+                        'message': f'연결 성공: {result}@{xshell_session.host}'
+                    }
+                except Exception as e:
+                    return {
+                        'success': False,
+                        'message': f'연결 테스트 실패: {str(e)}'
+                    }
+            else:
                 return {
                     'success': False,
-                    'message': f'연결 테스트 실패: {str(e)}'
+                    'message': f'SSH 연결 실패: {xshell_session.host}'
                 }
-        else:
-            return {
-                'success': False,
-                'message': f'SSH 연결 실패: {xshell_session.host}'
-            }
     
     def interrupt_command(self, session_name: str):
         """실행 중인 명령어 중단"""
@@ -630,52 +941,7 @@ class XShellService:
     
     def is_dangerous_command(self, command: str) -> bool:
         """위험한 명령어 체크 - OS별 위험 명령어 포함"""
-        
-        # Windows 위험한 명령어
-        windows_dangerous = [
-            'format c:',
-            'del c:\\',
-            'rmdir /s c:',
-            'rd /s c:',
-            'diskpart',
-            'shutdown /r /f',
-            'shutdown /s /f',
-            'net user administrator',
-            'reg delete hklm',
-            'bcdedit',
-            'attrib -r -s -h c:\\',
-            'takeown /f c:\\',
-            'icacls c:\\ /grant',
-        ]
-        
-        # Linux/Unix 위험한 명령어
-        unix_dangerous = [
-            'rm -rf /',
-            'dd if=',
-            'mkfs',
-            'fdisk',
-            'format',
-            '> /dev/',
-            'chmod 000',
-            'chown -R',
-            'shutdown',
-            'reboot',
-            'halt',
-            'init 0',
-            'init 6',
-            'rm -rf *',
-            ':(){ :|:& };:',  # Fork bomb
-        ]
-        
-        command_lower = command.lower()
-        
-        # OS별 위험 명령어 체크
-        if self.is_windows:
-            dangerous_patterns = windows_dangerous + unix_dangerous
-        else:
-            dangerous_patterns = unix_dangerous + windows_dangerous
-        
-        return any(pattern in command_lower for pattern in dangerous_patterns)
+        return is_dangerous_command(command)
     
     def encrypt_password(self, password: str) -> str:
         """패스워드 암호화 (간단한 예시)"""
@@ -691,15 +957,15 @@ class XShellService:
     
     def save_command_history(self, xshell_session: XShellSession, command: str, 
                            result: str, exit_code: int, execution_time: float):
-        """명령어 히스토리 저장"""
+        """명령어 히스토리 저장 (쓰기 지연 큐를 통해 일괄 저장)"""
         try:
-            CommandHistory.objects.create(
+            get_write_behind_queue().enqueue(CommandHistory(
                 xshell_session=xshell_session,
                 command=command,
                 result=result,
                 exit_code=exit_code,
                 execution_time=execution_time
-            )
+            ))
         except Exception as e:
             logger.error(f"명령어 히스토리 저장 실패: {e}")
     
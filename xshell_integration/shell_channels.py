@@ -0,0 +1,329 @@
+import re
+import select
+import threading
+import time
+import uuid
+import logging
+from collections import OrderedDict
+from typing import Callable, Dict, Any, Tuple
+
+import paramiko
+from django.conf import settings
+
+logger = logging.getLogger('xshell_chatbot')
+
+ShellKey = Tuple[str, str, str, int, str]  # (채팅 세션 ID, XShell 세션 이름, host, port, username)
+
+CHANNEL_READ_SIZE = 32768
+# PTY 폭 - ps, top 등이 터미널 폭에 맞춰 출력을 자르지 않도록 넉넉하게
+PTY_WIDTH = 512
+PTY_HEIGHT = 48
+# 명령어 종료 표시 (실제 마커는 명령마다 새로 만든 토큰을 붙임)
+SENTINEL_PREFIX = '__XSC_'
+# 종료 표시 줄(마커 + 종료 코드 + 현재 디렉터리)을 찾기 위해 남겨 두는 출력 끝부분 크기
+SENTINEL_WINDOW = 8192
+# 대화형 셸을 명령 실행용으로 설정 - 에코/프롬프트/페이저/히스토리 끄기
+SHELL_INIT = (
+    "stty -echo -onlcr 2>/dev/null; unset PROMPT_COMMAND; PS1=''; PS2=''; unset HISTFILE; "
+    "bind 'set enable-bracketed-paste off' 2>/dev/null; "
+    "export PAGER=cat GIT_PAGER=cat MANPAGER=cat SYSTEMD_PAGER= LESS=-FRX"
+)
+ANSI_ESCAPE = re.compile(rb'\x1b(?:\[[0-9;?]*[ -/]*[@-~]|\][^\x07]*\x07|[()][0-9A-B])')
+# 셸을 쓸 수 없는 서버(POSIX 셸이 아닌 경우 등)는 이 시간 동안 exec 채널만 사용
+UNSUPPORTED_RETRY_SECONDS = 600
+
+
+class ShellUnavailable(Exception):
+    """대화형 셸을 열거나 초기화하지 못함 - 호출 측은 exec 채널로 실행"""
+
+
+def open_shell_channel(ssh_client: paramiko.SSHClient) -> paramiko.Channel:
+    """PTY가 붙은 대화형 셸 채널 열기"""
+    channel = ssh_client.get_transport().open_session(timeout=10)
+    channel.get_pty(term='dumb', width=PTY_WIDTH, height=PTY_HEIGHT)
+    channel.invoke_shell()
+    return channel
+
+
+class ShellChannel:
+    """계속 열려 있는 원격 셸 하나 - 명령어는 차례로 실행되고 cd, export 등 상태가 유지됨
+
+    명령어 뒤에 매번 새 토큰으로 만든 종료 표시(printf 마커, $?, $PWD)를 보내고
+    출력에서 그 줄이 나올 때까지 읽는다. 명령어는 { ...; } </dev/null 로 감싸
+    표준 입력을 읽는 프로그램이 종료 표시 줄을 가져가지 않게 한다.
+    PTY는 stdout/stderr를 구분하지 않으므로 출력은 합쳐서 돌려준다.
+    """
+
+    def __init__(self, channel, init_timeout: float = 10):
+        self.channel = channel
+        self.lock = threading.Lock()
+        self.created_at = self.last_used = time.monotonic()
+        self.commands = 0
+        self.cwd = ''
+        self.broken = False
+
+        try:
+            self.channel.send((SHELL_INIT + '\n').encode('utf-8'))
+            # 로그인 메시지와 첫 프롬프트는 버림
+            self._read_until(self._send_sentinel(), init_timeout, 64 * 1024)
+        except Exception as e:
+            self.close()
+            raise ShellUnavailable(f"원격 셸 초기화 실패: {e}")
+
+    def alive(self) -> bool:
+        if self.broken or self.channel.closed:
+            return False
+        transport = getattr(self.channel, 'transport', None)
+        return transport is None or transport.is_active()
+
+    def _send_sentinel(self) -> bytes:
+        token = uuid.uuid4().hex
+        # 마커를 두 조각으로 보내 명령줄이 에코되더라도 종료 표시로 오인하지 않음
+        self.channel.send(
+            f"printf '\\n%s%s %d %s\\n' '{SENTINEL_PREFIX}' '{token}__' \"$?\" \"$PWD\"\n".encode('utf-8')
+        )
+        return f"{SENTINEL_PREFIX}{token}__".encode('utf-8')
+
+    def run(self, command: str, timeout: float, max_output: int) -> Dict[str, Any]:
+        """명령어 실행 후 {'output', 'exit_code', 'cwd', 'truncated'} 반환 (실패하면 셸은 폐기 대상)"""
+        with self.lock:
+            try:
+                self.channel.send(f"{{ {command.strip()}\n}} </dev/null\n".encode('utf-8'))
+                result = self._read_until(self._send_sentinel(), timeout, max_output)
+            except Exception:
+                self.broken = True
+                raise
+            finally:
+                self.last_used = time.monotonic()
+            self.commands += 1
+            self.cwd = result['cwd']
+            return result
+
+    def _read_until(self, marker: bytes, timeout: float, max_output: int) -> Dict[str, Any]:
+        pattern = re.compile(rb'\r?\n' + re.escape(marker) + rb' (-?\d+) ([^\r\n]*)\r?\n')
+        output = bytearray()
+        window = bytearray()
+        truncated = False
+        deadline = time.monotonic() + timeout
+
+        def keep(data: bytes):
+            nonlocal truncated
+            room = max_output - len(output)
+            if len(data) > room:
+                truncated = True
+                data = data[:max(room, 0)]
+            output.extend(data)
+
+        while True:
+            if self.channel.recv_ready():
+                chunk = self.channel.recv(CHANNEL_READ_SIZE)
+                if not chunk:
+                    raise Exception("원격 셸이 종료되었습니다")
+                window += chunk
+                match = pattern.search(window)
+                if match:
+                    keep(window[:match.start()])
+                    return {
+                        'output': ANSI_ESCAPE.sub(b'', bytes(output)).replace(b'\r\n', b'\n'),
+                        'exit_code': int(match.group(1)),
+                        'cwd': match.group(2).decode('utf-8', errors='replace'),
+                        'truncated': truncated
+                    }
+                # 종료 표시가 걸쳐 있을 수 있는 끝부분만 남기고 출력으로 옮김
+                excess = len(window) - SENTINEL_WINDOW
+                if excess > 0:
+                    keep(window[:excess])
+                    del window[:excess]
+                continue
+
+            if self.channel.closed or self.channel.exit_status_ready():
+                raise Exception("원격 셸이 종료되었습니다")
+            if time.monotonic() > deadline:
+                try:
+                    self.channel.send(b'\x03')  # 실행 중인 명령 중단
+                except Exception:
+                    pass
+                raise Exception(f"명령어 실행 시간이 초과되었습니다 ({timeout}초)")
+
+            # 새 데이터가 올 때까지 대기
+            select.select([self.channel], [], [], 0.1)
+
+    def close(self):
+        try:
+            self.channel.close()
+        except Exception:
+            pass
+
+
+class ShellChannelManager:
+    """(채팅 세션, XShell 세션)별 지속 셸 채널 관리 (프로세스 전역, 스레드 안전, LRU)
+
+    같은 채팅에서 같은 서버로 보내는 명령어는 하나의 셸에서 차례로 실행되어
+    채널/셸 시작 비용이 없고 현재 디렉터리와 환경 변수가 이어진다. idle_timeout
+    동안 쓰지 않은 셸은 백그라운드 스레드가 닫는다.
+    """
+
+    def __init__(self, idle_timeout: float = None, max_channels: int = None, init_timeout: float = None):
+        self.idle_timeout = idle_timeout or getattr(settings, 'SSH_SHELL_IDLE_TIMEOUT', 300)
+        self.max_channels = max_channels or getattr(settings, 'SSH_SHELL_MAX_CHANNELS', 50)
+        self.init_timeout = init_timeout or getattr(settings, 'SSH_SHELL_INIT_TIMEOUT', 10)
+        self._channels: 'OrderedDict[ShellKey, ShellChannel]' = OrderedDict()
+        self._unsupported: Dict[tuple, float] = {}  # (host, port, username) -> 다시 시도할 시각
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._reaper = None
+        self.opened = 0
+        self.reused = 0
+        self.reaped = 0
+        self.failures = 0
+
+    def run(self, key: ShellKey, open_channel: Callable[[], Any], command: str,
+            timeout: float, max_output: int) -> Dict[str, Any]:
+        """key의 셸에서 명령어 실행 (없거나 끊겼으면 open_channel()로 새로 열기)"""
+        shell = self._get(key, open_channel)
+        try:
+            return shell.run(command, timeout, max_output)
+        except Exception:
+            # 시간 초과 등으로 셸 상태를 알 수 없음 - 다음 명령은 새 셸에서
+            self._drop(key, shell)
+            raise
+
+    def _get(self, key: ShellKey, open_channel: Callable[[], Any]) -> ShellChannel:
+        connection_key = key[2:]
+        with self._lock:
+            shell = self._channels.get(key)
+            if shell is not None and not shell.alive():
+                del self._channels[key]
+                shell.close()
+                shell = None
+            if shell is not None:
+                self._channels.move_to_end(key)
+                self.reused += 1
+                return shell
+            if self._unsupported.get(connection_key, 0) > time.monotonic():
+                raise ShellUnavailable("이 서버에서는 대화형 셸을 사용할 수 없습니다")
+
+        try:
+            shell = ShellChannel(open_channel(), self.init_timeout)
+        except Exception as e:
+            with self._lock:
+                self.failures += 1
+                if isinstance(e, ShellUnavailable):
+                    self._unsupported[connection_key] = time.monotonic() + UNSUPPORTED_RETRY_SECONDS
+            raise e if isinstance(e, ShellUnavailable) else ShellUnavailable(str(e))
+
+        with self._lock:
+            existing = self._channels.get(key)
+            if existing is not None and existing.alive():
+                # 동시에 두 요청이 셸을 연 경우 - 먼저 등록된 것을 사용
+                shell.close()
+                return existing
+            self._channels[key] = shell
+            self.opened += 1
+            self._enforce_max_size_locked()
+        self._ensure_reaper()
+        logger.debug(f"원격 셸 채널 생성: {key[4]}@{key[2]}:{key[3]} (채팅 {key[0]})")
+        return shell
+
+    def _drop(self, key: ShellKey, shell: ShellChannel):
+        with self._lock:
+            if self._channels.get(key) is shell:
+                del self._channels[key]
+        shell.close()
+
+    def _enforce_max_size_locked(self):
+        # 가장 오래 사용되지 않은 셸부터 정리 (명령 실행 중인 셸은 건너뜀)
+        for key in list(self._channels.keys()):
+            if len(self._channels) <= self.max_channels:
+                break
+            shell = self._channels[key]
+            if not shell.lock.acquire(blocking=False):
+                continue
+            try:
+                del self._channels[key]
+                shell.close()
+                self.reaped += 1
+            finally:
+                shell.lock.release()
+
+    def _ensure_reaper(self):
+        with self._lock:
+            if self._reaper and self._reaper.is_alive():
+                return
+            self._stop.clear()
+            self._reaper = threading.Thread(target=self._reap_loop, name='ssh-shell-reaper', daemon=True)
+            self._reaper.start()
+
+    def _reap_loop(self):
+        while not self._stop.wait(max(self.idle_timeout / 2, 1)):
+            try:
+                self.reap_idle()
+            except Exception as e:
+                logger.error(f"유휴 원격 셸 정리 중 오류: {e}")
+
+    def reap_idle(self) -> int:
+        """idle_timeout 이상 쓰지 않았거나 끊긴 셸 닫기"""
+        now = time.monotonic()
+        reaped = 0
+        with self._lock:
+            for key, shell in list(self._channels.items()):
+                if shell.alive() and now - shell.last_used <= self.idle_timeout:
+                    continue
+                if not shell.lock.acquire(blocking=False):
+                    continue
+                try:
+                    del self._channels[key]
+                    shell.close()
+                    reaped += 1
+                finally:
+                    shell.lock.release()
+            self.reaped += reaped
+        if reaped:
+            logger.debug(f"유휴 원격 셸 {reaped}개 정리")
+        return reaped
+
+    def close(self, chat_session_id: str = None):
+        """채팅 세션의 셸(없으면 전체) 닫기"""
+        with self._lock:
+            for key, shell in list(self._channels.items()):
+                if chat_session_id is None or key[0] == str(chat_session_id):
+                    del self._channels[key]
+                    shell.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            return {
+                'idle_timeout': self.idle_timeout,
+                'max_channels': self.max_channels,
+                'size': len(self._channels),
+                'opened': self.opened,
+                'reused': self.reused,
+                'reaped': self.reaped,
+                'failures': self.failures,
+                'channels': [
+                    {
+                        'chat_session': chat_session_id,
+                        'session_name': session_name,
+                        'target': f"{username}@{host}:{port}",
+                        'cwd': shell.cwd,
+                        'commands': shell.commands,
+                        'idle_seconds': round(now - shell.last_used, 1),
+                    }
+                    for (chat_session_id, session_name, host, port, username), shell in self._channels.items()
+                ]
+            }
+
+
+_shell_channels = None
+_shell_channels_lock = threading.Lock()
+
+
+def get_shell_channels() -> ShellChannelManager:
+    """프로세스 전역 원격 셸 채널 관리자 반환"""
+    global _shell_channels
+    if _shell_channels is None:
+        with _shell_channels_lock:
+            if _shell_channels is None:
+                _shell_channels = ShellChannelManager()
+    return _shell_channels
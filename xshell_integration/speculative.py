@@ -0,0 +1,238 @@
+import shlex
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, Future, TimeoutError as FutureTimeoutError
+from typing import Dict, Any, Optional, Tuple
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .command_policy import is_dangerous_command
+from .services import XShellService
+
+logger = logging.getLogger('xshell_chatbot')
+
+# 부작용 없는 프로그램 - None이면 인자 제한 없음, 튜플이면 그 인자만 허용 (빈 튜플은 인자 없이만)
+# 튜플의 짧은 옵션은 묶어 써도 됨 (ss -tulpn). 끝나지 않을 수 있는 명령(top, tail -f, ping,
+# vmstat 1, netstat -c 등), 다른 명령을 실행할 수 있는 명령(env, find -exec, xargs),
+# 비밀값을 출력하는 명령(printenv), 인자와 관계없이 디스크 전체를 훑는 명령(du)은 넣지 않는다.
+READ_ONLY_PROGRAMS: Dict[str, Optional[Tuple[str, ...]]] = {
+    # Linux/Unix
+    'ls': None,
+    'df': None,
+    'ps': None,
+    'uptime': None,
+    'whoami': None,
+    'id': None,
+    'pwd': None,
+    'free': None,
+    'uname': None,
+    'w': None,
+    'who': None,
+    'groups': None,
+    'lsblk': None,
+    'lscpu': None,
+    'nproc': None,
+    # ss -K/--kill 은 소켓을 끊고 -D 는 파일에 씀 - 조회 옵션만 허용
+    'ss': ('-a', '-l', '-t', '-u', '-w', '-x', '-n', '-r', '-p', '-e', '-o', '-m', '-i', '-s', '-4', '-6', '-H',
+           '--all', '--listening', '--tcp', '--udp', '--raw', '--unix', '--numeric', '--resolve',
+           '--processes', '--extended', '--options', '--memory', '--info', '--summary', '--no-header'),
+    'netstat': ('-a', '-l', '-t', '-u', '-w', '-x', '-n', '-p', '-e', '-o', '-r', '-i', '-s', '-b',
+                '--all', '--listening', '--tcp', '--udp', '--raw', '--unix', '--numeric',
+                '--program', '--extend', '--route', '--interfaces', '--statistics'),
+    'stat': None,
+    'date': (),  # date -s 는 시간을 바꿈
+    'hostname': (),  # hostname NAME 은 호스트명을 바꿈
+    'arch': (),
+    # Windows cmd
+    'dir': None,
+    'tasklist': None,
+    'systeminfo': None,
+    'ver': (),
+    'ipconfig': ('/all',),  # /release, /renew 등은 네트워크 설정을 바꿈
+    # PowerShell
+    'get-process': None,
+    'get-childitem': None,
+    'get-service': None,
+    'get-location': None,
+    'get-date': None,
+    'get-computerinfo': None,
+    'get-volume': None,
+    'get-psdrive': None,
+    'get-netipaddress': None,
+}
+
+# 리다이렉션, 파이프, 명령 연결/치환이 있으면 읽기 전용이라고 보장할 수 없음
+SHELL_OPERATOR_CHARS = set(';|&<>`$(){}\n\r')
+
+
+def is_read_only_command(command: str) -> bool:
+    """부작용이 없다고 확인할 수 있는 명령어인지 (화이트리스트 프로그램 + 허용된 인자만)"""
+    command = (command or '').strip()
+    if not command or SHELL_OPERATOR_CHARS & set(command) or is_dangerous_command(command):
+        return False
+
+    try:
+        tokens = shlex.split(command, posix=True)
+    except ValueError:
+        return False
+    if not tokens:
+        return False
+
+    program, args = tokens[0].lower(), tokens[1:]
+    allowed_args = READ_ONLY_PROGRAMS.get(program, False)
+    if allowed_args is False or _walks_subtree(program, args):
+        return False
+    if allowed_args is None:
+        return True
+    return all(_is_allowed_arg(arg, allowed_args) for arg in args)
+
+
+def _is_allowed_arg(arg: str, allowed_args: Tuple[str, ...]) -> bool:
+    """허용 목록에 있는 인자인지 - 유닉스 옵션은 대소문자 구분 (ss -K != -k), 짧은 옵션 묶음은 하나씩 확인"""
+    if arg.startswith('/'):
+        return arg.lower() in allowed_args
+    if arg in allowed_args:
+        return True
+    if len(arg) > 2 and arg[0] == '-' and arg[1] != '-':
+        return all(f'-{flag}' in allowed_args for flag in arg[1:])
+    return False
+
+
+def _walks_subtree(program: str, args) -> bool:
+    """하위 디렉토리 전체를 훑는 재귀 옵션이 있는지 (ls -R, dir /s, Get-ChildItem -Recurse/-Depth)"""
+    for arg in args:
+        lowered = arg.lower().split(':', 1)[0]
+        # PowerShell 매개변수는 앞부분만 써도 됨 (-r, -rec) - ls/dir은 Get-ChildItem 별칭이기도 함
+        if (len(lowered) > 1 and '-recurse'.startswith(lowered)) or (len(lowered) > 2 and '-depth'.startswith(lowered)):
+            return True
+        if program == 'ls' and (arg == '--recursive' or (arg[:1] == '-' and arg[:2] != '--' and 'R' in arg)):
+            return True
+        if program == 'dir' and 's' in lowered.split('/')[1:]:
+            return True
+    return False
+
+
+class _Speculation:
+    __slots__ = ('future', 'started_at', 'finished_at')
+
+    def __init__(self, future: Future):
+        self.future = future
+        self.started_at = time.monotonic()
+        self.finished_at = None
+
+
+class SpeculativeExecutor:
+    """읽기 전용 명령어 미리 실행 (opt-in)
+
+    AI가 명령어를 제안하는 순간(설명 생성 전) 백그라운드에서 실행해 두고,
+    사용자가 실행 버튼을 누르면 ttl초 안의 결과를 그대로 돌려준다. 결과는 한 번만
+    사용하며, 실행 중이면 끝날 때까지 기다린다 (처음부터 다시 실행하는 것보다 빠름).
+    """
+
+    def __init__(self, enabled: bool = None, ttl: float = None, max_workers: int = None):
+        self.enabled = enabled if enabled is not None else getattr(settings, 'SPECULATIVE_EXECUTION', False)
+        self.ttl = ttl or getattr(settings, 'SPECULATIVE_TTL', 10)
+        self.max_workers = max_workers or getattr(settings, 'SPECULATIVE_MAX_WORKERS', 2)
+        self._executor = None
+        self._entries: Dict[tuple, _Speculation] = {}
+        self._lock = threading.Lock()
+        self.started = 0
+        self.hits = 0
+        self.expired = 0
+        self.skipped = 0
+
+    def _key(self, command: str, session_name: str, shell_type: Optional[str]) -> tuple:
+        return session_name or 'default', shell_type or '', command.strip()
+
+    def _prune(self, now: float):
+        """잠금 안에서 호출 - 끝난 지 ttl이 지난 결과 제거"""
+        for key, entry in list(self._entries.items()):
+            if entry.finished_at is not None and now - entry.finished_at > self.ttl:
+                del self._entries[key]
+                self.expired += 1
+
+    def start(self, command: str, session_name: str = 'default', shell_type: str = None) -> bool:
+        """읽기 전용 명령어면 백그라운드 실행 시작 (이미 실행 중이거나 결과가 있으면 그대로 둠)"""
+        if not self.enabled or not command:
+            return False
+        if not is_read_only_command(command):
+            self.skipped += 1
+            return False
+
+        key = self._key(command, session_name, shell_type)
+        with self._lock:
+            self._prune(time.monotonic())
+            if key in self._entries:
+                return True
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='speculative-exec')
+            future = self._executor.submit(self._run, command, session_name, shell_type)
+            entry = self._entries[key] = _Speculation(future)
+            self.started += 1
+
+        future.add_done_callback(lambda _: setattr(entry, 'finished_at', time.monotonic()))
+        logger.debug(f"명령어 미리 실행: {command} ({session_name})")
+        return True
+
+    def _run(self, command: str, session_name: str, shell_type: Optional[str]) -> Dict[str, Any]:
+        try:
+            return XShellService().execute_command(command, session_name, shell_type)
+        finally:
+            close_old_connections()
+
+    def take(self, command: str, session_name: str = 'default', shell_type: str = None,
+             timeout: float = None) -> Optional[Dict[str, Any]]:
+        """미리 실행한 결과를 꺼냄 - 없거나 만료됐거나 실패했으면 None (호출 측에서 직접 실행)"""
+        if not self.enabled or not command:
+            return None
+
+        with self._lock:
+            self._prune(time.monotonic())
+            entry = self._entries.pop(self._key(command, session_name, shell_type), None)
+        if entry is None:
+            return None
+
+        try:
+            result = entry.future.result(timeout=timeout)
+        except FutureTimeoutError:
+            return None
+        except Exception as e:
+            logger.warning(f"명령어 미리 실행 실패, 다시 실행: {e}")
+            return None
+        if not result.get('success'):
+            return None
+
+        self.hits += 1
+        result = dict(result)
+        result['speculative'] = True
+        result['result_age'] = round(time.monotonic() - entry.finished_at, 2) if entry.finished_at else 0.0
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'ttl': self.ttl,
+                'cached': len(self._entries),
+                'started': self.started,
+                'hits': self.hits,
+                'expired': self.expired,
+                'skipped': self.skipped
+            }
+
+
+_speculative_executor = None
+_speculative_executor_lock = threading.Lock()
+
+
+def get_speculative_executor() -> SpeculativeExecutor:
+    """프로세스 전역 명령어 미리 실행기 반환"""
+    global _speculative_executor
+    if _speculative_executor is None:
+        with _speculative_executor_lock:
+            if _speculative_executor is None:
+                _speculative_executor = SpeculativeExecutor()
+    return _speculative_executor
@@ -0,0 +1,261 @@
+import threading
+import time
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Any, Iterator, Optional, Tuple
+
+import paramiko
+from django.conf import settings
+
+logger = logging.getLogger('xshell_chatbot')
+
+ConnectionKey = Tuple[str, int, str]  # (host, port, username)
+
+
+class PooledSSHConnection:
+    """풀에 보관되는 SSH 연결 하나 (생성/검사는 연결별 락으로 직렬화)"""
+
+    def __init__(self, key: ConnectionKey):
+        self.key = key
+        self.client: Optional[paramiko.SSHClient] = None
+        self.lock = threading.Lock()
+        self.created_at = 0.0
+        self.last_used = time.monotonic()
+        self.last_verified = 0.0  # 마지막으로 연결이 정상임을 확인한 시각
+        self.uses = 0
+        self.active = 0  # get()으로 꺼내 아직 release()하지 않은 수 - 0보다 크면 정리하지 않음
+
+    def close(self):
+        if self.client:
+            try:
+                self.client.close()
+            except Exception:
+                pass
+            self.client = None
+
+
+class SSHConnectionPool:
+    """host/port/user 별 SSH 연결 풀 (프로세스 전역, 스레드 안전, LRU)"""
+
+    def __init__(self, max_size: int = None, idle_timeout: float = None, keepalive_interval: int = None,
+                 stale_after: float = None):
+        self.max_size = max_size or getattr(settings, 'SSH_POOL_MAX_SIZE', 20)
+        self.idle_timeout = idle_timeout or getattr(settings, 'SSH_POOL_IDLE_TIMEOUT', 600)
+        self.keepalive_interval = keepalive_interval or getattr(settings, 'SSH_KEEPALIVE_INTERVAL', 30)
+        self.stale_after = stale_after if stale_after is not None else getattr(settings, 'SSH_LIVENESS_STALE_AFTER', 60)
+        self.probe_timeout = getattr(settings, 'SSH_LIVENESS_PROBE_TIMEOUT', 5)
+        self._connections: 'OrderedDict[ConnectionKey, PooledSSHConnection]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_eviction = time.monotonic()
+        self.handshakes = 0
+        self.handshakes_avoided = 0
+        self.evictions = 0
+        self.failures = 0
+        self.probes = 0
+        self.probe_failures = 0
+
+    @contextmanager
+    def connection(self, key: ConnectionKey,
+                   connect: Callable[[], Optional[paramiko.SSHClient]]) -> Iterator[Optional[paramiko.SSHClient]]:
+        """get()과 같지만 블록(명령 실행, 스트리밍)이 끝날 때 release()까지 처리"""
+        client = self.get(key, connect)
+        try:
+            yield client
+        finally:
+            if client is not None:
+                self.release(key, client)
+
+    def get(self, key: ConnectionKey, connect: Callable[[], Optional[paramiko.SSHClient]]) -> Optional[paramiko.SSHClient]:
+        """키에 해당하는 살아있는 연결 반환 - 없으면 connect()로 새로 연결
+
+        반환된 연결은 release()할 때까지 사용 중으로 표시되어 LRU/유휴 정리에서 제외된다.
+        """
+        now = time.monotonic()
+
+        with self._lock:
+            if now - self._last_eviction > self.idle_timeout / 2:
+                self._evict_idle_locked(now)
+
+            entry = self._connections.get(key)
+            if entry is None:
+                entry = PooledSSHConnection(key)
+                self._connections[key] = entry
+            self._connections.move_to_end(key)
+            entry.last_used = now
+
+        # 같은 호스트에 대한 동시 요청은 핸드셰이크를 한 번만 수행
+        with entry.lock:
+            if entry.client is not None:
+                if self._is_alive(entry):
+                    entry.uses += 1
+                    with self._lock:
+                        entry.active += 1
+                        self.handshakes_avoided += 1
+                    return entry.client
+                logger.info(f"끊어진 SSH 연결 재생성: {key[2]}@{key[0]}:{key[1]}")
+                entry.close()
+                with self._lock:
+                    entry.active = 0  # 끊어진 연결의 사용 표시는 release()에서 무시되므로 초기화
+
+            client = connect()
+            if client is None:
+                with self._lock:
+                    self.failures += 1
+                    if self._connections.get(key) is entry:
+                        del self._connections[key]
+                return None
+
+            transport = client.get_transport()
+            if transport is not None and self.keepalive_interval:
+                transport.set_keepalive(self.keepalive_interval)
+
+            entry.client = client
+            entry.created_at = entry.last_verified = time.monotonic()
+            entry.uses += 1
+            with self._lock:
+                entry.active += 1
+
+        with self._lock:
+            self.handshakes += 1
+            self._enforce_max_size_locked()
+
+        return client
+
+    def release(self, key: ConnectionKey, client: paramiko.SSHClient):
+        """get()으로 꺼낸 연결 사용이 끝났을 때 호출 (그 사이 교체/제거된 연결이면 무시)"""
+        with self._lock:
+            entry = self._connections.get(key)
+            if entry is not None and entry.client is client and entry.active > 0:
+                entry.active -= 1
+                entry.last_used = time.monotonic()
+
+    def _is_alive(self, entry: PooledSSHConnection) -> bool:
+        """연결 상태 확인 - 대부분 transport 상태만으로 판단
+
+        최근 stale_after 초 안에 정상 사용된 연결은 transport가 활성이면 그대로
+        신뢰하고, 그보다 오래 쉬었던 연결만 채널을 열었다 닫아 확인한다
+        (원격 프로세스는 실행하지 않음).
+        """
+        transport = entry.client.get_transport()
+        if transport is None or not transport.is_active():
+            return False
+
+        now = time.monotonic()
+        if now - entry.last_verified < self.stale_after:
+            return True
+
+        with self._lock:
+            self.probes += 1
+        try:
+            channel = transport.open_session(timeout=self.probe_timeout)
+            channel.close()
+        except Exception as e:
+            logger.debug(f"SSH 연결 확인 실패: {entry.key[2]}@{entry.key[0]}:{entry.key[1]} {e}")
+            with self._lock:
+                self.probe_failures += 1
+            return False
+
+        entry.last_verified = now
+        return True
+
+    def mark_alive(self, key: ConnectionKey):
+        """명령 실행 성공 등으로 연결이 정상임이 확인되었을 때 호출"""
+        with self._lock:
+            entry = self._connections.get(key)
+        if entry:
+            entry.last_verified = time.monotonic()
+
+    def discard(self, key: ConnectionKey):
+        """오류가 난 연결을 풀에서 제거"""
+        with self._lock:
+            entry = self._connections.pop(key, None)
+        if entry:
+            entry.close()
+
+    def _enforce_max_size_locked(self):
+        # 가장 오래 사용되지 않은 연결부터 정리 (사용 중인 연결은 건너뜀)
+        for key in list(self._connections.keys()):
+            if len(self._connections) <= self.max_size:
+                break
+            entry = self._connections[key]
+            if entry.active or not entry.lock.acquire(blocking=False):
+                continue
+            try:
+                del self._connections[key]
+                entry.close()
+                self.evictions += 1
+                logger.debug(f"SSH 연결 LRU 정리: {key[2]}@{key[0]}:{key[1]}")
+            finally:
+                entry.lock.release()
+
+    def evict_idle(self):
+        """idle_timeout 이상 사용되지 않은 연결 정리"""
+        with self._lock:
+            self._evict_idle_locked(time.monotonic())
+
+    def _evict_idle_locked(self, now: float):
+        self._last_eviction = now
+        for key, entry in list(self._connections.items()):
+            if now - entry.last_used <= self.idle_timeout or entry.active:
+                continue
+            if not entry.lock.acquire(blocking=False):
+                continue
+            try:
+                del self._connections[key]
+                entry.close()
+                self.evictions += 1
+                logger.debug(f"유휴 SSH 연결 정리: {key[2]}@{key[0]}:{key[1]}")
+            finally:
+                entry.lock.release()
+
+    def close_all(self):
+        with self._lock:
+            for entry in self._connections.values():
+                entry.close()
+            self._connections.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """연결 재사용 통계"""
+        with self._lock:
+            now = time.monotonic()
+            connections = {
+                f"{username}@{host}:{port}": {
+                    'connected': entry.client is not None,
+                    'uses': entry.uses,
+                    'active': entry.active,
+                    'idle_seconds': round(now - entry.last_used, 1),
+                    'verified_seconds_ago': round(now - entry.last_verified, 1) if entry.last_verified else None,
+                    'age_seconds': round(now - entry.created_at, 1) if entry.created_at else 0,
+                }
+                for (host, port, username), entry in self._connections.items()
+            }
+
+            return {
+                'max_size': self.max_size,
+                'idle_timeout': self.idle_timeout,
+                'keepalive_interval': self.keepalive_interval,
+                'stale_after': self.stale_after,
+                'size': len(self._connections),
+                'handshakes': self.handshakes,
+                'handshakes_avoided': self.handshakes_avoided,
+                'failures': self.failures,
+                'evictions': self.evictions,
+                'liveness_probes': self.probes,
+                'liveness_probe_failures': self.probe_failures,
+                'connections': connections
+            }
+
+
+_ssh_pool = None
+_ssh_pool_lock = threading.Lock()
+
+
+def get_ssh_pool() -> SSHConnectionPool:
+    """프로세스 전역 SSH 연결 풀 반환"""
+    global _ssh_pool
+    if _ssh_pool is None:
+        with _ssh_pool_lock:
+            if _ssh_pool is None:
+                _ssh_pool = SSHConnectionPool()
+    return _ssh_pool
@@ -7,6 +7,7 @@ urlpatterns = [
     # 명령어 실행
     path('execute/', views.execute_command, name='execute_command'),
     path('execute/stream/', views.execute_command_stream, name='execute_command_stream'),
+    path('execute/multi/', views.execute_command_multi, name='execute_command_multi'),
     
     # 세션 관리
     path('sessions/', views.list_sessions, name='list_sessions'),
@@ -7,7 +7,10 @@ import json
 import time
 
 from .services import XShellService
+from .shell_channels import get_shell_channels
+from .speculative import get_speculative_executor
 from chatbot.models import XShellSession
+from chatbot.write_behind import get_write_behind_queue
 
 
 @csrf_exempt
@@ -18,6 +21,8 @@ def execute_command(request):
         data = json.loads(request.body)
         command = data.get('command', '')
         session_name = data.get('session_name', 'default')
+        shell_type = data.get('shell_type')
+        chat_session_id = data.get('chat_session_id')  # 있으면 같은 채팅의 원격 셸 상태(cwd, 환경 변수) 유지
         
         if not command:
             return JsonResponse({
@@ -25,8 +30,11 @@ def execute_command(request):
                 'error': '명령어가 필요합니다.'
             }, status=400)
         
-        xshell_service = XShellService()
-        result = xshell_service.execute_command(command, session_name)
+        # 미리 실행해 둔 읽기 전용 명령어 결과가 있으면 사용
+        result = get_speculative_executor().take(command, session_name, shell_type)
+        if result is None:
+            xshell_service = XShellService()
+            result = xshell_service.execute_command(command, session_name, shell_type, chat_session_id=chat_session_id)
         
         return JsonResponse({
             'success': True,
@@ -82,6 +90,56 @@ def execute_command_stream(request):
         }, status=500)
 
 
+@csrf_exempt
+@require_http_methods(["POST"])
+def execute_command_multi(request):
+    """여러 세션 동시 명령어 실행 API - 호스트별 결과를 끝나는 순서대로 스트리밍"""
+    try:
+        data = json.loads(request.body)
+        command = data.get('command', '')
+        session_names = data.get('session_names', [])
+        max_concurrency = data.get('max_concurrency')
+        
+        if not command:
+            return JsonResponse({
+                'success': False,
+                'error': '명령어가 필요합니다.'
+            }, status=400)
+        
+        if not isinstance(session_names, list) or not session_names:
+            return JsonResponse({
+                'success': False,
+                'error': '세션 목록(session_names)이 필요합니다.'
+            }, status=400)
+        
+        def stream_results():
+            xshell_service = XShellService()
+            succeeded = 0
+            failed = 0
+            try:
+                for result in xshell_service.execute_command_multi(command, session_names, max_concurrency):
+                    if result['success']:
+                        succeeded += 1
+                    else:
+                        failed += 1
+                    yield f"data: {json.dumps({'result': result})}\n\n"
+                yield f"data: {json.dumps({'status': 'completed', 'succeeded': succeeded, 'failed': failed})}\n\n"
+            except Exception as e:
+                yield f"data: {json.dumps({'error': str(e)})}\n\n"
+        
+        response = StreamingHttpResponse(
+            stream_results(),
+            content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        return response
+        
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=500)
+
 def health_check(request):
     """XShell 서비스 상태 확인"""
     try:
@@ -104,7 +162,11 @@ def health_check(request):
             'total_sessions': total_sessions,
             'recent_commands': recent_commands,
             'xshell_path': xshell_service.xshell_path,
-            'sessions_path': xshell_service.sessions_path
+            'sessions_path': xshell_service.sessions_path,
+            'ssh_pool': xshell_service.ssh_pool.stats(),
+            'shell_channels': get_shell_channels().stats(),
+            'write_behind': get_write_behind_queue().stats(),
+            'speculative_execution': get_speculative_executor().stats()
         })
         
     except Exception as e: